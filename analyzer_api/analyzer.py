@@ -0,0 +1,150 @@
+from collections import Counter
+import hashlib
+import re
+
+# [^\W_] is exactly str.isalnum(), so this strips everything the palindrome check ignores
+_NON_ALNUM_RE = re.compile(r'[\W_]+')
+
+# str.lower() is per-character except for the context-sensitive final sigma rule,
+# which maps a word-final capital sigma to the final form instead of the plain one
+_CAPITAL_SIGMA = '\u03a3'
+_SMALL_SIGMA = '\u03c3'
+
+# Bytes that are not ASCII letters or digits, removed in one C-level translate()
+_ASCII_NON_ALNUM = bytes(
+    byte for byte in range(128)
+    if not (48 <= byte <= 57 or 65 <= byte <= 90 or 97 <= byte <= 122)
+)
+
+# Case-folded characters tracked by one bit each in StringAnalysis.character_mask;
+# every other character a string contains is stored as an OverflowCharacter row
+SIGNATURE_ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789 .,!?\'"-_:;()/@#&*+=%$[]<>\n'
+SIGNATURE_BITS = {char: 1 << position for position, char in enumerate(SIGNATURE_ALPHABET)}
+
+# Values indexed by ValueTrigram rows; longer ones get the one UNINDEXED_TRIGRAM row instead
+# and are checked directly by every search, which bounds the rows a single value can add
+TRIGRAM_INDEX_MAX_LENGTH = 2000
+UNINDEXED_TRIGRAM = ''
+# Marks the start of a value, so starts_with searches of one or two characters have a trigram
+TRIGRAM_START = '\x02'
+
+
+def analyze_string(value):
+    """
+    Compute every stored property of a string
+    Returns: dict keyed by StringAnalysis field name; character_frequency is in codepoint
+    order, as it is stored, so fresh and stored analyses render identically
+    """
+    frequency = dict(sorted(Counter(value).items()))
+    cleaned = _clean(value)
+
+    return {
+        'length': len(value),
+        'is_palindrome': cleaned == cleaned[::-1],
+        'word_count': len(value.split()),
+        'unique_char_count': len(frequency),
+        'character_frequency': frequency,
+        'character_mask': character_signature(frequency)[0],
+        'sha256_hash': hashlib.sha256(value.encode('utf-8')).hexdigest(),
+    }
+
+
+def analyze_chunk(chunk):
+    """
+    Compute the partial properties of one slice of a larger string
+    Returns: dict to be combined with merge_chunk_analyses
+    """
+    cleaned = _clean(chunk)
+    return {
+        'frequency': Counter(chunk),
+        'word_count': len(chunk.split()),
+        'starts_in_word': not chunk[:1].isspace(),
+        'ends_in_word': not chunk[-1:].isspace(),
+        'cleaned': cleaned if isinstance(cleaned, str) else cleaned.decode('ascii'),
+    }
+
+
+def merge_chunk_analyses(chunks, sha256_hash):
+    """
+    Combine analyze_chunk results, given in string order, into the analyze_string result
+    The hash is streamed separately by the caller over the same chunks
+    """
+    frequency = Counter()
+    word_count = 0
+    length = 0
+    previous_ends_in_word = False
+    for chunk in chunks:
+        frequency.update(chunk['frequency'])
+        word_count += chunk['word_count']
+        length += sum(chunk['frequency'].values())
+        # A word split across the chunk boundary was counted on both sides
+        if previous_ends_in_word and chunk['starts_in_word']:
+            word_count -= 1
+        previous_ends_in_word = chunk['ends_in_word']
+
+    cleaned = ''.join(chunk['cleaned'] for chunk in chunks)
+    frequency = dict(sorted(frequency.items()))
+    return {
+        'length': length,
+        'is_palindrome': cleaned == cleaned[::-1],
+        'word_count': word_count,
+        'unique_char_count': len(frequency),
+        'character_frequency': frequency,
+        'character_mask': character_signature(frequency)[0],
+        'sha256_hash': sha256_hash,
+    }
+
+
+def character_signature(frequency):
+    """
+    Split the case-folded characters of a frequency map into the alphabet bitmask and the rest
+    Returns: (mask, sorted list of folded characters outside SIGNATURE_ALPHABET)
+    """
+    mask = 0
+    overflow = set()
+    for char in frequency:
+        folded = char.lower()
+        bit = SIGNATURE_BITS.get(folded)
+        if bit is None:
+            overflow.add(folded)
+        else:
+            mask |= bit
+    return mask, sorted(overflow)
+
+
+def value_trigrams(value):
+    """
+    The ValueTrigram rows of a value: every three-character slice of it lower-cased, plus the
+    start-anchored trigrams of its first one and two characters
+    """
+    if len(value) > TRIGRAM_INDEX_MAX_LENGTH:
+        return {UNINDEXED_TRIGRAM}
+    folded = value.lower()
+    trigrams = {folded[start:start + 3] for start in range(len(folded) - 2)}
+    if folded:
+        trigrams.add(TRIGRAM_START * 2 + folded[0])
+        trigrams.add(TRIGRAM_START + folded[:2])
+    return trigrams
+
+
+def search_trigrams(term, prefix=False):
+    """
+    The trigrams every value containing term, or starting with it if prefix, is indexed under
+    """
+    folded = term.lower()
+    trigrams = {folded[start:start + 3] for start in range(len(folded) - 2)}
+    if prefix and folded:
+        trigrams.add(TRIGRAM_START * 2 + folded if len(folded) == 1 else TRIGRAM_START + folded[:2])
+    return trigrams
+
+
+def _clean(value):
+    """
+    Strip value down to the lowercase alphanumerics the palindrome check compares
+    Returns: bytes for ASCII input, str otherwise
+    """
+    if value.isascii():
+        return value.encode('ascii').translate(None, _ASCII_NON_ALNUM).lower()
+
+    cleaned = _NON_ALNUM_RE.sub('', value)
+    return cleaned.replace(_CAPITAL_SIGMA, _SMALL_SIGMA).lower()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AnalyzerApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "analyzer_api"
+
+    def ready(self):
+        # Connect the receivers that keep derived tables in step with StringAnalysis
+        from . import cache, counting, similarity, stats  # noqa: F401
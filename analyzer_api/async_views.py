@@ -0,0 +1,152 @@
+"""
+Async variants of the read endpoints, routed in place of the sync views when settings.ASYNC_VIEWS is on
+
+GET runs on the event loop over the async ORM and cache APIs. Every other method runs the sync view
+in a worker thread, so analysis on create never blocks the loop.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.response import Response
+
+from .counting import acount_analyses, atable_version, atotal_analyses
+from .serializers import analysis_rows, arender_analysis_rows
+from .services import StringAnalysisService
+from .stats import aread_stats
+from .views import (
+    HealthCheckView, NaturalLanguageFilterView, StringAnalysisListCreateView,
+    StringAnalysisRetrieveDeleteView, StringAnalysisStatsView, analysis_etag,
+    not_modified_response, version_etag, with_validators
+)
+
+
+class AsyncAPIView(View):
+    """
+    Wraps an async get() in the DRF request handling of sync_view_class: authentication,
+    throttling, content negotiation and the exception handler
+    
+    get() receives the DRF request; self.api_view is the sync view instance, for its helpers.
+    """
+    sync_view_class = None
+    sync_view = None
+    
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(sync_view=cls.sync_view_class.as_view(), **initkwargs)
+        # As APIView.as_view: SessionAuthentication enforces CSRF for session users itself
+        return csrf_exempt(view)
+    
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET':
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+        
+        api_view = self.api_view = self.sync_view_class()
+        api_view.setup(request, *args, **kwargs)
+        request = api_view.initialize_request(request, *args, **kwargs)
+        api_view.request = request
+        api_view.headers = api_view.default_response_headers
+        try:
+            # Authentication and throttling may use the sync ORM and cache backends
+            await sync_to_async(api_view.initial)(request, *args, **kwargs)
+            response = await self.get(request, *args, **kwargs)
+        except Exception as exc:
+            response = api_view.handle_exception(exc)
+        return api_view.finalize_response(request, response, *args, **kwargs)
+
+
+class AsyncStringAnalysisListCreateView(AsyncAPIView):
+    sync_view_class = StringAnalysisListCreateView
+    
+    async def get(self, request):
+        listing, error_response = self.api_view.get_listing(request)
+        if error_response:
+            return error_response
+        
+        etag = version_etag(await atable_version())
+        not_modified = not_modified_response(request, etag, no_cache=True)
+        if not_modified:
+            return not_modified
+        
+        rows = analysis_rows(listing['queryset'], listing['view'])
+        if listing['stream']:
+            lines = (
+                body + b'\n'
+                async for body in arender_analysis_rows(
+                    rows.aiterator(chunk_size=settings.STREAM_CHUNK_SIZE), listing['view']
+                )
+            )
+            return with_validators(
+                StreamingHttpResponse(lines, content_type='application/x-ndjson'), etag, no_cache=True
+            )
+        
+        page = await self.api_view.paginator.apaginate_queryset(rows, request, view=self.api_view)
+        count, count_source = await acount_analyses(
+            listing['queryset'], listing['filters_applied'], listing['count_mode']
+        )
+        
+        return with_validators(
+            self.api_view.page_response(listing, page, count, count_source), etag, no_cache=True
+        )
+
+
+class AsyncStringAnalysisRetrieveDeleteView(AsyncAPIView):
+    sync_view_class = StringAnalysisRetrieveDeleteView
+    
+    async def get(self, request, string_value):
+        by, view = request.GET.get('by'), request.GET.get('view', 'full')
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            sha256_hash, error, status_code = await StringAnalysisService.aresolve_string_analysis_hash(
+                string_value, by, view
+            )
+            if error:
+                return Response(error, status=status_code)
+            not_modified = not_modified_response(
+                request, analysis_etag(sha256_hash, view), **self.api_view.cache_control()
+            )
+            if not_modified:
+                return not_modified
+        
+        result, error, status_code = await StringAnalysisService.aget_string_analysis_json(string_value, by, view)
+        
+        if error:
+            return Response(error, status=status_code)
+        
+        return self.api_view.analysis_response(result, view)
+
+
+class AsyncNaturalLanguageFilterView(AsyncAPIView):
+    sync_view_class = NaturalLanguageFilterView
+    
+    async def get(self, request):
+        search, error_response = self.api_view.get_search(request)
+        if error_response:
+            return error_response
+        
+        etag = version_etag(await atable_version())
+        not_modified = not_modified_response(request, etag, no_cache=True)
+        if not_modified:
+            return not_modified
+        
+        count, count_source = await acount_analyses(
+            search['queryset'], {"query": search['query'].lower()}, search['count_mode']
+        )
+        rows = [row async for row in analysis_rows(search['queryset'], search['view'])]
+        return with_validators(
+            self.api_view.results_response(search, rows, count, count_source), etag, no_cache=True
+        )
+
+
+class AsyncStringAnalysisStatsView(AsyncAPIView):
+    sync_view_class = StringAnalysisStatsView
+    
+    async def get(self, request):
+        return Response(await aread_stats())
+
+
+class AsyncHealthCheckView(AsyncAPIView):
+    sync_view_class = HealthCheckView
+    
+    async def get(self, request):
+        return self.api_view.health_response(await atotal_analyses())
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+from functools import lru_cache
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import StringAnalysis
+from .signals import analyses_deleted
+
+
+class AnalysisResultCache:
+    """
+    Rendered detail responses keyed by sha256_hash, in two tiers: an in-process LRU
+    bounded by total body size, in front of a shared Django cache backend
+
+    Analyses never change once stored, so entries only need invalidating on delete.
+    Other processes drop their local copy of a deleted analysis after local_timeout.
+    """
+
+    def __init__(self, alias, timeout, local_max_bytes, local_timeout):
+        self.alias = alias
+        self.timeout = timeout
+        self.local_max_bytes = local_max_bytes
+        self.local_timeout = local_timeout
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get(self, sha256_hash):
+        """
+        Returns: the cached JSON body, or None
+        """
+        body = self._get_local(sha256_hash)
+        if body is not None:
+            return body
+        body = self.shared.get(self._key(sha256_hash)) if self.shared else None
+        return self._shared_result(sha256_hash, body)
+
+    async def aget(self, sha256_hash):
+        body = self._get_local(sha256_hash)
+        if body is not None:
+            return body
+        body = await self.shared.aget(self._key(sha256_hash)) if self.shared else None
+        return self._shared_result(sha256_hash, body)
+
+    def set(self, sha256_hash, body):
+        if self.shared:
+            self.shared.set(self._key(sha256_hash), body, self.timeout)
+        self._set_local(sha256_hash, body)
+
+    async def aset(self, sha256_hash, body):
+        if self.shared:
+            await self.shared.aset(self._key(sha256_hash), body, self.timeout)
+        self._set_local(sha256_hash, body)
+
+    def delete(self, sha256_hashes):
+        with self._lock:
+            for sha256_hash in sha256_hashes:
+                self._evict(sha256_hash)
+        if self.shared:
+            self.shared.delete_many([self._key(sha256_hash) for sha256_hash in sha256_hashes])
+
+    def info(self):
+        with self._lock:
+            return {**self.stats, 'local_entries': len(self._entries), 'local_bytes': self._size}
+
+    def _get_local(self, sha256_hash):
+        with self._lock:
+            entry = self._entries.get(sha256_hash)
+            if entry is None:
+                return None
+            body, expires_at = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(sha256_hash)
+                self.stats['local_hits'] += 1
+                return body
+            self._evict(sha256_hash)
+            return None
+
+    def _shared_result(self, sha256_hash, body):
+        if body is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['shared_hits'] += 1
+        self._set_local(sha256_hash, body)
+        return body
+
+    def _set_local(self, sha256_hash, body):
+        if len(body) > self.local_max_bytes:
+            return
+        with self._lock:
+            self._evict(sha256_hash)
+            self._entries[sha256_hash] = (body, time.monotonic() + self.local_timeout)
+            self._size += len(body)
+            while self._size > self.local_max_bytes:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, sha256_hash):
+        entry = self._entries.pop(sha256_hash, None)
+        if entry is not None:
+            self._size -= len(entry[0])
+
+    @staticmethod
+    def _key(sha256_hash):
+        return f'analysis-json:{sha256_hash}'
+
+
+@lru_cache(maxsize=None)
+def get_result_cache():
+    """
+    Build the cache configured by settings.ANALYSIS_RESULT_CACHE once per process
+    """
+    config = settings.ANALYSIS_RESULT_CACHE
+    return AnalysisResultCache(
+        alias=config['ALIAS'],
+        timeout=config['TIMEOUT'],
+        local_max_bytes=config['LOCAL_MAX_BYTES'],
+        local_timeout=config['LOCAL_TIMEOUT'],
+    )
+
+
+@receiver(analyses_deleted, sender=StringAnalysis)
+def invalidate_deleted(sender, analyses, using=None, **kwargs):
+    sha256_hashes = [analysis.sha256_hash for analysis in analyses]
+    get_result_cache().delete(sha256_hashes)
+    # Again once committed, in case a reader re-cached a row before the delete was visible
+    transaction.on_commit(lambda: get_result_cache().delete(sha256_hashes), using=using)
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import random
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Sum
+from django.dispatch import receiver
+
+from .models import StringAnalysis, TableCounter
+from .signals import analyses_created, analyses_deleted
+
+COUNTER_SLOTS = 16
+ANALYSES_COUNTER = 'analyses'
+# Bumped by every transaction that inserts or deletes analyses, so list responses can be revalidated
+VERSION_COUNTER = 'analyses-version'
+VERSION_CACHE_KEY = 'analysis-table-version'
+
+COUNT_MODES = ('exact', 'estimate')
+
+
+def increment(name, amount, using=None):
+    """
+    Add amount to a random slot of the named counter
+    """
+    slot = random.randrange(COUNTER_SLOTS)
+    counters = TableCounter.objects.using(using)
+    if counters.filter(name=name, slot=slot).update(value=F('value') + amount):
+        return
+    try:
+        with transaction.atomic(using=using):
+            counters.create(name=name, slot=slot, value=amount)
+    except IntegrityError:
+        counters.filter(name=name, slot=slot).update(value=F('value') + amount)
+
+
+def read(name, using=None):
+    """
+    Current value of the named counter
+    """
+    total = TableCounter.objects.using(using).filter(name=name).aggregate(total=Sum('value'))['total']
+    return total or 0
+
+
+async def aread(name, using=None):
+    totals = await TableCounter.objects.using(using).filter(name=name).aaggregate(total=Sum('value'))
+    return totals['total'] or 0
+
+
+def total_analyses():
+    return read(ANALYSES_COUNTER)
+
+
+async def atotal_analyses():
+    return await aread(ANALYSES_COUNTER)
+
+
+def table_version():
+    """
+    The StringAnalysis table version, from the count cache when it holds one
+    """
+    cache = caches[settings.COUNT_CACHE_ALIAS]
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = read(VERSION_COUNTER)
+        cache.set(VERSION_CACHE_KEY, version, settings.TABLE_VERSION_CACHE_TTL)
+    return version
+
+
+async def atable_version():
+    cache = caches[settings.COUNT_CACHE_ALIAS]
+    version = await cache.aget(VERSION_CACHE_KEY)
+    if version is None:
+        version = await aread(VERSION_COUNTER)
+        await cache.aset(VERSION_CACHE_KEY, version, settings.TABLE_VERSION_CACHE_TTL)
+    return version
+
+
+def bump_version(using=None):
+    increment(VERSION_COUNTER, 1, using=using)
+    transaction.on_commit(
+        lambda: caches[settings.COUNT_CACHE_ALIAS].delete(VERSION_CACHE_KEY), using=using
+    )
+
+
+def count_analyses(queryset, cache_key_parts, count_mode=None):
+    """
+    Count a filtered StringAnalysis queryset as cheaply as the requested mode allows
+    cache_key_parts: a JSON-serializable, normalized description of the filters
+    count_mode: None for the default, 'exact' to always run COUNT(*), or 'estimate'
+      to accept a query planner estimate for large results where the database has one
+    Returns: (count, mode) where mode is 'counter', 'cached', 'exact' or 'estimate'
+    """
+    if count_mode == 'exact':
+        return queryset.count(), 'exact'
+
+    if not queryset.query.has_filters():
+        return read(ANALYSES_COUNTER, using=queryset.db), 'counter'
+
+    if count_mode == 'estimate':
+        estimate = _planner_estimate(queryset)
+        if estimate is not None and estimate >= settings.COUNT_ESTIMATE_MIN_ROWS:
+            return estimate, 'estimate'
+
+    cache = caches[settings.COUNT_CACHE_ALIAS]
+    key = _count_cache_key(cache_key_parts)
+    count = cache.get(key)
+    if count is not None:
+        return count, 'cached'
+
+    count = queryset.count()
+    cache.set(key, count, settings.COUNT_CACHE_TTL)
+    return count, 'exact'
+
+
+async def acount_analyses(queryset, cache_key_parts, count_mode=None):
+    """
+    count_analyses for async views
+    """
+    if count_mode == 'exact':
+        return await queryset.acount(), 'exact'
+
+    if not queryset.query.has_filters():
+        return await aread(ANALYSES_COUNTER, using=queryset.db), 'counter'
+
+    if count_mode == 'estimate':
+        estimate = await sync_to_async(_planner_estimate)(queryset)
+        if estimate is not None and estimate >= settings.COUNT_ESTIMATE_MIN_ROWS:
+            return estimate, 'estimate'
+
+    cache = caches[settings.COUNT_CACHE_ALIAS]
+    key = _count_cache_key(cache_key_parts)
+    count = await cache.aget(key)
+    if count is not None:
+        return count, 'cached'
+
+    count = await queryset.acount()
+    await cache.aset(key, count, settings.COUNT_CACHE_TTL)
+    return count, 'exact'
+
+
+def _count_cache_key(cache_key_parts):
+    return 'analysis-count:' + hashlib.sha1(
+        json.dumps(cache_key_parts, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+
+
+def _planner_estimate(queryset):
+    """
+    Row estimate from the PostgreSQL planner, or None on other databases
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+@receiver(analyses_created, sender=StringAnalysis)
+def count_created(sender, analyses, using=None, **kwargs):
+    if analyses:
+        increment(ANALYSES_COUNTER, len(analyses), using=using)
+        bump_version(using=using)
+
+
+@receiver(analyses_deleted, sender=StringAnalysis)
+def count_deleted(sender, analyses, using=None, **kwargs):
+    if analyses:
+        increment(ANALYSES_COUNTER, -len(analyses), using=using)
+        bump_version(using=using)
@@ -0,0 +1,113 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import hashlib
+import multiprocessing
+import os
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .analyzer import analyze_chunk, analyze_string, merge_chunk_analyses
+
+
+class InlineAnalysisExecutor:
+    """
+    Analyze strings in the calling thread
+    """
+
+    def analyze(self, value):
+        """
+        Analyze one string
+        Returns: dict keyed by StringAnalysis field name
+        """
+        return analyze_string(value)
+
+    def analyze_many(self, values):
+        """
+        Analyze a list of strings
+        Returns: one properties dict per value, or the exception its analysis raised
+        """
+        return [self._analyze_or_error(value) for value in values]
+
+    def _analyze_or_error(self, value):
+        try:
+            return self.analyze(value)
+        except Exception as e:
+            return e
+
+
+class ProcessPoolAnalysisExecutor(InlineAnalysisExecutor):
+    """
+    Analyze small strings inline and send large strings and large batches to a process pool
+
+    A large string is split into chunks whose character counts are computed in the
+    workers and merged at the end, while the SHA-256 is streamed over the same chunks
+    in the calling process.
+    """
+
+    def __init__(self, max_workers=None, inline_threshold=1_000_000, chunk_size=1_000_000,
+                 batch_threshold=256, start_method='spawn'):
+        self.max_workers = max_workers
+        self.inline_threshold = inline_threshold
+        self.chunk_size = chunk_size
+        self.batch_threshold = batch_threshold
+        self.start_method = start_method
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        # Created on first use so that processes which never analyze a large value never fork
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                    )
+        return self._pool
+
+    def analyze(self, value):
+        if len(value) < self.inline_threshold:
+            return analyze_string(value)
+
+        chunks = [value[start:start + self.chunk_size] for start in range(0, len(value), self.chunk_size)]
+        futures = [self.pool.submit(analyze_chunk, chunk) for chunk in chunks]
+
+        hasher = hashlib.sha256()
+        for chunk in chunks:
+            hasher.update(chunk.encode('utf-8'))
+
+        return merge_chunk_analyses([future.result() for future in futures], hasher.hexdigest())
+
+    def analyze_many(self, values):
+        if len(values) < self.batch_threshold:
+            return super().analyze_many(values)
+
+        small = [index for index, value in enumerate(values) if len(value) < self.inline_threshold]
+        results = [None] * len(values)
+        chunksize = max(1, len(small) // (4 * (self.max_workers or os.cpu_count() or 1)))
+        pooled = self.pool.map(_analyze_or_error, [values[index] for index in small], chunksize=chunksize)
+        for index, properties in zip(small, pooled):
+            results[index] = properties
+        for index, value in enumerate(values):
+            if results[index] is None:
+                results[index] = self._analyze_or_error(value)
+        return results
+
+
+def _analyze_or_error(value):
+    try:
+        return analyze_string(value)
+    except Exception as e:
+        return e
+
+
+@lru_cache(maxsize=None)
+def get_analysis_executor():
+    """
+    Build the executor configured by settings.ANALYSIS_EXECUTOR once per process
+    """
+    config = settings.ANALYSIS_EXECUTOR
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
@@ -0,0 +1,142 @@
+from array import array
+from base64 import b64encode
+from collections.abc import Mapping
+import sys
+
+from django.db import models
+
+
+class CharacterMaskField(models.BigIntegerField):
+    """
+    Bitmask of the SIGNATURE_ALPHABET characters a string contains
+    """
+
+
+@CharacterMaskField.register_lookup
+class HasBits(models.Lookup):
+    """
+    character_mask__has_bits=mask matches rows with every bit of mask set
+    """
+    lookup_name = 'has_bits'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'({lhs} & {rhs}) = {rhs}', (*lhs_params, *rhs_params, *rhs_params)
+
+
+# Packed character_frequency: one header byte holding the byte widths of the codepoints
+# (high nibble) and of the counts (low nibble), then every codepoint in ascending order,
+# then the count of each, all little-endian at those widths
+_WIDTH_TYPECODES = {
+    width: next(code for code in 'BHILQ' if array(code).itemsize == width) for width in (1, 2, 4, 8)
+}
+
+
+def _width(largest):
+    return next(width for width in (1, 2, 4, 8) if largest < 1 << (8 * width))
+
+
+def _pack(width, values):
+    if width == 1:
+        return bytes(values)
+    packed = array(_WIDTH_TYPECODES[width], values)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(width, data):
+    if width == 1:
+        return data
+    values = array(_WIDTH_TYPECODES[width])
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def encode_frequency(frequency):
+    """
+    Pack a {character: count} map into bytes
+    """
+    if not frequency:
+        return b'\x11'
+    # Single characters sort by codepoint
+    chars = sorted(frequency)
+    codepoints = list(map(ord, chars))
+    counts = list(map(frequency.__getitem__, chars))
+    code_width = _width(codepoints[-1])
+    count_width = _width(max(counts))
+    return b''.join((
+        bytes((code_width << 4 | count_width,)),
+        _pack(code_width, codepoints),
+        _pack(count_width, counts),
+    ))
+
+
+def decode_frequency(data):
+    """
+    The {character: count} map of encode_frequency bytes, in codepoint order
+    """
+    code_width, count_width = data[0] >> 4, data[0] & 0x0f
+    split = 1 + code_width * ((len(data) - 1) // (code_width + count_width))
+    return dict(zip(map(chr, _unpack(code_width, data[1:split])), _unpack(count_width, data[split:])))
+
+
+class CharacterFrequency(Mapping):
+    """
+    A read-only {character: count} map over packed bytes, decoded on first access
+    """
+    __slots__ = ('encoded', '_decoded')
+
+    def __init__(self, encoded):
+        self.encoded = encoded
+        self._decoded = None
+
+    def decoded(self):
+        if self._decoded is None:
+            self._decoded = decode_frequency(self.encoded)
+        return self._decoded
+
+    def __getitem__(self, char):
+        return self.decoded()[char]
+
+    def __iter__(self):
+        return iter(self.decoded())
+
+    def __len__(self):
+        code_width, count_width = self.encoded[0] >> 4, self.encoded[0] & 0x0f
+        return (len(self.encoded) - 1) // (code_width + count_width)
+
+    def __repr__(self):
+        return repr(self.decoded())
+
+
+class CharacterFrequencyField(models.BinaryField):
+    """
+    A {character: count} map stored packed by encode_frequency; loads as a CharacterFrequency
+    """
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return CharacterFrequency(bytes(value))
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Mapping):
+            return value
+        return CharacterFrequency(bytes(super().to_python(value)))
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if isinstance(value, CharacterFrequency):
+            value = value.encoded
+        elif isinstance(value, Mapping):
+            value = encode_frequency(value)
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        if isinstance(value, Mapping):
+            value = value.encoded if isinstance(value, CharacterFrequency) else encode_frequency(value)
+        return b64encode(value).decode('ascii')
@@ -1,5 +1,57 @@
 import django_filters
-from .models import StringAnalysis
+from django.db.models import Count, Q
+
+from .analyzer import SIGNATURE_BITS, TRIGRAM_START, UNINDEXED_TRIGRAM, search_trigrams
+from .models import OverflowCharacter, StringAnalysis, ValueTrigram, uses_trigram_table
+
+# Postings intersected per search; a longer term's other trigrams are left to the check against value
+MAX_SEARCH_TRIGRAMS = 12
+MAX_SEARCH_LENGTH = 256
+
+
+def contains_character_q(char):
+    """
+    Case-insensitive "value contains char" answered from the character signature
+    instead of a LIKE scan over value
+    """
+    folded = char.lower()
+    bit = SIGNATURE_BITS.get(folded)
+    if bit is None:
+        # Rare characters: an indexed lookup whose cost follows the number of matches
+        return Q(pk__in=OverflowCharacter.objects.filter(character=folded).values('analysis_id'))
+    # Common characters: a bit test on an integer column, no matter how long value is
+    return Q(character_mask__has_bits=bit)
+
+
+def substring_q(term, prefix=False, using=None):
+    """
+    Case-insensitive "value contains term", or "value starts with term" if prefix
+    Candidates come from the trigram index and are then checked against value, so the
+    cost follows the rows sharing the term's trigrams rather than the table size.
+    """
+    match = Q(value__istartswith=term) if prefix else Q(value__icontains=term)
+    trigrams = search_trigrams(term, prefix)
+    if not trigrams:
+        # One or two characters: narrow down with the character signature first
+        return Q(*(contains_character_q(char) for char in set(term))) & match
+    if not uses_trigram_table(using):
+        # The pg_trgm index on UPPER(value) serves icontains and istartswith directly
+        return match
+
+    trigrams = sorted(trigrams, key=lambda trigram: (not trigram.startswith(TRIGRAM_START), trigram))
+    if len(trigrams) > MAX_SEARCH_TRIGRAMS:
+        step = len(trigrams) / MAX_SEARCH_TRIGRAMS
+        trigrams = [trigrams[int(position * step)] for position in range(MAX_SEARCH_TRIGRAMS)]
+    candidates = (
+        ValueTrigram.objects.using(using).filter(trigram__in=trigrams)
+        .values('analysis_id')
+        .annotate(matched=Count('trigram'))
+        .filter(matched=len(trigrams))
+        .values('analysis_id')
+    )
+    unindexed = ValueTrigram.objects.using(using).filter(trigram=UNINDEXED_TRIGRAM).values('analysis_id')
+    return (Q(pk__in=candidates) | Q(pk__in=unindexed)) & match
+
 
 class StringAnalysisFilter(django_filters.FilterSet):
     min_length = django_filters.NumberFilter(field_name='length', lookup_expr='gte')
@@ -7,6 +59,8 @@ class StringAnalysisFilter(django_filters.FilterSet):
     is_palindrome = django_filters.BooleanFilter(field_name='is_palindrome')
     word_count = django_filters.NumberFilter(field_name='word_count')
     contains_character = django_filters.CharFilter(method='filter_contains_character')
+    contains = django_filters.CharFilter(method='filter_substring', max_length=MAX_SEARCH_LENGTH, strip=False)
+    starts_with = django_filters.CharFilter(method='filter_substring', max_length=MAX_SEARCH_LENGTH, strip=False)
     
     class Meta:
         model = StringAnalysis
@@ -23,4 +77,19 @@ class StringAnalysisFilter(django_filters.FilterSet):
         if len(value) != 1:
             raise ValueError("contains_character must be a single character")
         
-        return queryset.filter(value__icontains=value)
\ No newline at end of file
+        return queryset.filter(contains_character_q(value))
+    
+    def filter_substring(self, queryset, name, value):
+        """
+        Filter strings containing value (contains) or starting with it (starts_with), ignoring case
+        """
+        if not value:
+            return queryset
+        return queryset.filter(substring_q(value, prefix=name == 'starts_with', using=queryset.db))
+
+
+class StringAnalysisDeleteFilter(StringAnalysisFilter):
+    """
+    The filters bulk deletes accept: every list filter, plus a created_at cutoff
+    """
+    created_before = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
@@ -0,0 +1,347 @@
+"""
+Per-request performance instrumentation: database query counts and time, time per
+stage, and response size, reported in a Server-Timing header and aggregated per view
+for GET /metrics in the Prometheus text format
+
+Everything is off unless settings.INSTRUMENTATION_ENABLED: the middleware then removes
+itself and stage() returns a shared no-op. Metrics live in process memory, so each
+worker process reports its own requests.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from bisect import bisect_left
+from contextvars import ContextVar
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+STAGES = ('parse', 'analyze', 'serialize', 'render')
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    What one request spent, filled in by the query wrapper and stage() while it runs
+    """
+    __slots__ = ('started', 'db_queries', 'db_time', 'stages')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.stages = {}
+
+    def server_timing(self, elapsed, size=None):
+        """
+        The Server-Timing header value, durations in milliseconds
+        """
+        entries = [f'db;dur={self.db_time * 1e3:.2f};desc="{self.db_queries} queries"']
+        entries += [f'{name};dur={seconds * 1e3:.2f}' for name, seconds in self.stages.items()]
+        entries.append(f'total;dur={elapsed * 1e3:.2f}')
+        if size is not None:
+            entries.append(f'payload;desc="{size} bytes"')
+        return ', '.join(entries)
+
+
+class _Stage:
+    """
+    Adds the time spent in the block to a stage, less the database time inside it, so
+    stages that iterate querysets do not count their queries twice
+    """
+    __slots__ = ('metrics', 'name', 'started', 'db_time')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.db_time = self.metrics.db_time
+        return self
+
+    def __exit__(self, *exc_info):
+        metrics = self.metrics
+        elapsed = time.perf_counter() - self.started - (metrics.db_time - self.db_time)
+        metrics.stages[self.name] = metrics.stages.get(self.name, 0.0) + elapsed
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name):
+    """
+    Context manager timing a block as one of STAGES of the current request; a no-op
+    outside instrumented requests
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return _NO_STAGE
+    return _Stage(metrics, name)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting queries and their time for the current request
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - started
+        metrics.db_queries += 1
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if settings.INSTRUMENTATION_ENABLED:
+        install_query_recorder(connection)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{_labels(labels, le=bound)} {cumulative}'
+        yield f'{name}_sum{_labels(labels)} {self.sum}'
+        yield f'{name}_count{_labels(labels)} {cumulative}'
+
+
+class MetricsRegistry:
+    """
+    Per-view request metrics of this process
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.durations = {}
+        self.query_counts = {}
+        self.db_seconds = {}
+        self.stage_seconds = {}
+        self.sizes = {}
+
+    def observe(self, view, method, status, metrics, elapsed, size):
+        key = (('view', view), ('method', method))
+        with self._lock:
+            status_key = key + (('status', status),)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self._histogram(self.durations, key, DURATION_BUCKETS).observe(elapsed)
+            self._histogram(self.query_counts, key, QUERY_COUNT_BUCKETS).observe(metrics.db_queries)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + metrics.db_time
+            for name, seconds in metrics.stages.items():
+                stage_key = key + (('stage', name),)
+                self.stage_seconds[stage_key] = self.stage_seconds.get(stage_key, 0.0) + seconds
+            if size is not None:
+                self._histogram(self.sizes, key, SIZE_BUCKETS).observe(size)
+
+    @staticmethod
+    def _histogram(histograms, key, buckets):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram(buckets)
+        return histogram
+
+    def render(self):
+        """
+        Every metric in the Prometheus text exposition format
+        """
+        with self._lock:
+            lines = []
+            self._counter(lines, 'analyzer_requests_total', "Requests by view, method and status", self.requests)
+            self._histograms(lines, 'analyzer_request_duration_seconds', "Request latency by view", self.durations)
+            self._histograms(lines, 'analyzer_request_db_queries', "Database queries per request", self.query_counts)
+            self._counter(lines, 'analyzer_db_query_seconds_total', "Time spent in database queries", self.db_seconds)
+            self._counter(
+                lines, 'analyzer_stage_seconds_total',
+                "Time per stage (parse, analyze, serialize, render), excluding queries", self.stage_seconds,
+            )
+            self._histograms(lines, 'analyzer_response_size_bytes', "Response body size", self.sizes)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _counter(lines, name, help_text, values):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        lines += [f'{name}{_labels(dict(key))} {value}' for key, value in sorted(values.items())]
+
+    @staticmethod
+    def _histograms(lines, name, help_text, histograms):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for key, histogram in sorted(histograms.items()):
+            lines.extend(histogram.samples(name, dict(key)))
+
+
+def _labels(labels, **extra):
+    labels = {**labels, **extra}
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class InstrumentationMiddleware:
+    """
+    Measures each request, adds a Server-Timing header and records it in the registry
+    Place first in MIDDLEWARE so the other middleware is measured too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this point missed connection_created
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        # DRF responses render after the view returns; time that as the render stage
+        metrics = _current.get()
+        if metrics is not None:
+            render = _Stage(metrics, 'render').__enter__()
+            response.add_post_render_callback(lambda response: render.__exit__(None, None, None))
+        return response
+
+    def finish(self, request, response, metrics):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if response.streaming:
+            # Recorded once the body has been sent; the header can only cover the time to first byte
+            if settings.INSTRUMENTATION_SERVER_TIMING:
+                response['Server-Timing'] = metrics.server_timing(time.perf_counter() - metrics.started)
+            self.observe_stream(response, view, request.method, metrics)
+            return response
+
+        elapsed = time.perf_counter() - metrics.started
+        size = len(response.content)
+        if settings.INSTRUMENTATION_SERVER_TIMING:
+            response['Server-Timing'] = metrics.server_timing(elapsed, size)
+        registry.observe(view, request.method, response.status_code, metrics, elapsed, size)
+        return response
+
+    def observe_stream(self, response, view, method, metrics):
+        """
+        Count the streamed bytes, and the queries and serialization of each chunk, which
+        run after the view has returned; record the request when the stream ends
+        """
+        content = response.streaming_content
+        status = response.status_code
+
+        def observe(size):
+            registry.observe(view, method, status, metrics, time.perf_counter() - metrics.started, size)
+
+        if response.is_async:
+            async def counted():
+                size = 0
+                chunks = aiter(content)
+                try:
+                    while True:
+                        token = _current.set(metrics)
+                        try:
+                            with _Stage(metrics, 'serialize'):
+                                chunk = await anext(chunks)
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            _current.reset(token)
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    observe(size)
+        else:
+            def counted():
+                size = 0
+                chunks = iter(content)
+                try:
+                    while True:
+                        token = _current.set(metrics)
+                        try:
+                            with _Stage(metrics, 'serialize'):
+                                chunk = next(chunks)
+                        except StopIteration:
+                            break
+                        finally:
+                            _current.reset(token)
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    observe(size)
+        response.streaming_content = counted()
+
+
+@require_GET
+def metrics_view(request):
+    """
+    GET /metrics - this process's request metrics for Prometheus
+    """
+    if not settings.INSTRUMENTATION_ENABLED:
+        raise Http404
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,72 @@
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from analyzer_api.services import StringAnalysisService
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete every stored string matching the given filters, the same ones GET /strings takes "
+        "plus a created_at cutoff, one primary key chunk per transaction. Stats, counts, caches "
+        "and the search and similarity indexes are updated as each chunk commits, so the command "
+        "can be stopped at any point; --resume-after skips the chunks an earlier run finished."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-length', type=int)
+        parser.add_argument('--max-length', type=int)
+        parser.add_argument('--is-palindrome', choices=['true', 'false'])
+        parser.add_argument('--word-count', type=int)
+        parser.add_argument('--contains-character')
+        parser.add_argument('--contains')
+        parser.add_argument('--starts-with')
+        cutoff = parser.add_mutually_exclusive_group()
+        cutoff.add_argument('--created-before', help="ISO 8601 datetime, for example 2026-01-01T00:00:00Z")
+        cutoff.add_argument('--older-than-days', type=int, help="shorthand for --created-before now minus N days")
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.BULK_DELETE_CHUNK_SIZE,
+            help=f"rows deleted per transaction (default {settings.BULK_DELETE_CHUNK_SIZE})",
+        )
+        parser.add_argument('--resume-after', type=int, default=0, help="the last id an interrupted run reported")
+        parser.add_argument('--dry-run', action='store_true', help="count the matching strings without deleting")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be a positive integer")
+        filters = {
+            name: str(options[name]) for name in (
+                'min_length', 'max_length', 'is_palindrome', 'word_count', 'contains_character',
+                'contains', 'starts_with', 'created_before',
+            ) if options[name] is not None
+        }
+        if options['older_than_days'] is not None:
+            filters['created_before'] = (timezone.now() - timedelta(days=options['older_than_days'])).isoformat()
+
+        queryset, error, _ = StringAnalysisService.get_deletable_analyses(filters)
+        if error:
+            raise CommandError(f"{error['error']}: {error.get('details') or ', '.join(error.get('filters', []))}")
+        queryset = queryset.filter(pk__gt=options['resume_after'])
+        if options['dry_run']:
+            self.stdout.write(f"{queryset.count():,} strings match {filters}")
+            return
+
+        deleted, last_pk = 0, options['resume_after']
+        started = time.perf_counter()
+        try:
+            for rows, last_pk in queryset.delete_in_chunks(options['chunk_size'], options['resume_after']):
+                deleted += rows
+                if options['verbosity'] >= 1:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(f"{deleted:,} deleted, up to id {last_pk} ({deleted / elapsed:,.0f} rows/s)")
+        except KeyboardInterrupt:
+            raise CommandError(
+                f"Interrupted after deleting {deleted:,} strings; rerun with --resume-after {last_pk} to continue"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted:,} strings in {time.perf_counter() - started:.1f}s"
+        ))
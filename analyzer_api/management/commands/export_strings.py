@@ -0,0 +1,103 @@
+import contextlib
+import csv
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer_api.models import StringAnalysis
+from analyzer_api.serializers import analysis_rows, frequency_json, render_analysis_rows
+
+CSV_COLUMNS = [
+    'id', 'value', 'length', 'is_palindrome', 'unique_characters', 'word_count',
+    'character_frequency_map', 'created_at',
+]
+
+
+class Output:
+    """
+    A binary stream that counts the bytes written to it; text is written as UTF-8, for csv.writer
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.bytes_written = 0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.bytes_written += len(data)
+        self.stream.write(data)
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every stored analysis, oldest first, as NDJSON (one GET /strings/{string_value} "
+        "body per line, which import_strings reads back) or CSV"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="output file, or - for stdout; .gz files are gzip-compressed")
+        parser.add_argument(
+            '--format', choices=['ndjson', 'csv'],
+            help="defaults to csv for .csv files, ndjson otherwise",
+        )
+        parser.add_argument('--gzip', action='store_true', help="compress even without a .gz suffix")
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help="rows fetched per round trip from the server-side cursor (default 2000)",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        output_format = options['format'] or (
+            'csv' if path.removesuffix('.gz').endswith('.csv') else 'ndjson'
+        )
+        compress = options['gzip'] or path.endswith('.gz')
+        # iterator() reads through a server-side cursor where the database supports one
+        rows = analysis_rows(StringAnalysis.objects.order_by('pk')).iterator(
+            chunk_size=options['chunk_size']
+        )
+
+        started = time.perf_counter()
+        with self.open_output(path, compress) as stream:
+            output = Output(stream)
+            count = self.write_rows(rows, output_format, output)
+        elapsed = time.perf_counter() - started
+
+        summary = self.stderr if path == '-' else self.stdout
+        summary.write(self.style.SUCCESS(
+            f"Exported {count:,} strings ({output.bytes_written / 1e6:,.2f} MB uncompressed) "
+            f"in {elapsed:.1f}s: {count / elapsed:,.0f} rows/s, "
+            f"{output.bytes_written / elapsed / 1e6:,.2f} MB/s"
+        ))
+
+    def open_output(self, path, compress):
+        if path == '-':
+            if compress:
+                return gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb')
+            return contextlib.nullcontext(sys.stdout.buffer)
+        try:
+            return gzip.open(path, 'wb') if compress else open(path, 'wb')
+        except OSError as e:
+            raise CommandError(f"Cannot write {path}: {e}")
+
+    def write_rows(self, rows, output_format, output):
+        count = 0
+        if output_format == 'ndjson':
+            for body in render_analysis_rows(rows):
+                output.write(body + b'\n')
+                count += 1
+            return count
+
+        writer = csv.writer(output)
+        writer.writerow(CSV_COLUMNS)
+        for row in rows:
+            writer.writerow([
+                row.sha256_hash, row.value, row.length, row.is_palindrome,
+                row.unique_char_count, row.word_count, frequency_json(row.character_frequency).decode(),
+                row.created_at.isoformat(),
+            ])
+            count += 1
+        return count
@@ -0,0 +1,130 @@
+import contextlib
+import gzip
+import itertools
+import json
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer_api.executors import (
+    InlineAnalysisExecutor, ProcessPoolAnalysisExecutor, get_analysis_executor
+)
+from analyzer_api.models import StringAnalysis
+
+
+class Command(BaseCommand):
+    help = (
+        "Analyze and store strings from a file in constant memory. Plain text files hold one "
+        "string per line; NDJSON files hold JSON strings or objects with a \"value\", as "
+        "export_strings writes. Blank lines are skipped, and so are strings already stored."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="input file, or - for stdin; .gz files are decompressed")
+        parser.add_argument(
+            '--format', choices=['ndjson', 'lines'],
+            help="defaults to ndjson for .ndjson and .jsonl files, lines otherwise",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="strings analyzed and inserted per transaction (default 5000)",
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            help="analysis processes, 0 to analyze in this process; defaults to settings.ANALYSIS_EXECUTOR",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or (
+            'ndjson' if path.removesuffix('.gz').endswith(('.ndjson', '.jsonl')) else 'lines'
+        )
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be a positive integer")
+        executor = self.get_executor(options['workers'])
+
+        stats = {'read': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0, 'bytes': 0}
+        started = time.perf_counter()
+        with self.open_input(path) as stream:
+            lines = enumerate(stream, start=1)
+            while batch := list(itertools.islice(lines, options['batch_size'])):
+                self.import_batch(batch, input_format, executor, stats, options['verbosity'])
+                if options['verbosity'] >= 1:
+                    elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{stats['read']:,} read, {stats['inserted']:,} inserted "
+                        f"({stats['read'] / elapsed:,.0f} rows/s)"
+                    )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['inserted']:,} of {stats['read']:,} strings "
+            f"({stats['duplicates']:,} already stored, {stats['invalid']:,} invalid) in {elapsed:.1f}s: "
+            f"{stats['read'] / elapsed:,.0f} rows/s, {stats['bytes'] / elapsed / 1e6:,.2f} MB/s"
+        ))
+
+    def get_executor(self, workers):
+        if workers is None:
+            return get_analysis_executor()
+        if workers < 0:
+            raise CommandError("--workers cannot be negative")
+        if workers == 0:
+            return InlineAnalysisExecutor()
+        return ProcessPoolAnalysisExecutor(max_workers=workers, batch_threshold=1)
+
+    def open_input(self, path):
+        if path == '-':
+            return contextlib.nullcontext(sys.stdin.buffer)
+        try:
+            return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+        except OSError as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+    def import_batch(self, batch, input_format, executor, stats, verbosity):
+        line_numbers = []
+        values = []
+        for line_number, line in batch:
+            stats['bytes'] += len(line)
+            if not line.strip():
+                continue
+            stats['read'] += 1
+            value = self.parse_line(line, input_format)
+            if value is None:
+                stats['invalid'] += 1
+                if verbosity >= 2:
+                    self.stderr.write(f"line {line_number}: not a string")
+                continue
+            line_numbers.append(line_number)
+            values.append(value)
+
+        analyses = []
+        for line_number, value, properties in zip(line_numbers, values, executor.analyze_many(values)):
+            if isinstance(properties, Exception):
+                stats['invalid'] += 1
+                if verbosity >= 2:
+                    self.stderr.write(f"line {line_number}: {properties}")
+                continue
+            analyses.append(StringAnalysis(value=value).analyze(properties))
+
+        inserted = StringAnalysis.objects.insert_new(
+            analyses, batch_size=settings.STRING_BATCH_QUERY_CHUNK_SIZE
+        )
+        stats['inserted'] += len(inserted)
+        stats['duplicates'] += len(analyses) - len(inserted)
+
+    @staticmethod
+    def parse_line(line, input_format):
+        """
+        Returns: the string a line holds, or None if it holds none
+        """
+        try:
+            if input_format == 'lines':
+                return line.removesuffix(b'\n').removesuffix(b'\r').decode('utf-8')
+            document = json.loads(line)
+        except (UnicodeDecodeError, ValueError):
+            return None
+        if isinstance(document, dict):
+            document = document.get('value')
+        return document if isinstance(document, str) else None
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from analyzer_api import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the /strings/{string_value}/similar index from the stored analyses. It is "
+        "built on first use and kept current by creates and deletes, so this is only needed "
+        "to build it ahead of traffic or after restoring a backup. A recreated or flushed "
+        "database is detected and the index rebuilt on use."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help="database alias (default: 'default')")
+
+    def handle(self, *args, **options):
+        if similarity.np is None:
+            raise CommandError("numpy is not installed")
+        using = options['database']
+        started = time.perf_counter()
+        indexed = similarity.get_similarity_index(using).rebuild(
+            similarity.stored_frequencies(using), similarity.database_token(using)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed:,} analyses in {time.perf_counter() - started:.1f}s "
+            f"under {similarity.index_directory(using)}"
+        ))
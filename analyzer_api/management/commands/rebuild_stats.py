@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analyzer_api import stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the /strings/stats rollup buckets from the stored analyses. Creates and "
+        "deletes keep them current, so this is only needed to backfill or repair them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help="database alias (default: the router's choice)")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        buckets = stats.rebuild(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {buckets:,} stats buckets in {time.perf_counter() - started:.1f}s"
+        ))
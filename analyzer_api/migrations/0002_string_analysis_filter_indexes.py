@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stringanalysis',
+            index=models.Index(fields=['-created_at', '-id'], name='analysis_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stringanalysis',
+            index=models.Index(fields=['is_palindrome', 'length'], name='analysis_palindrome_len_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stringanalysis',
+            index=models.Index(fields=['length'], name='analysis_length_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stringanalysis',
+            index=models.Index(fields=['word_count', '-created_at'], name='analysis_word_count_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:40
+
+import analyzer_api.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+from analyzer_api.analyzer import character_signature
+
+BATCH_SIZE = 2000
+
+
+def backfill_character_signatures(apps, schema_editor):
+    StringAnalysis = apps.get_model('analyzer_api', 'StringAnalysis')
+    OverflowCharacter = apps.get_model('analyzer_api', 'OverflowCharacter')
+    db = schema_editor.connection.alias
+
+    last_pk = 0
+    while True:
+        rows = list(
+            StringAnalysis.objects.using(db)
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'character_frequency')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        analyses = []
+        overflow_rows = []
+        for pk, frequency in rows:
+            mask, overflow = character_signature(frequency)
+            analyses.append(StringAnalysis(pk=pk, character_mask=mask))
+            overflow_rows.extend(OverflowCharacter(analysis_id=pk, character=char) for char in overflow)
+        StringAnalysis.objects.using(db).bulk_update(analyses, ['character_mask'])
+        OverflowCharacter.objects.using(db).bulk_create(overflow_rows)
+        last_pk = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer_api', '0002_string_analysis_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverflowCharacter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('character', models.CharField(max_length=8)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='stringanalysis',
+            name='character_mask',
+            field=analyzer_api.fields.CharacterMaskField(default=0),
+        ),
+        migrations.AddField(
+            model_name='overflowcharacter',
+            name='analysis',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='overflow_characters', to='analyzer_api.stringanalysis'),
+        ),
+        migrations.AddConstraint(
+            model_name='overflowcharacter',
+            constraint=models.UniqueConstraint(fields=('character', 'analysis'), name='overflow_character_unique'),
+        ),
+        migrations.RunPython(backfill_character_signatures, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='stringanalysis',
+            index=models.Index(fields=['character_mask', 'id'], name='analysis_char_mask_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:43
+
+from django.db import migrations, models
+
+
+def seed_analyses_counter(apps, schema_editor):
+    StringAnalysis = apps.get_model('analyzer_api', 'StringAnalysis')
+    TableCounter = apps.get_model('analyzer_api', 'TableCounter')
+    db = schema_editor.connection.alias
+    TableCounter.objects.using(db).create(
+        name='analyses', slot=0, value=StringAnalysis.objects.using(db).count()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer_api', '0003_character_signature'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('name', 'slot'), name='table_counter_unique')],
+            },
+        ),
+        migrations.RunPython(seed_analyses_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer_api', '0004_table_counter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stringanalysis',
+            name='value',
+            field=models.TextField(),
+        ),
+    ]
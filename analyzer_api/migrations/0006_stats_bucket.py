@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:06
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def power_of_two_bucket(value):
+    """
+    As stats.bucket_key: the lower bound of the value's range, 0, 1, 2-3, 4-7, ...
+    """
+    return str(1 << (value.bit_length() - 1) if value > 0 else 0)
+
+
+def seed_stats_buckets(apps, schema_editor):
+    StringAnalysis = apps.get_model('analyzer_api', 'StringAnalysis')
+    StatsBucket = apps.get_model('analyzer_api', 'StatsBucket')
+    db = schema_editor.connection.alias
+    counts = Counter()
+    rows = StringAnalysis.objects.using(db).values_list(
+        'length', 'word_count', 'is_palindrome', 'character_frequency'
+    )
+    for length, word_count, is_palindrome, character_frequency in rows.iterator(chunk_size=2000):
+        counts['length', power_of_two_bucket(length)] += 1
+        counts['length', 'sum'] += length
+        counts['word_count', power_of_two_bucket(word_count)] += 1
+        counts['word_count', 'sum'] += word_count
+        counts['is_palindrome', 'true' if is_palindrome else 'false'] += 1
+        for char, count in character_frequency.items():
+            counts['character', char] += count
+    StatsBucket.objects.using(db).bulk_create(
+        [
+            StatsBucket(dimension=dimension, bucket=bucket, slot=0, value=value)
+            for (dimension, bucket), value in counts.items() if value
+        ],
+        batch_size=200,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer_api', '0005_drop_value_unique_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('bucket', models.CharField(max_length=64)),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'bucket', 'slot'), name='stats_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(seed_stats_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:22
+
+import analyzer_api.fields
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def copy_frequencies(source, target):
+    """
+    A RunPython function copying each row's character_frequency from one column to the other
+    """
+    def copy(apps, schema_editor):
+        StringAnalysis = apps.get_model('analyzer_api', 'StringAnalysis')
+        db = schema_editor.connection.alias
+
+        last_pk = 0
+        while True:
+            rows = list(
+                StringAnalysis.objects.using(db)
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', source)[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+            StringAnalysis.objects.using(db).bulk_update(
+                [StringAnalysis(pk=pk, **{target: dict(frequency)}) for pk, frequency in rows], [target]
+            )
+            last_pk = rows[-1][0]
+    return copy
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer_api', '0006_stats_bucket'),
+    ]
+
+    # Nullable while the rows are copied, so every step can be reversed
+    operations = [
+        migrations.AddField(
+            model_name='stringanalysis',
+            name='packed_character_frequency',
+            field=analyzer_api.fields.CharacterFrequencyField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='stringanalysis',
+            name='character_frequency',
+            field=models.JSONField(null=True),
+        ),
+        migrations.RunPython(
+            copy_frequencies('character_frequency', 'packed_character_frequency'),
+            copy_frequencies('packed_character_frequency', 'character_frequency'),
+        ),
+        migrations.RemoveField(
+            model_name='stringanalysis',
+            name='character_frequency',
+        ),
+        migrations.RenameField(
+            model_name='stringanalysis',
+            old_name='packed_character_frequency',
+            new_name='character_frequency',
+        ),
+        migrations.AlterField(
+            model_name='stringanalysis',
+            name='character_frequency',
+            field=analyzer_api.fields.CharacterFrequencyField(),
+        ),
+    ]
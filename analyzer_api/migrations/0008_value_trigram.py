@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from analyzer_api.analyzer import value_trigrams
+
+BATCH_SIZE = 2000
+
+
+def index_trigrams(apps, schema_editor):
+    """
+    PostgreSQL: a pg_trgm index matching the UPPER(value::text) LIKE of icontains and
+    istartswith. Elsewhere: ValueTrigram rows for every stored value.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS analysis_value_trgm_idx ON analyzer_api_stringanalysis '
+            'USING gin ((UPPER("value"::text)) gin_trgm_ops)'
+        )
+        return
+
+    StringAnalysis = apps.get_model('analyzer_api', 'StringAnalysis')
+    db = schema_editor.connection.alias
+    last_pk = 0
+    while True:
+        rows = list(
+            StringAnalysis.objects.using(db)
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'value')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO analyzer_api_valuetrigram (analysis_id, trigram) VALUES (%s, %s)',
+                [(pk, trigram) for pk, value in rows for trigram in value_trigrams(value)],
+            )
+        last_pk = rows[-1][0]
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS analysis_value_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer_api', '0007_pack_character_frequency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValueTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('analysis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='analyzer_api.stringanalysis')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trigram', 'analysis'), name='value_trigram_unique')],
+            },
+        ),
+        migrations.RunPython(index_trigrams, drop_trigram_index),
+    ]
@@ -1,53 +1,267 @@
-from django.db import models
-import hashlib
-import json
+import copy
+
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import sql
+from django.db.models.constants import OnConflict
+
+from .analyzer import analyze_string, character_signature, value_trigrams
+from .fields import CharacterFrequencyField, CharacterMaskField
+from .instrumentation import stage
+from .signals import analyses_created, analyses_deleted
+
+
+class StringAnalysisQuerySet(models.QuerySet):
+    
+    def bulk_insert(self, analyses, batch_size=None):
+        """
+        bulk_create analyzed instances together with their overflow character rows
+        """
+        with transaction.atomic(using=self.db):
+            self.bulk_create(analyses, batch_size=batch_size)
+            if any(analysis.pk is None for analysis in analyses):
+                # Backends that cannot return ids from a bulk insert
+                ids = dict(
+                    self.filter(
+                        sha256_hash__in=[analysis.sha256_hash for analysis in analyses]
+                    ).values_list('sha256_hash', 'pk')
+                )
+                for analysis in analyses:
+                    analysis.pk = ids[analysis.sha256_hash]
+            return self._announce_inserted(analyses, batch_size)
+    
+    def insert_new(self, analyses, batch_size=None):
+        """
+        Insert the analyses whose sha256_hash is not stored yet, skipping the rest and any
+        repeats within analyses, in one INSERT ... ON CONFLICT DO NOTHING per batch where
+        the database can return the inserted rows; concurrent inserts of the same string
+        then never raise IntegrityError
+        Returns: the analyses that were inserted
+        """
+        unique = {}
+        for analysis in analyses:
+            unique.setdefault(analysis.sha256_hash, analysis)
+        analyses = list(unique.values())
+        batch_size = batch_size or len(analyses) or 1
+        
+        features = connections[self.db].features
+        if not (features.supports_ignore_conflicts and features.can_return_rows_from_bulk_insert):
+            return self._lookup_and_insert(analyses, batch_size)
+        
+        with transaction.atomic(using=self.db):
+            inserted = []
+            for start in range(0, len(analyses), batch_size):
+                inserted += self._insert_ignoring_conflicts(analyses[start:start + batch_size])
+            return self._announce_inserted(inserted, batch_size)
+    
+    def _insert_ignoring_conflicts(self, analyses):
+        """
+        INSERT ... ON CONFLICT DO NOTHING RETURNING id, sha256_hash
+        Returns: the analyses that were inserted, with their pk set
+        """
+        opts = self.model._meta
+        fields = [field for field in opts.concrete_fields if not field.primary_key]
+        connection = connections[self.db]
+        batch_size = connection.ops.bulk_batch_size(fields, analyses) or len(analyses)
+        
+        inserted = []
+        for start in range(0, len(analyses), batch_size):
+            batch = analyses[start:start + batch_size]
+            query = sql.InsertQuery(self.model, on_conflict=OnConflict.IGNORE)
+            query.insert_values(fields, batch)
+            compiler = query.get_compiler(using=self.db)
+            compiler.returning_fields = [opts.pk, opts.get_field('sha256_hash')]
+            with connection.cursor() as cursor:
+                for statement, params in compiler.as_sql():
+                    cursor.execute(statement, params)
+                ids = dict((sha256_hash, pk) for pk, sha256_hash in cursor.fetchall())
+            for analysis in batch:
+                if analysis.sha256_hash in ids:
+                    analysis.pk = ids[analysis.sha256_hash]
+                    analysis._state.adding = False
+                    analysis._state.db = self.db
+                    inserted.append(analysis)
+        return inserted
+    
+    def _lookup_and_insert(self, analyses, batch_size):
+        """
+        insert_new for databases without ON CONFLICT ... RETURNING: look up the stored
+        hashes, then bulk_insert the others, looking again once if a concurrent writer wins
+        """
+        hashes = [analysis.sha256_hash for analysis in analyses]
+        for attempt in range(2):
+            try:
+                with transaction.atomic(using=self.db):
+                    existing = set()
+                    for start in range(0, len(hashes), batch_size):
+                        existing.update(
+                            self.filter(
+                                sha256_hash__in=hashes[start:start + batch_size]
+                            ).values_list('sha256_hash', flat=True)
+                        )
+                    return self.bulk_insert(
+                        [analysis for analysis in analyses if analysis.sha256_hash not in existing],
+                        batch_size=batch_size,
+                    )
+            except IntegrityError:
+                if attempt:
+                    raise
+    
+    def _announce_inserted(self, analyses, batch_size=None):
+        """
+        Store the overflow character and trigram rows of freshly inserted analyses and send
+        analyses_created
+        """
+        OverflowCharacter.objects.using(self.db).bulk_create(
+            [row for analysis in analyses for row in analysis.overflow_character_rows()],
+            batch_size=batch_size,
+        )
+        if uses_trigram_table(self.db):
+            ValueTrigram.objects.using(self.db).index(analyses)
+        analyses_created.send(sender=StringAnalysis, analyses=analyses, using=self.db)
+        return analyses
+    
+    def delete(self):
+        """
+        Delete the matching rows and announce them with analyses_deleted
+        """
+        with transaction.atomic(using=self.db):
+            return self._delete_loaded(list(self.only(*StringAnalysis.SNAPSHOT_FIELDS)))
+    
+    delete.alters_data = True
+    delete.queryset_only = True
+    
+    def delete_in_chunks(self, chunk_size, resume_after=0):
+        """
+        Delete the matching rows in primary key order, chunk_size per transaction, so locks are
+        held briefly and an interrupted run loses at most its current chunk. Each chunk's rows
+        are locked and loaded with StringAnalysis.SNAPSHOT_FIELDS only, then deleted and
+        announced with analyses_deleted.
+        resume_after: skip rows with a primary key up to this, as yielded by an earlier run
+        Yields: (rows deleted, last primary key) after each chunk commits
+        """
+        queryset = self.order_by('pk').only(*StringAnalysis.SNAPSHOT_FIELDS)
+        while True:
+            with transaction.atomic(using=self.db):
+                analyses = list(queryset.filter(pk__gt=resume_after).select_for_update()[:chunk_size])
+                if not analyses:
+                    return
+                self._delete_loaded(analyses)
+            resume_after = analyses[-1].pk
+            yield len(analyses), resume_after
+            if len(analyses) < chunk_size:
+                return
+    
+    delete_in_chunks.alters_data = True
+    delete_in_chunks.queryset_only = True
+    
+    def _delete_loaded(self, analyses):
+        """
+        Delete analyses loaded with SNAPSHOT_FIELDS and send analyses_deleted, inside the
+        caller's transaction; cascades are collected by primary key alone, so no other
+        column is read again
+        """
+        result = StringAnalysis._base_manager.using(self.db).filter(
+            pk__in=[analysis.pk for analysis in analyses]
+        ).only('pk').delete()
+        analyses_deleted.send(sender=StringAnalysis, analyses=analyses, using=self.db)
+        return result
+    
+    def for_view(self, view):
+        """
+        Load only the columns a response view renders; 'summary' leaves value and
+        character_frequency in the database
+        """
+        if view == 'summary':
+            return self.only(*StringAnalysis.SUMMARY_FIELDS)
+        return self
+
 
 class StringAnalysis(models.Model):
-    value = models.TextField(unique=True)
+    # Unique through sha256_hash; an index over unbounded text would only slow writes
+    value = models.TextField()
     length = models.IntegerField()
     is_palindrome = models.BooleanField()
     word_count = models.IntegerField()
     unique_char_count = models.IntegerField()
-    character_frequency = models.JSONField()
+    # Packed; loads as a CharacterFrequency map that decodes on first access
+    character_frequency = CharacterFrequencyField()
+    character_mask = CharacterMaskField(default=0)
     sha256_hash = models.CharField(max_length=64, unique=True)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = StringAnalysisQuerySet.as_manager()
+    
+    # Columns loaded for analyses_deleted receivers when deleting through a queryset
+    SNAPSHOT_FIELDS = (
+        'id', 'sha256_hash', 'length', 'is_palindrome', 'word_count', 'character_frequency'
+    )
+    # Columns rendered by the summary view
+    SUMMARY_FIELDS = ('id', 'sha256_hash', 'length', 'is_palindrome', 'word_count', 'created_at')
+    
     class Meta:
         verbose_name_plural = "String Analyses"
+        # Shaped after the list/filter queries, which all order by -created_at:
+        # palindrome flag with a length range, length range alone, word_count equality
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='analysis_created_idx'),
+            models.Index(fields=['is_palindrome', 'length'], name='analysis_palindrome_len_idx'),
+            models.Index(fields=['length'], name='analysis_length_idx'),
+            models.Index(fields=['word_count', '-created_at'], name='analysis_word_count_idx'),
+            # Lets contains_character counts test the mask with an index-only scan
+            models.Index(fields=['character_mask', 'id'], name='analysis_char_mask_idx'),
+        ]
     
     def __str__(self):
         return f"{self.value[:50]}..." if len(self.value) > 50 else self.value
     
+    # The value the stored properties were last computed from
+    _analyzed_value = None
+    
     def save(self, *args, **kwargs):
-        self.length = len(self.value)
-        self.is_palindrome = self._check_palindrome()
-        self.word_count = self._count_words()
-        self.unique_char_count = self._count_unique_chars()
-        self.character_frequency = self._calculate_char_frequency()
-        self.sha256_hash = self._calculate_sha256()
+        if self._analyzed_value is not self.value:
+            self.analyze()
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
         
-        super().save(*args, **kwargs)
-    
-    def _check_palindrome(self):
-        cleaned = ''.join(char.lower() for char in self.value if char.isalnum())
-        return cleaned == cleaned[::-1]
+        # As save_base resolves it, so the transaction and the derived rows use the instance's database
+        using = kwargs.get('using') or router.db_for_write(StringAnalysis, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            OverflowCharacter.objects.using(self._state.db).bulk_create(self.overflow_character_rows())
+            if uses_trigram_table(self._state.db):
+                ValueTrigram.objects.using(self._state.db).index([self])
+            analyses_created.send(sender=StringAnalysis, analyses=[self], using=self._state.db)
     
-    def _count_words(self):
-        return len(self.value.split())
+    def delete(self, *args, **kwargs):
+        # Django clears pk on delete; receivers get a copy that still has it
+        snapshot = copy.copy(self)
+        using = kwargs.get('using') or self._state.db
+        with transaction.atomic(using=using):
+            result = super().delete(*args, **kwargs)
+            analyses_deleted.send(sender=StringAnalysis, analyses=[snapshot], using=using)
+        return result
     
-    def _count_unique_chars(self):
-        return len(set(self.value))
+    def analyze(self, properties=None):
+        """
+        Assign the derived properties of value without touching the database
+        properties: a precomputed analyze_string result, computed inline when omitted
+        """
+        if properties is None:
+            with stage('analyze'):
+                properties = analyze_string(self.value)
+        for field, result in properties.items():
+            setattr(self, field, result)
+        self._analyzed_value = self.value
+        return self
     
-    def _calculate_char_frequency(self):
-        freq = {}
-        for char in self.value:
-            freq[char] = freq.get(char, 0) + 1
-        return freq
-    
-    def _calculate_sha256(self):
-        return hashlib.sha256(self.value.encode('utf-8')).hexdigest()
+    def overflow_character_rows(self):
+        """
+        Unsaved OverflowCharacter rows for the characters character_mask cannot represent
+        """
+        _, overflow = character_signature(self.character_frequency)
+        return [OverflowCharacter(analysis_id=self.pk, character=char) for char in overflow]
     
     def to_dict(self):
         return {
@@ -56,8 +270,108 @@ class StringAnalysis(models.Model):
             'is_palindrome': self.is_palindrome,
             'word_count': self.word_count,
             'unique_char_count': self.unique_char_count,
-            'character_frequency': self.character_frequency,
+            'character_frequency': dict(self.character_frequency),
             'sha256_hash': self.sha256_hash,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+
+class OverflowCharacter(models.Model):
+    """
+    A case-folded character outside SIGNATURE_ALPHABET that a stored string contains
+    """
+    analysis = models.ForeignKey(
+        StringAnalysis,
+        on_delete=models.CASCADE,
+        related_name='overflow_characters'
+    )
+    character = models.CharField(max_length=8)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['character', 'analysis'],
+                name='overflow_character_unique'
+            ),
+        ]
+
+
+def uses_trigram_table(using):
+    """
+    Whether search goes through ValueTrigram rows on this database; PostgreSQL searches
+    value through a pg_trgm index instead, and its ValueTrigram table stays empty
+    """
+    return connections[using or 'default'].vendor != 'postgresql'
+
+
+class ValueTrigramQuerySet(models.QuerySet):
+    
+    def index(self, analyses):
+        """
+        Insert the postings of stored analyses in one executemany; building a model instance
+        per trigram for bulk_create costs several times the insert itself
+        """
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {quote(self.model._meta.db_table)} ({quote('analysis_id')}, {quote('trigram')}) "
+                f"VALUES (%s, %s)",
+                [(analysis.pk, trigram) for analysis in analyses for trigram in value_trigrams(analysis.value)],
+            )
+
+
+class ValueTrigram(models.Model):
+    """
+    A posting: a lower-cased three-character slice of a stored string, or one of the
+    markers value_trigrams adds
+    """
+    analysis = models.ForeignKey(
+        StringAnalysis,
+        on_delete=models.CASCADE,
+        related_name='trigrams'
+    )
+    trigram = models.CharField(max_length=3)
+    
+    objects = ValueTrigramQuerySet.as_manager()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['trigram', 'analysis'],
+                name='value_trigram_unique'
+            ),
+        ]
+
+
+class TableCounter(models.Model):
+    """
+    One slot of a named counter; the counter's value is the sum of its slots, so
+    concurrent writers rarely wait on the same row
+    """
+    name = models.CharField(max_length=50)
+    slot = models.PositiveSmallIntegerField()
+    value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'slot'], name='table_counter_unique'),
+        ]
+
+
+class StatsBucket(models.Model):
+    """
+    One slot of a rollup bucket: how many stored analyses have a given length, word_count
+    or is_palindrome value, or how often a character occurs across all of them.
+    Like TableCounter, a bucket's value is the sum of its slots.
+    """
+    dimension = models.CharField(max_length=20)
+    bucket = models.CharField(max_length=64)
+    slot = models.PositiveSmallIntegerField()
+    value = models.BigIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'bucket', 'slot'], name='stats_bucket_unique'),
+        ]
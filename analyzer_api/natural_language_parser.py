@@ -1,143 +1,178 @@
+from functools import lru_cache
 import re
+
+from django.conf import settings
 from django.db.models import Q
 
+from .filters import contains_character_q
+
+PALINDROME_TERMS = (
+    'palindrome', 'palindromic', 'same forwards and backwards',
+    'reads the same', 'symmetrical', 'mirror'
+)
+NEGATION_TERMS = ('not', 'non', 'no ')
+
+# Checked in this order; the first group with a term in the query sets the length lookup
+LENGTH_TERMS = (
+    ('gt', ('longer than', 'more than', 'greater than', 'over')),
+    ('lt', ('shorter than', 'less than', 'under')),
+    ('gte', ('at least', 'minimum', 'min')),
+    ('lte', ('at most', 'maximum', 'max')),
+)
+
+SINGLE_WORD_TERMS = ('single word', 'one word')
+MULTIPLE_WORDS_TERMS = ('multiple words', 'multi word', 'more than one word')
+NO_WORDS_TERMS = ('no words', 'zero words', 'empty string')
+WORD_COUNT_TERMS = {'two words': 2, 'three words': 3, 'four words': 4, 'five words': 5}
+
+# Tried in this order after the "containing/with/has <letter>" patterns
+CHARACTER_ALIASES = {
+    'first vowel': 'a',
+    'vowel a': 'a', 'vowel e': 'e', 'vowel i': 'i', 'vowel o': 'o', 'vowel u': 'u',
+    'letter a': 'a', 'letter b': 'b', 'letter c': 'c', 'letter z': 'z'
+}
+CHARACTER_KEYWORDS = ('containing', 'with', 'has')
+
+TERMS = tuple(sorted(set(
+    PALINDROME_TERMS + NEGATION_TERMS
+    + tuple(term for _, terms in LENGTH_TERMS for term in terms)
+    + SINGLE_WORD_TERMS + MULTIPLE_WORDS_TERMS + NO_WORDS_TERMS
+    + tuple(WORD_COUNT_TERMS) + tuple(CHARACTER_ALIASES)
+    + ('character', 'word')
+)))
+
+NUMBER_RE = re.compile(r'\b\d+\b')
+
+# Zero-width, so overlapping "<keyword> <letter>" occurrences are all found in one pass
+CHARACTER_RE = re.compile(
+    r'(?=(?P<keyword>' + '|'.join(CHARACTER_KEYWORDS) + r')\s+[\'"]?(?P<char>[a-zA-Z]))'
+)
+
+
+def _lookup_key(field, lookup):
+    return field if lookup == 'exact' else f'{field}__{lookup}'
+
+
+class QueryTokens:
+    """
+    Everything the planner needs from a normalized query, extracted once
+    """
+
+    def __init__(self, query):
+        # Substring tests over a short query beat a large alternation regex in CPython
+        self.terms = {term for term in TERMS if term in query}
+        self.numbers = [int(number) for number in NUMBER_RE.findall(query)]
+        self.characters = {}
+        for match in CHARACTER_RE.finditer(query):
+            self.characters.setdefault(match.group('keyword'), match.group('char'))
+
+    def has_any(self, terms):
+        return not self.terms.isdisjoint(terms)
+
+
 class NaturalLanguageQueryParser:
     """
     Natural language query parser for string analysis filters
     """
-    
+
     @staticmethod
     def parse(query):
         """
         Parse natural language query and return Django Q filters
-        Returns: Q object for filtering
+        Returns: (Q object for filtering, parsed_filters dict)
         Raises: ValueError if query cannot be parsed
         """
         query = query.lower().strip()
-        
+
         if not query:
             raise ValueError("Query cannot be empty")
-        
+
+        filters, parsed_filters = NaturalLanguageQueryParser._plan(query)
+        return filters, dict(parsed_filters)
+
+    @staticmethod
+    @lru_cache(maxsize=settings.NL_QUERY_CACHE_SIZE)
+    def _plan(query):
+        """Build the filters for a normalized query; memoized since dashboards repeat queries"""
+        tokens = QueryTokens(query)
         filters = Q()
         parsed_filters = {}
-    
-        palindrome_filters = NaturalLanguageQueryParser._parse_palindrome(query)
-        if palindrome_filters:
-            filters &= palindrome_filters
+
+        is_palindrome = NaturalLanguageQueryParser._parse_palindrome(tokens)
+        if is_palindrome is not None:
+            filters &= Q(is_palindrome=is_palindrome)
             parsed_filters['is_palindrome'] = True
-        
-        length_filters = NaturalLanguageQueryParser._parse_length(query)
-        if length_filters:
-            filters &= length_filters
-            if hasattr(length_filters, 'children'):
-                for field, value in length_filters.children:
-                    if 'length__gt' in str(field):
-                        parsed_filters['min_length'] = value + 1
-                    elif 'length__gte' in str(field):
-                        parsed_filters['min_length'] = value
-        
-        word_filters = NaturalLanguageQueryParser._parse_word_count(query)
-        if word_filters:
-            filters &= word_filters
-            if hasattr(word_filters, 'children'):
-                for field, value in word_filters.children:
-                    if 'word_count' in str(field):
-                        parsed_filters['word_count'] = value
-    
-        char_filters = NaturalLanguageQueryParser._parse_contains_character(query)
-        if char_filters:
-            filters &= char_filters
-            if hasattr(char_filters, 'children'):
-                for field, value in char_filters.children:
-                    if 'value__icontains' in str(field):
-                        parsed_filters['contains_character'] = value
-        
+
+        length = NaturalLanguageQueryParser._parse_length(tokens)
+        if length:
+            lookup, number = length
+            filters &= Q(**{_lookup_key('length', lookup): number})
+            # Reported as the parser always has: gt and gte both show number + 1
+            if lookup in ('gt', 'gte'):
+                parsed_filters['min_length'] = number + 1
+
+        word_count = NaturalLanguageQueryParser._parse_word_count(tokens)
+        if word_count:
+            lookup, number = word_count
+            filters &= Q(**{_lookup_key('word_count', lookup): number})
+            parsed_filters['word_count'] = number
+
+        char = NaturalLanguageQueryParser._parse_contains_character(tokens)
+        if char:
+            filters &= contains_character_q(char)
+            parsed_filters['contains_character'] = char
+
         return filters, parsed_filters
-    
+
     @staticmethod
-    def _parse_palindrome(query):
-        """Parse palindrome-related queries"""
-        palindrome_terms = [
-            'palindrome', 'palindromic', 'same forwards and backwards', 
-            'reads the same', 'symmetrical', 'mirror'
-        ]
-        
-        if any(term in query for term in palindrome_terms):
-            if any(negation in query for negation in ['not', 'non', 'no ']):
-                return Q(is_palindrome=False)
-            else:
-                return Q(is_palindrome=True)
+    def _parse_palindrome(tokens):
+        """Parse palindrome-related queries, returning the is_palindrome value"""
+        if tokens.has_any(PALINDROME_TERMS):
+            return not tokens.has_any(NEGATION_TERMS)
         return None
-    
+
     @staticmethod
-    def _parse_length(query):
-        """Parse length-related queries"""
-        numbers = re.findall(r'\b\d+\b', query)
-        
-        if not numbers:
+    def _parse_length(tokens):
+        """Parse length-related queries, returning (lookup, number)"""
+        if not tokens.numbers:
             return None
-        
-        number = int(numbers[0])
-        if any(term in query for term in ['longer than', 'more than', 'greater than', 'over']):
-            return Q(length__gt=number)
-        if any(term in query for term in ['shorter than', 'less than', 'under']):
-            return Q(length__lt=number)
-        if any(term in query for term in ['at least', 'minimum', 'min']):
-            return Q(length__gte=number)
-        if any(term in query for term in ['at most', 'maximum', 'max']):
-            return Q(length__lte=number)
-        if 'character' in query and len(numbers) == 1:
-            return Q(length=number)
-        
+
+        number = tokens.numbers[0]
+        for lookup, terms in LENGTH_TERMS:
+            if tokens.has_any(terms):
+                return lookup, number
+        if 'character' in tokens.terms and len(tokens.numbers) == 1:
+            return 'exact', number
+
         return None
-    
+
     @staticmethod
-    def _parse_word_count(query):
-        """Parse word count related queries"""
-        if any(term in query for term in ['single word', 'one word']):
-            return Q(word_count=1)
-        if any(term in query for term in ['multiple words', 'multi word', 'more than one word']):
-            return Q(word_count__gt=1)
-        if any(term in query for term in ['no words', 'zero words', 'empty string']):
-            return Q(word_count=0)
-        word_count_map = {
-            'two words': 2, 'three words': 3, 'four words': 4, 'five words': 5
-        }
-        
-        for term, count in word_count_map.items():
-            if term in query:
-                return Q(word_count=count)
-        numbers = re.findall(r'\b\d+\b', query)
-        if numbers and 'word' in query:
-            return Q(word_count=int(numbers[0]))
-        
+    def _parse_word_count(tokens):
+        """Parse word count related queries, returning (lookup, number)"""
+        if tokens.has_any(SINGLE_WORD_TERMS):
+            return 'exact', 1
+        if tokens.has_any(MULTIPLE_WORDS_TERMS):
+            return 'gt', 1
+        if tokens.has_any(NO_WORDS_TERMS):
+            return 'exact', 0
+
+        for term, count in WORD_COUNT_TERMS.items():
+            if term in tokens.terms:
+                return 'exact', count
+        if tokens.numbers and 'word' in tokens.terms:
+            return 'exact', tokens.numbers[0]
+
         return None
-    
+
     @staticmethod
-    def _parse_contains_character(query):
-        """Parse contains character queries"""
-        char_patterns = [
-            r'containing\s+[\'"]?([a-zA-Z])[\'"]?',
-            r'with\s+[\'"]?([a-zA-Z])[\'"]?',
-            r'has\s+[\'"]?([a-zA-Z])[\'"]?',
-            r'containing\s+the\s+letter\s+([a-zA-Z])',
-            r'with\s+the\s+letter\s+([a-zA-Z])',
-            r'has\s+the\s+letter\s+([a-zA-Z])'
-        ]
-        
-        for pattern in char_patterns:
-            match = re.search(pattern, query)
-            if match:
-                char = match.group(1).lower()
-                return Q(value__icontains=char)
-        char_aliases = {
-            'first vowel': 'a',
-            'vowel a': 'a', 'vowel e': 'e', 'vowel i': 'i', 'vowel o': 'o', 'vowel u': 'u',
-            'letter a': 'a', 'letter b': 'b', 'letter c': 'c', 'letter z': 'z'
-        }
-        
-        for alias, char in char_aliases.items():
-            if alias in query:
-                return Q(value__icontains=char)
-        
-        return None
\ No newline at end of file
+    def _parse_contains_character(tokens):
+        """Parse contains character queries, returning the character"""
+        for keyword in CHARACTER_KEYWORDS:
+            if keyword in tokens.characters:
+                return tokens.characters[keyword].lower()
+
+        for alias, char in CHARACTER_ALIASES.items():
+            if alias in tokens.terms:
+                return char
+
+        return None
@@ -0,0 +1,89 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over (created_at, id), newest first
+    The queryset must be ordered by ('-created_at', '-id')
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Returns: the rows of the requested page
+        Raises: ValueError if the cursor or page size is invalid
+        """
+        return self._set_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset for async views
+        """
+        return self._set_page([row async for row in self._page_queryset(queryset, request)])
+
+    def validate_query_params(self, request):
+        """
+        Raises: ValueError if the cursor or page size is invalid
+        """
+        self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            self.decode_cursor(cursor)
+
+    def _page_queryset(self, queryset, request):
+        """
+        The queryset for the requested page, with one extra row to tell whether another follows
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            )
+        return queryset[:self.page_size + 1]
+
+    def _set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None:
+            return settings.REST_FRAMEWORK['PAGE_SIZE']
+        page_size = int(page_size)
+        if page_size < 1:
+            raise ValueError("page_size must be a positive integer")
+        return min(page_size, settings.MAX_PAGE_SIZE)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = self.encode_cursor(self.last_row.created_at, self.last_row.pk)
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    @staticmethod
+    def encode_cursor(created_at, pk):
+        position = f"{created_at.isoformat()}|{pk}"
+        return urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            created_at, pk = urlsafe_b64decode(cursor.encode('ascii')).decode('ascii').split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except (TypeError, ValueError, UnicodeError) as e:
+            raise ValueError("Invalid cursor") from e
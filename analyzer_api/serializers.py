@@ -1,6 +1,19 @@
+import json
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from .fields import CharacterFrequency
+from .instrumentation import stage
 from .models import StringAnalysis
 
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder produces the same bytes
+    orjson = None
+
 class StringAnalysisSerializer(serializers.ModelSerializer):
     id = serializers.CharField(source='sha256_hash', read_only=True)
     properties = serializers.SerializerMethodField()
@@ -19,5 +32,222 @@ class StringAnalysisSerializer(serializers.ModelSerializer):
             'unique_characters': obj.unique_char_count,
             'word_count': obj.word_count,
             'sha256_hash': obj.sha256_hash,
-            'character_frequency_map': obj.character_frequency
-        }
\ No newline at end of file
+            'character_frequency_map': dict(obj.character_frequency)
+        }
+
+
+class StringAnalysisSummarySerializer(serializers.ModelSerializer):
+    """
+    The view=summary shape: no value or character frequencies
+    """
+    id = serializers.CharField(source='sha256_hash', read_only=True)
+    properties = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = StringAnalysis
+        fields = [
+            'id', 'properties', 'created_at'
+        ]
+        read_only_fields = fields
+    
+    def get_properties(self, obj):
+        return {
+            'length': obj.length,
+            'is_palindrome': obj.is_palindrome,
+            'word_count': obj.word_count
+        }
+
+
+ANALYSIS_VIEWS = ('full', 'summary')
+
+
+def render_analysis(analysis, view='full'):
+    """
+    The JSON body of a single analysis response, as bytes
+    """
+    with stage('serialize'):
+        return ROW_RENDERERS[view](analysis)
+
+
+# Fast path: the same bytes JSONRenderer produces for StringAnalysisSerializer and
+# StringAnalysisSummarySerializer data, written directly from columns
+ANALYSIS_ROW_FIELDS = (
+    'pk', 'sha256_hash', 'value', 'length', 'is_palindrome', 'unique_char_count',
+    'word_count', 'created_at', 'character_frequency',
+)
+SUMMARY_ROW_FIELDS = ('pk', 'sha256_hash', 'length', 'is_palindrome', 'word_count', 'created_at')
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def analysis_rows(queryset, view='full'):
+    """
+    Named rows with every column the view's renderer needs
+    """
+    if view == 'summary':
+        return queryset.values_list(*SUMMARY_ROW_FIELDS, named=True)
+    return queryset.values_list(*ANALYSIS_ROW_FIELDS, named=True)
+
+
+def render_analysis_row(row, datetime_field=None):
+    """
+    Render a row from analysis_rows(), or a StringAnalysis instance, as the detail JSON body
+    """
+    datetime_field = datetime_field or _datetime_field()
+    frequency = frequency_json(row.character_frequency)
+    created_at = datetime_field.to_representation(row.created_at)
+    return b''.join((
+        b'{"id":"', row.sha256_hash.encode('ascii'),
+        b'","value":', _dumps(row.value),
+        b',"properties":{"length":', b'%d' % row.length,
+        b',"is_palindrome":', b'true' if row.is_palindrome else b'false',
+        b',"unique_characters":', b'%d' % row.unique_char_count,
+        b',"word_count":', b'%d' % row.word_count,
+        b',"sha256_hash":"', row.sha256_hash.encode('ascii'),
+        b'","character_frequency_map":', frequency,
+        b'},"created_at":', _dumps(created_at),
+        b'}',
+    ))
+
+
+def render_analysis_summary_row(row, datetime_field=None):
+    """
+    Render a summary row from analysis_rows(), or a StringAnalysis instance, as the summary JSON body
+    """
+    datetime_field = datetime_field or _datetime_field()
+    return b''.join((
+        b'{"id":"', row.sha256_hash.encode('ascii'),
+        b'","properties":{"length":', b'%d' % row.length,
+        b',"is_palindrome":', b'true' if row.is_palindrome else b'false',
+        b',"word_count":', b'%d' % row.word_count,
+        b'},"created_at":', _dumps(datetime_field.to_representation(row.created_at)),
+        b'}',
+    ))
+
+
+ROW_RENDERERS = {'full': render_analysis_row, 'summary': render_analysis_summary_row}
+
+
+def render_analysis_rows(rows, view='full'):
+    """
+    Lazily render each row with the view's row renderer
+    """
+    render_row = ROW_RENDERERS[view]
+    datetime_field = _datetime_field()
+    for row in rows:
+        yield render_row(row, datetime_field)
+
+
+async def arender_analysis_rows(rows, view='full'):
+    """
+    render_analysis_rows over an async iterator of rows, such as analysis_rows(...).aiterator()
+    """
+    render_row = ROW_RENDERERS[view]
+    datetime_field = _datetime_field()
+    async for row in rows:
+        yield render_row(row, datetime_field)
+
+
+def render_analysis_list(rows, view='full', **fields):
+    """
+    Render {"data": [...rows], **fields} exactly as JSONRenderer would
+    """
+    with stage('serialize'):
+        data = b'[' + b','.join(render_analysis_rows(rows, view)) + b']'
+        if not fields:
+            return b'{"data":' + data + b'}'
+        return b'{"data":' + data + b',' + JSONRenderer().render(fields)[1:]
+
+
+def render_batch(items):
+    """
+    The POST /strings/batch body: {"results": [...]} holding each created analysis's
+    render_analysis body under "data", or its error, with created, conflicts and failed counts
+    items: (status_code, body_bytes_or_error_dict) per input value, in input order
+    """
+    with stage('serialize'):
+        counts = {"created": 0, "conflicts": 0, "failed": 0}
+        rendered = []
+        for status_code, outcome in items:
+            if status_code == 201:
+                rendered.append(b'{"status":201,"data":' + outcome + b'}')
+                counts["created"] += 1
+            else:
+                rendered.append(JSONRenderer().render({"status": status_code, **outcome}))
+                counts["conflicts" if status_code == 409 else "failed"] += 1
+        return b'{"results":[' + b','.join(rendered) + b'],' + JSONRenderer().render(counts)[1:]
+
+
+def render_lookup(results, view='full', exists_only=False):
+    """
+    The POST /strings/lookup body for lookup_string_analyses results: {"results": [...]}
+    holding each analysis or null, or {"exists": [...]} of booleans, with found and missing counts
+    """
+    with stage('serialize'):
+        found = sum(result is not None for result in results)
+        counts = b'"found":%d,"missing":%d}' % (found, len(results) - found)
+        if exists_only:
+            return b'{"exists":[' + b','.join(b'false' if result is None else b'true' for result in results) + b'],' + counts
+        render_row = ROW_RENDERERS[view]
+        datetime_field = _datetime_field()
+        rendered = {}
+        items = []
+        for row in results:
+            if row is None:
+                items.append(b'null')
+                continue
+            if row.sha256_hash not in rendered:
+                rendered[row.sha256_hash] = render_row(row, datetime_field)
+            items.append(rendered[row.sha256_hash])
+        return b'{"results":[' + b','.join(items) + b'],' + counts
+
+
+def render_similar(sha256_hash, metric, neighbours, view='full'):
+    """
+    The /strings/{string_value}/similar body: each neighbour rendered as by render_analysis,
+    with its distance added, closest first
+    """
+    with stage('serialize'):
+        render_row = ROW_RENDERERS[view]
+        datetime_field = _datetime_field()
+        data = b','.join(
+            render_row(analysis, datetime_field)[:-1] + b',"distance":' + _dumps(round(distance, 6)) + b'}'
+            for analysis, distance in neighbours
+        )
+        return b''.join((
+            b'{"id":"', sha256_hash.encode('ascii'), b'","metric":', _dumps(metric), b',"data":[', data, b']}'
+        ))
+
+
+def _datetime_field():
+    """
+    A DateTimeField with the format and current timezone resolved up front rather than per row
+    """
+    return serializers.DateTimeField(
+        format=api_settings.DATETIME_FORMAT,
+        default_timezone=timezone.get_current_timezone() if settings.USE_TZ else None,
+    )
+
+
+def _dumps(obj):
+    """
+    Compact UTF-8 JSON with U+2028/U+2029 escaped, matching JSONRenderer
+    """
+    if orjson is not None:
+        try:
+            data = orjson.dumps(obj)
+        except TypeError:
+            pass  # e.g. lone surrogates, which orjson rejects; let the stdlib path decide
+        else:
+            return data.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    text = _ENCODER.encode(obj).replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    return text.encode('utf-8')
+
+
+def frequency_json(frequency):
+    """
+    A character_frequency map, packed from the database or a plain dict, as compact JSON bytes
+    """
+    if isinstance(frequency, CharacterFrequency):
+        frequency = frequency.decoded()
+    return _dumps(frequency)
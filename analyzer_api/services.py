@@ -1,72 +1,369 @@
-from django.db import IntegrityError
+import hashlib
+import re
+
+from django.conf import settings
+from .cache import get_result_cache
+from .executors import get_analysis_executor
+from .instrumentation import stage
 from .models import StringAnalysis
+from .serializers import ANALYSIS_VIEWS, analysis_rows, render_analysis
+
+IDENTIFIER_KINDS = (None, 'hash', 'value')
+HEX_DIGEST_RE = re.compile(r'[0-9a-fA-F]{64}')
 
 class StringAnalysisService:
     
     @staticmethod
-    def create_string_analysis(value):
+    def create_string_analysis(value, upsert=False):
         """
-        Create a new string analysis
+        Create a new string analysis with a single conflict-ignoring insert, so concurrent
+        posts of the same string get 201 once and 409 otherwise
+        upsert: return an already stored analysis with 200 instead of 409
         Returns: (analysis_object, error_message, status_code)
         """
         if value is None:
             return None, {"error": "Missing 'value' field"}, 400
         if not isinstance(value, str):
             return None, {"error": "Value must be a string"}, 422
-        if StringAnalysis.objects.filter(value=value).exists():
-            return None, {"error": "String already exists"}, 409
         
         try:
             analysis = StringAnalysis(value=value)
-            analysis.save()
-            return analysis, None, 201
-            
+            with stage('analyze'):
+                analysis.analyze(get_analysis_executor().analyze(value))
+            if StringAnalysis.objects.insert_new([analysis]):
+                return analysis, None, 201
         except Exception as e:
             return None, {"error": "Failed to process string", "details": str(e)}, 422
+        
+        if not upsert:
+            return None, {"error": "String already exists"}, 409
+        try:
+            return StringAnalysis.objects.get(sha256_hash=analysis.sha256_hash), None, 200
+        except StringAnalysis.DoesNotExist:
+            # Deleted since the insert conflicted with it
+            return StringAnalysisService.create_string_analysis(value, upsert)
     
     @staticmethod
-    def get_string_analysis(identifier):
+    def create_string_analyses(values):
+        """
+        Create analyses for a batch of strings with one existence lookup and one bulk insert
+        Returns: (results, error_message, status_code)
+        results holds one (status_code, analysis_or_error) pair per input value, in input order
+        """
+        if values is None:
+            return None, {"error": "Missing 'values' field"}, 400
+        if not isinstance(values, list):
+            return None, {"error": "Values must be a list of strings"}, 422
+        if len(values) > settings.STRING_BATCH_MAX_SIZE:
+            return None, {
+                "error": f"Batch cannot contain more than {settings.STRING_BATCH_MAX_SIZE} values"
+            }, 400
+        
+        results = [None] * len(values)
+        indexes = []
+        for index, value in enumerate(values):
+            if isinstance(value, str):
+                indexes.append(index)
+            else:
+                results[index] = (422, {"error": "Value must be a string"})
+        with stage('analyze'):
+            analyzed = get_analysis_executor().analyze_many([values[index] for index in indexes])
+        
+        pending = {}
+        for index, properties in zip(indexes, analyzed):
+            if isinstance(properties, Exception):
+                results[index] = (422, {"error": "Failed to process string", "details": str(properties)})
+                continue
+            analysis = StringAnalysis(value=values[index]).analyze(properties)
+            if analysis.sha256_hash in pending:
+                results[index] = (409, {"error": "String already exists"})
+                continue
+            pending[analysis.sha256_hash] = (index, analysis)
+        
+        created = {
+            analysis.sha256_hash
+            for analysis in StringAnalysis.objects.insert_new(
+                [analysis for index, analysis in pending.values()],
+                batch_size=settings.STRING_BATCH_QUERY_CHUNK_SIZE,
+            )
+        }
+        
+        for sha256_hash, (index, analysis) in pending.items():
+            if sha256_hash in created:
+                results[index] = (201, analysis)
+            else:
+                results[index] = (409, {"error": "String already exists"})
+        
+        return results, None, 200
+    
+    @staticmethod
+    def get_string_analysis(identifier, by=None, view='full'):
         """
         Get string analysis by value or hash
+        by: 'value' or 'hash' to only match that way, None to try both (value first)
+        view: 'summary' to load only the summary columns
         Returns: (analysis_object, error_message, status_code)
         """
+        if by not in IDENTIFIER_KINDS:
+            return None, {"error": "by must be one of: hash, value"}, 400
         try:
-            analysis = StringAnalysisService._find_analysis(identifier)
+            analysis = StringAnalysisService._find_analysis(identifier, by, view)
             return analysis, None, 200
         except StringAnalysis.DoesNotExist:
             return None, {"error": "String analysis not found"}, 404
     
     @staticmethod
-    def delete_string_analysis(identifier):
+    def lookup_string_analyses(identifiers, by=None, view='full', exists_only=False):
+        """
+        Resolve many identifiers, each as get_string_analysis would, hashing values locally
+        and querying sha256_hash__in once per STRING_BATCH_QUERY_CHUNK_SIZE hashes
+        exists_only: fetch only the hashes and report True for stored analyses
+        Returns: (results, error_message, status_code)
+        results holds, per identifier in input order, its row from analysis_rows() (or True
+        with exists_only), or None when it is not stored
+        """
+        error = StringAnalysisService._lookup_error(by, view)
+        if error:
+            return None, error, 400
+        if identifiers is None:
+            return None, {"error": "Missing 'identifiers' field"}, 400
+        if not isinstance(identifiers, list) or not all(isinstance(item, str) for item in identifiers):
+            return None, {"error": "Identifiers must be a list of strings"}, 422
+        if len(identifiers) > settings.STRING_LOOKUP_MAX_SIZE:
+            return None, {
+                "error": f"Lookup cannot contain more than {settings.STRING_LOOKUP_MAX_SIZE} identifiers"
+            }, 400
+        
+        candidates = [StringAnalysisService._candidate_hashes(identifier, by) for identifier in identifiers]
+        hashes = list(dict.fromkeys(sha256_hash for hashes in candidates for sha256_hash in hashes))
+        chunk_size = settings.STRING_BATCH_QUERY_CHUNK_SIZE
+        found = {}
+        for start in range(0, len(hashes), chunk_size):
+            queryset = StringAnalysis.objects.filter(sha256_hash__in=hashes[start:start + chunk_size])
+            if exists_only:
+                found.update(dict.fromkeys(queryset.values_list('sha256_hash', flat=True), True))
+            else:
+                found.update((row.sha256_hash, row) for row in analysis_rows(queryset, view))
+        
+        results = []
+        for hashes in candidates:
+            results.append(next((found[sha256_hash] for sha256_hash in hashes if sha256_hash in found), None))
+        return results, None, 200
+    
+    @staticmethod
+    def get_string_analysis_json(identifier, by=None, view='full'):
+        """
+        Get the rendered JSON of a string analysis by value or hash, from the result cache when possible;
+        a cached lower priority candidate is only used once the database holds no higher one
+        view: 'summary' renders the slim shape straight from the summary columns, uncached
+        Returns: ((sha256_hash, json_bytes), error_message, status_code)
+        """
+        error = StringAnalysisService._lookup_error(by, view)
+        if error:
+            return None, error, 400
+        if view == 'summary':
+            analysis, error, status_code = StringAnalysisService.get_string_analysis(identifier, by, view)
+            if error:
+                return None, error, status_code
+            return (analysis.sha256_hash, render_analysis(analysis, view)), None, 200
+        
+        cache = get_result_cache()
+        candidates = StringAnalysisService._candidate_hashes(identifier, by)
+        if candidates:
+            body = cache.get(candidates[0])
+            if body is not None:
+                return (candidates[0], body), None, 200
+        if len(candidates) > 1:
+            # A lower priority candidate's cached body only answers once no higher one is stored
+            stored = StringAnalysis.objects.filter(sha256_hash__in=candidates).values_list('sha256_hash', flat=True)
+            sha256_hash, error, status_code = StringAnalysisService._resolved_hash(candidates, set(stored))
+            if error:
+                return None, error, status_code
+            body = cache.get(sha256_hash)
+            if body is not None:
+                return (sha256_hash, body), None, 200
+        
+        analysis, error, status_code = StringAnalysisService.get_string_analysis(identifier, by)
+        if error:
+            return None, error, status_code
+        
+        body = render_analysis(analysis)
+        cache.set(analysis.sha256_hash, body)
+        return (analysis.sha256_hash, body), None, 200
+    
+    @staticmethod
+    async def aget_string_analysis_json(identifier, by=None, view='full'):
+        """
+        get_string_analysis_json for async views, using the async ORM and cache API
+        Returns: ((sha256_hash, json_bytes), error_message, status_code)
+        """
+        error = StringAnalysisService._lookup_error(by, view)
+        if error:
+            return None, error, 400
+        cache = get_result_cache()
+        candidates = StringAnalysisService._candidate_hashes(identifier, by)
+        if view == 'full' and candidates:
+            body = await cache.aget(candidates[0])
+            if body is not None:
+                return (candidates[0], body), None, 200
+        if view == 'full' and len(candidates) > 1:
+            stored = StringAnalysis.objects.filter(sha256_hash__in=candidates).values_list('sha256_hash', flat=True)
+            sha256_hash, error, status_code = StringAnalysisService._resolved_hash(
+                candidates, {sha256_hash async for sha256_hash in stored}
+            )
+            if error:
+                return None, error, status_code
+            body = await cache.aget(sha256_hash)
+            if body is not None:
+                return (sha256_hash, body), None, 200
+        
+        queryset = StringAnalysis.objects.for_view(view).filter(sha256_hash__in=candidates)
+        analysis = StringAnalysisService._pick_match(candidates, [analysis async for analysis in queryset])
+        if analysis is None:
+            return None, {"error": "String analysis not found"}, 404
+        
+        body = render_analysis(analysis, view)
+        if view == 'full':
+            await cache.aset(analysis.sha256_hash, body)
+        return (analysis.sha256_hash, body), None, 200
+    
+    @staticmethod
+    def resolve_string_analysis_hash(identifier, by=None, view='full'):
+        """
+        The sha256_hash an identifier resolves to, without loading or rendering the analysis:
+        from the result cache when it holds the highest priority candidate, else from the
+        sha256_hash index, so it always agrees with get_string_analysis_json
+        Returns: (sha256_hash, error_message, status_code)
+        """
+        error = StringAnalysisService._lookup_error(by, view)
+        if error:
+            return None, error, 400
+        candidates = StringAnalysisService._candidate_hashes(identifier, by)
+        if candidates and get_result_cache().get(candidates[0]) is not None:
+            return candidates[0], None, 200
+        
+        stored = StringAnalysis.objects.filter(sha256_hash__in=candidates).values_list('sha256_hash', flat=True)
+        return StringAnalysisService._resolved_hash(candidates, set(stored))
+    
+    @staticmethod
+    async def aresolve_string_analysis_hash(identifier, by=None, view='full'):
+        error = StringAnalysisService._lookup_error(by, view)
+        if error:
+            return None, error, 400
+        candidates = StringAnalysisService._candidate_hashes(identifier, by)
+        if candidates and await get_result_cache().aget(candidates[0]) is not None:
+            return candidates[0], None, 200
+        
+        stored = StringAnalysis.objects.filter(sha256_hash__in=candidates).values_list('sha256_hash', flat=True)
+        return StringAnalysisService._resolved_hash(candidates, {sha256_hash async for sha256_hash in stored})
+    
+    @staticmethod
+    def _resolved_hash(candidates, stored):
+        """The highest priority stored candidate as (sha256_hash, error_message, status_code)"""
+        for sha256_hash in candidates:
+            if sha256_hash in stored:
+                return sha256_hash, None, 200
+        return None, {"error": "String analysis not found"}, 404
+    
+    @staticmethod
+    def _lookup_error(by, view):
+        """The error for invalid by/view lookup parameters, or None"""
+        if by not in IDENTIFIER_KINDS:
+            return {"error": "by must be one of: hash, value"}
+        if view not in ANALYSIS_VIEWS:
+            return {"error": f"view must be one of: {', '.join(ANALYSIS_VIEWS)}"}
+        return None
+    
+    @staticmethod
+    def _candidate_hashes(identifier, by=None):
+        """Hashes an identifier can resolve to, in priority order: its own hash as a value, then itself"""
+        candidates = []
+        if by != 'hash':
+            try:
+                # Strict UTF-8, as analyze_string hashes: no stored value holds a lone surrogate
+                candidates.append(hashlib.sha256(identifier.encode('utf-8')).hexdigest())
+            except UnicodeEncodeError:
+                pass
+        if by != 'value' and HEX_DIGEST_RE.fullmatch(identifier):
+            candidates.append(identifier.lower())
+        return candidates
+    
+    @staticmethod
+    def delete_string_analysis(identifier, by=None):
         """
         Delete string analysis by value or hash
         Returns: (success, error_message, status_code)
         """
+        if by not in IDENTIFIER_KINDS:
+            return False, {"error": "by must be one of: hash, value"}, 400
         try:
-            analysis = StringAnalysisService._find_analysis(identifier)
+            analysis = StringAnalysisService._find_analysis(identifier, by)
             analysis.delete()
             return True, None, 204
         except StringAnalysis.DoesNotExist:
             return False, {"error": "String does not exist in the system"}, 404
     
     @staticmethod
-    def _find_analysis(identifier):
-        """Helper method to find analysis by value or hash"""
-        try:
-            return StringAnalysis.objects.get(value=identifier)
-        except StringAnalysis.DoesNotExist:
-            if len(identifier) == 64 and all(c in '0123456789abcdef' for c in identifier.lower()):
-                return StringAnalysis.objects.get(sha256_hash=identifier)
+    def _find_analysis(identifier, by=None, view='full'):
+        """Helper method to find analysis by value or hash with a single sha256_hash lookup"""
+        candidates = StringAnalysisService._candidate_hashes(identifier, by)
+        analysis = StringAnalysisService._pick_match(
+            candidates, StringAnalysis.objects.for_view(view).filter(sha256_hash__in=candidates)
+        )
+        if analysis is None:
             raise StringAnalysis.DoesNotExist("String does not exist in the system")
+        return analysis
+    
+    @staticmethod
+    def _pick_match(candidates, analyses):
+        """The analysis matching the highest priority candidate hash, or None"""
+        matches = {analysis.sha256_hash: analysis for analysis in analyses}
+        for sha256_hash in candidates:
+            if sha256_hash in matches:
+                return matches[sha256_hash]
+        return None
     
     @staticmethod
-    def get_filtered_analyses(filters):
+    def get_similar_analyses(identifier, k=10, metric='cosine', by=None, view='full'):
+        """
+        The k stored analyses whose character-frequency profiles are closest to the identified one
+        Returns: ((sha256_hash, [(analysis, distance), ...] closest first), error_message, status_code)
+        """
+        from . import similarity
+        if similarity.np is None:
+            return None, {"error": "Similarity search is unavailable: numpy is not installed"}, 501
+        error = StringAnalysisService._lookup_error(by, view)
+        if error:
+            return None, error, 400
+        if metric not in similarity.METRICS:
+            return None, {"error": f"metric must be one of: {', '.join(similarity.METRICS)}"}, 400
+        if not 1 <= k <= settings.SIMILARITY_MAX_K:
+            return None, {"error": f"k must be between 1 and {settings.SIMILARITY_MAX_K}"}, 400
+        
+        candidates = StringAnalysisService._candidate_hashes(identifier, by)
+        target = StringAnalysisService._pick_match(
+            candidates,
+            StringAnalysis.objects.only('pk', 'sha256_hash', 'character_frequency').filter(sha256_hash__in=candidates)
+        )
+        if target is None:
+            return None, {"error": "String analysis not found"}, 404
+        
+        nearest = similarity.ensure_built().nearest(
+            similarity.frequency_vector(target.character_frequency), k, metric, exclude=[target.pk]
+        )
+        # The index can briefly hold rows deleted by transactions that are still committing
+        analyses = StringAnalysis.objects.for_view(view).in_bulk([pk for pk, _ in nearest])
+        neighbours = [(analyses[pk], distance) for pk, distance in nearest if pk in analyses]
+        return (target.sha256_hash, neighbours), None, 200
+    
+    @staticmethod
+    def get_filtered_analyses(filters, view='full'):
         """
         Get filtered analyses based on query parameters
         Returns: (queryset, error_message, status_code)
         """
         try:
-            queryset = StringAnalysis.objects.all().order_by('-created_at')
+            queryset = StringAnalysis.objects.for_view(view).order_by('-created_at')
             
             # Apply standard filters
             from .filters import StringAnalysisFilter
@@ -82,7 +379,29 @@ class StringAnalysisService:
             return None, {"error": "Invalid query parameters", "details": str(e)}, 400
     
     @staticmethod
-    def get_natural_language_results(query):
+    def get_deletable_analyses(filters):
+        """
+        The analyses matching StringAnalysisDeleteFilter filters, for delete_in_chunks;
+        at least one filter is required, so nothing deletes the whole table by omission
+        Returns: (queryset, error_message, status_code)
+        """
+        from .filters import StringAnalysisDeleteFilter
+        if not any(filters.get(name) not in (None, '') for name in StringAnalysisDeleteFilter.base_filters):
+            return None, {
+                "error": "At least one filter is required",
+                "filters": list(StringAnalysisDeleteFilter.base_filters),
+            }, 400
+        
+        try:
+            filterset = StringAnalysisDeleteFilter(filters, queryset=StringAnalysis.objects.all())
+            if not filterset.is_valid():
+                return None, {"error": "Invalid filters", "details": filterset.errors}, 400
+            return filterset.qs, None, 200
+        except ValueError as e:
+            return None, {"error": "Invalid query parameter values", "details": str(e)}, 400
+    
+    @staticmethod
+    def get_natural_language_results(query, view='full'):
         """
         Get analyses based on natural language query
         Returns: (queryset, interpreted_query, error_message, status_code)
@@ -92,8 +411,9 @@ class StringAnalysisService:
         
         try:
             from .natural_language_parser import NaturalLanguageQueryParser
-            filters, parsed_filters = NaturalLanguageQueryParser.parse(query)
-            queryset = StringAnalysis.objects.filter(filters).order_by('-created_at')
+            with stage('parse'):
+                filters, parsed_filters = NaturalLanguageQueryParser.parse(query)
+            queryset = StringAnalysis.objects.for_view(view).filter(filters).order_by('-created_at')
             interpreted_query = {
                 "original": query,
                 "parsed_filters": parsed_filters
@@ -0,0 +1,9 @@
+from django.dispatch import Signal
+
+# Sent with analyses=[StringAnalysis, ...] right after rows are inserted, inside the
+# inserting transaction, by StringAnalysis.save and StringAnalysisQuerySet.bulk_insert
+analyses_created = Signal()
+
+# Sent with analyses=[StringAnalysis, ...] right after rows are deleted, inside the
+# deleting transaction; bulk deletes only load StringAnalysis.SNAPSHOT_FIELDS
+analyses_deleted = Signal()
@@ -0,0 +1,411 @@
+"""
+Nearest neighbours by character-frequency profile, for GET /strings/{string_value}/similar
+
+Each analysis is a vector over VOCABULARY, the case-folded SIGNATURE_ALPHABET characters plus
+one slot for every other character, holding the share of the string's characters in each slot.
+The vectors live in memory-mapped .npy files under settings.SIMILARITY_INDEX_DIR, one directory
+per database, which every worker maps and updates in place: processes share one copy of the
+index and start without rebuilding it. Creates and deletes update it once they commit; it is
+built from the database on first use, or by manage.py rebuild_similarity_index, and rebuilt
+whenever it no longer matches the database (see database_token).
+
+Needs numpy; without it the endpoint answers 501 and nothing is indexed.
+"""
+from contextlib import contextmanager
+from functools import lru_cache
+import hashlib
+import logging
+import os
+from pathlib import Path
+import secrets
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from django.dispatch import receiver
+
+from .analyzer import SIGNATURE_ALPHABET
+from .models import StringAnalysis, TableCounter
+from .signals import analyses_created, analyses_deleted
+
+try:
+    import numpy as np
+except ImportError:  # optional; similarity search is unavailable without it
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows, where msvcrt locks take the place of flock
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('cosine', 'l1')
+
+VOCABULARY = SIGNATURE_ALPHABET
+VOCABULARY_SLOTS = {char: slot for slot, char in enumerate(VOCABULARY)}
+OTHER_SLOT = len(VOCABULARY)
+DIMENSIONS = len(VOCABULARY) + 1
+
+MIN_CAPACITY = 1024
+# Rows scored per step of a search, bounding its temporary arrays
+SEARCH_BLOCK_ROWS = 65536
+# Rows fetched per query while building
+BUILD_CHUNK_ROWS = 5000
+# The TableCounter row holding database_token
+TOKEN_COUNTER = 'similarity-index-token'
+
+
+def lock_file(file, exclusive):
+    """
+    Block until this process holds a lock on file: flock, shared unless exclusive, where
+    available; on Windows an exclusive msvcrt lock on its first byte either way
+    """
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return
+    file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:  # LK_LOCK gives up after 10 seconds
+            continue
+
+
+def unlock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file, fcntl.LOCK_UN)
+        return
+    file.seek(0)
+    msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def frequency_vector(frequency, out=None):
+    """
+    The share of a {character: count} map's characters in each VOCABULARY slot
+    out: a zeroed float32 array of DIMENSIONS to fill instead of allocating one
+    """
+    vector = np.zeros(DIMENSIONS, dtype=np.float32) if out is None else out
+    total = 0
+    for char, count in frequency.items():
+        vector[VOCABULARY_SLOTS.get(char.lower(), OTHER_SLOT)] += count
+        total += count
+    if total:
+        vector /= total
+    return vector
+
+
+class SimilarityIndex:
+    """
+    Analysis ids and their frequency vectors in memory-mapped arrays
+
+    state.npy holds [generation, rows in use, database token]; the arrays of a generation are
+    ids.<generation>.npy (0 marks a removed row), vectors.<generation>.npy and
+    norms.<generation>.npy. Writers hold an exclusive lock on the lock file, append
+    rows in place, and write a new generation when the arrays are full, dropping
+    removed rows; readers remap when the generation changes.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.generation = None
+        self._state = None
+
+    def _path(self, name, generation=None):
+        return self.directory / (f'{name}.{generation}.npy' if generation is not None else f'{name}.npy')
+
+    @contextmanager
+    def _locked(self, exclusive):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / 'lock', 'ab') as lock:
+            lock_file(lock, exclusive)
+            try:
+                yield
+            finally:
+                unlock_file(lock)
+
+    def _refresh(self):
+        """
+        Map the current generation, under the lock
+        Returns: whether the index has been built
+        """
+        if self._state is None:
+            if not self._path('state').exists():
+                return False
+            self._state = np.load(self._path('state'), mmap_mode='r+')
+        generation = int(self._state[0])
+        if generation != self.generation:
+            self.ids = np.load(self._path('ids', generation), mmap_mode='r+')
+            self.vectors = np.load(self._path('vectors', generation), mmap_mode='r+')
+            self.norms = np.load(self._path('norms', generation), mmap_mode='r+')
+            self.generation = generation
+        return True
+
+    def matches(self, token, max_pk):
+        """
+        Whether the index was built from the database holding token, and has no row for an
+        id above max_pk, the largest the database holds; a recreated or flushed database has
+        a new token, and one restored from a backup usually has a lower max_pk
+        """
+        with self._locked(exclusive=False):
+            return self._matches(token, max_pk)
+
+    def _matches(self, token, max_pk):
+        if not self._refresh() or int(self._state[2]) != token:
+            return False
+        count = int(self._state[1])
+        return not count or int(self.ids[:count].max()) <= (max_pk or 0)
+
+    def add(self, entries):
+        """
+        Append (analysis id, frequency_vector) entries; a no-op until the index is built,
+        since building reads every stored analysis
+        """
+        if not entries:
+            return
+        with self._locked(exclusive=True):
+            if not self._refresh():
+                return
+            count = int(self._state[1])
+            if count + len(entries) > len(self.ids):
+                count = self._write_generation(len(entries))
+            block = np.stack([vector for _, vector in entries])
+            end = count + len(entries)
+            self.vectors[count:end] = block
+            self.norms[count:end] = np.linalg.norm(block, axis=1)
+            self.ids[count:end] = [pk for pk, _ in entries]
+            self._state[1] = end
+
+    def remove(self, pks):
+        if not pks:
+            return
+        with self._locked(exclusive=True):
+            if not self._refresh():
+                return
+            rows = np.flatnonzero(np.isin(self.ids[:int(self._state[1])], pks))
+            self.ids[rows] = 0
+            self.vectors[rows] = 0
+            self.norms[rows] = 0
+
+    def _write_generation(self, incoming):
+        """
+        Copy the live rows to arrays with room for incoming more, under the exclusive lock
+        Returns: the rows in use in the new generation
+        """
+        count = int(self._state[1])
+        live = np.flatnonzero(self.ids[:count])
+        self._publish(self.ids[live], self.vectors[live], self.norms[live], len(live) + incoming)
+        return len(live)
+
+    def _publish(self, ids, vectors, norms, needed, token=None):
+        """
+        Write ids, vectors and norms as the next generation and switch state.npy to it
+        token: the database token of a rebuild; kept from the current state otherwise
+        """
+        generation = (self.generation or 0) + 1
+        capacity = max(MIN_CAPACITY, 2 * needed)
+        arrays = {
+            'ids': (ids, np.int64, (capacity,)),
+            'vectors': (vectors, np.float32, (capacity, DIMENSIONS)),
+            'norms': (norms, np.float32, (capacity,)),
+        }
+        for name, (values, dtype, shape) in arrays.items():
+            array = np.lib.format.open_memmap(self._path(name, generation), mode='w+', dtype=dtype, shape=shape)
+            array[:len(values)] = values
+            array.flush()
+            del array
+
+        if self._state is None:
+            staging = self.directory / 'state.staging.npy'
+            np.save(staging, np.array([generation, len(ids), token or 0], dtype=np.int64))
+            os.replace(staging, self._path('state'))
+            self._state = None
+        else:
+            if token is not None:
+                self._state[2] = token
+            self._state[0] = generation
+            self._state[1] = len(ids)
+            self._state.flush()
+        previous = self.generation
+        self._refresh()
+        if previous is not None:
+            for name in arrays:
+                self._path(name, previous).unlink(missing_ok=True)
+
+    def discard(self):
+        """
+        Mark the index as matching no database, so the next ensure_built rebuilds it; for when
+        an update failed and left it behind the database. Every process sees the cleared token
+        through its mapping of state.npy; if that cannot be written, state.npy is removed.
+        """
+        try:
+            if self._refresh():
+                self._state[2] = 0
+                self._state.flush()
+            return
+        except (OSError, ValueError):
+            pass
+        try:
+            self._path('state').unlink(missing_ok=True)
+        except OSError:
+            logger.exception("Could not discard the similarity index in %s", self.directory)
+        self._state = None
+        self.generation = None
+
+    def rebuild(self, rows, token, unless_matching=None):
+        """
+        Replace the index with rows of (analysis id, character_frequency) read from the
+        database holding token
+        unless_matching: a max_pk; skip the rebuild if another process has meanwhile built
+        an index that matches(token, max_pk)
+        Returns: the number of analyses indexed, or None if it was skipped
+        """
+        with self._locked(exclusive=True):
+            if unless_matching is not None and self._matches(token, unless_matching):
+                return None
+            ids = []
+            vectors = np.zeros((MIN_CAPACITY, DIMENSIONS), dtype=np.float32)
+            for pk, frequency in rows:
+                if len(ids) == len(vectors):
+                    vectors = np.concatenate([vectors, np.zeros_like(vectors)])
+                frequency_vector(frequency, out=vectors[len(ids)])
+                ids.append(pk)
+            ids = np.array(ids, dtype=np.int64)
+            vectors = vectors[:len(ids)]
+            self._publish(ids, vectors, np.linalg.norm(vectors, axis=1), len(ids), token)
+            return len(ids)
+
+    def nearest(self, vector, k, metric='cosine', exclude=()):
+        """
+        The k indexed analyses closest to vector, as [(analysis id, distance)] closest first
+        cosine: 1 - cosine similarity; l1: sum of absolute differences of the character shares
+        """
+        with self._locked(exclusive=False):
+            if not self._refresh():
+                return []
+            count = int(self._state[1])
+            ids, vectors, norms = self.ids, self.vectors, self.norms
+        vector = np.asarray(vector, dtype=np.float32)
+        vector_norm = np.linalg.norm(vector)
+        exclude = np.asarray(list(exclude), dtype=np.int64)
+        # Twice k per block, so repeated ids (a create racing a rebuild) cannot leave fewer than k
+        keep = 2 * k
+
+        candidate_ids, candidate_distances = [], []
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, count)
+            block_ids = np.array(ids[start:end])
+            block = vectors[start:end]
+            if metric == 'cosine':
+                denominators = norms[start:end] * vector_norm
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    distances = 1 - (block @ vector) / denominators
+                distances[denominators == 0] = 1
+            else:
+                distances = np.abs(block - vector).sum(axis=1)
+            distances[block_ids == 0] = np.inf
+            if len(exclude):
+                distances[np.isin(block_ids, exclude)] = np.inf
+            if len(distances) > keep:
+                closest = np.argpartition(distances, keep)[:keep]
+                block_ids, distances = block_ids[closest], distances[closest]
+            candidate_ids.append(block_ids)
+            candidate_distances.append(distances)
+        if not candidate_ids:
+            return []
+
+        candidate_ids = np.concatenate(candidate_ids)
+        candidate_distances = np.concatenate(candidate_distances)
+        nearest = []
+        seen = set()
+        for position in np.argsort(candidate_distances, kind='stable'):
+            pk, distance = int(candidate_ids[position]), float(candidate_distances[position])
+            if distance == np.inf or len(nearest) == k:
+                break
+            if pk not in seen:
+                seen.add(pk)
+                nearest.append((pk, max(distance, 0.0)))
+        return nearest
+
+
+def index_directory(using=DEFAULT_DB_ALIAS):
+    """
+    The index directory of a database, so test and benchmark databases get their own
+    """
+    database = connections[using].settings_dict
+    identity = '|'.join(str(database.get(key) or '') for key in ('ENGINE', 'HOST', 'PORT', 'NAME'))
+    return Path(settings.SIMILARITY_INDEX_DIR) / hashlib.sha1(identity.encode('utf-8')).hexdigest()[:16]
+
+
+@lru_cache(maxsize=None)
+def _index(directory):
+    return SimilarityIndex(directory)
+
+
+def get_similarity_index(using=DEFAULT_DB_ALIAS):
+    """
+    This process's handle on a database's index
+    """
+    return _index(index_directory(using))
+
+
+def stored_frequencies(using=DEFAULT_DB_ALIAS):
+    return StringAnalysis.objects.using(using).order_by().values_list('pk', 'character_frequency').iterator(
+        chunk_size=BUILD_CHUNK_ROWS
+    )
+
+
+def database_token(using=DEFAULT_DB_ALIAS):
+    """
+    A random number identifying the database's current contents, kept in a TableCounter row
+    and created on first use, so a recreated or flushed database gets a new one
+    """
+    counter, _ = TableCounter.objects.using(using).get_or_create(
+        name=TOKEN_COUNTER, slot=0, defaults={'value': secrets.randbits(62) + 1}
+    )
+    return counter.value
+
+
+def ensure_built(using=DEFAULT_DB_ALIAS):
+    """
+    Build the index from the database unless it exists and matches it
+    """
+    index = get_similarity_index(using)
+    token = database_token(using)
+    max_pk = StringAnalysis.objects.using(using).aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    if not index.matches(token, max_pk):
+        index.rebuild(stored_frequencies(using), token, unless_matching=max_pk)
+    return index
+
+
+def update_index(using, method, *args):
+    """
+    Call a SimilarityIndex method once a write has committed; a failure is logged and the
+    index discarded for a rebuild, rather than failing the request whose row is already stored
+    """
+    index = get_similarity_index(using)
+    try:
+        getattr(index, method)(*args)
+    except Exception:
+        logger.exception("Similarity index %s failed; it will be rebuilt on next use", method)
+        index.discard()
+
+
+@receiver(analyses_created, sender=StringAnalysis)
+def index_created(sender, analyses, using=None, **kwargs):
+    if np is None or not analyses:
+        return
+    using = using or DEFAULT_DB_ALIAS
+    entries = [(analysis.pk, frequency_vector(analysis.character_frequency)) for analysis in analyses]
+    transaction.on_commit(lambda: update_index(using, 'add', entries), using=using)
+
+
+@receiver(analyses_deleted, sender=StringAnalysis)
+def index_deleted(sender, analyses, using=None, **kwargs):
+    if np is None or not analyses:
+        return
+    using = using or DEFAULT_DB_ALIAS
+    pks = [analysis.pk for analysis in analyses]
+    transaction.on_commit(lambda: update_index(using, 'remove', pks), using=using)
@@ -0,0 +1,261 @@
+from collections import Counter
+import random
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.dispatch import receiver
+
+from .counting import COUNTER_SLOTS
+from .models import StatsBucket, StringAnalysis
+from .signals import analyses_created, analyses_deleted
+
+# Dimensions bucketed by column value: integer columns in power-of-two ranges, each with
+# a SUM_BUCKET of the column's total for the mean, so a dimension has at most ~65 buckets
+COLUMN_DIMENSIONS = ('length', 'word_count', 'is_palindrome')
+BINNED_DIMENSIONS = ('length', 'word_count')
+SUM_BUCKET = 'sum'
+# Sums of character_frequency, one bucket per character
+CHARACTER_DIMENSION = 'character'
+
+# Bucket rows per upsert statement, well under SQLite's bound parameter limit
+UPSERT_BATCH_SIZE = 200
+
+
+def bucket_key(dimension, value):
+    """
+    The bucket counting value: 'true' or 'false' for is_palindrome, else the lower bound of the
+    value's range, 0, 1, 2-3, 4-7, ...
+    """
+    if dimension == 'is_palindrome':
+        return 'true' if value else 'false'
+    return str(1 << (value.bit_length() - 1) if value > 0 else 0)
+
+
+def bin_label(lower):
+    """
+    '2-3' for the range bucket_key names 2, '0' and '1' for the single-value ones
+    """
+    return str(lower) if lower < 2 else f'{lower}-{2 * lower - 1}'
+
+
+def bucket_deltas(analyses, sign=1):
+    """
+    How much each (dimension, bucket) changes when analyses are added (sign=1) or removed (sign=-1)
+    """
+    deltas = Counter()
+    for analysis in analyses:
+        for dimension in COLUMN_DIMENSIONS:
+            deltas[dimension, bucket_key(dimension, getattr(analysis, dimension))] += sign
+        for dimension in BINNED_DIMENSIONS:
+            deltas[dimension, SUM_BUCKET] += sign * getattr(analysis, dimension)
+        for char, count in analysis.character_frequency.items():
+            deltas[CHARACTER_DIMENSION, char] += sign * count
+    return deltas
+
+
+def bucket_counts(queryset):
+    """
+    Every (dimension, bucket) value for the analyses in queryset, computed from scratch
+    """
+    counts = Counter()
+    for dimension in COLUMN_DIMENSIONS:
+        for value, count in queryset.order_by().values_list(dimension).annotate(count=Count('pk')):
+            counts[dimension, bucket_key(dimension, value)] += count
+            if dimension in BINNED_DIMENSIONS:
+                counts[dimension, SUM_BUCKET] += value * count
+    for frequency in queryset.order_by().values_list('character_frequency', flat=True).iterator(chunk_size=2000):
+        for char, count in frequency.items():
+            counts[CHARACTER_DIMENSION, char] += count
+    return counts
+
+
+def apply_deltas(deltas, using=None):
+    """
+    Add deltas to a random slot of each bucket, in one upsert per UPSERT_BATCH_SIZE buckets
+    where the database supports INSERT ... ON CONFLICT DO UPDATE
+    """
+    using = using or router.db_for_write(StatsBucket)
+    slot = random.randrange(COUNTER_SLOTS)
+    # Sorted, so concurrent writers lock shared rows in the same order and cannot deadlock
+    rows = sorted(
+        (dimension, bucket, slot, delta) for (dimension, bucket), delta in deltas.items() if delta
+    )
+    connection = connections[using]
+    if not connection.features.supports_update_conflicts_with_target:
+        for row in rows:
+            _increment(*row, using=using)
+        return
+
+    quote = connection.ops.quote_name
+    table = quote(StatsBucket._meta.db_table)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {table} ({quote('dimension')}, {quote('bucket')}, {quote('slot')}, {quote('value')}) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({quote('dimension')}, {quote('bucket')}, {quote('slot')}) "
+                f"DO UPDATE SET {quote('value')} = {table}.{quote('value')} + EXCLUDED.{quote('value')}",
+                [param for row in batch for param in row],
+            )
+
+
+def _increment(dimension, bucket, slot, delta, using):
+    buckets = StatsBucket.objects.using(using).filter(dimension=dimension, bucket=bucket, slot=slot)
+    if buckets.update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic(using=using):
+            StatsBucket.objects.using(using).create(dimension=dimension, bucket=bucket, slot=slot, value=delta)
+    except IntegrityError:
+        buckets.update(value=F('value') + delta)
+
+
+def rebuild(using=None):
+    """
+    Recompute every bucket from the stored analyses, for backfills and after drift
+    Returns: the number of buckets written
+    """
+    using = using or router.db_for_write(StatsBucket)
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            # Writers would otherwise change the rows between the scan and the commit
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOCK TABLE {connection.ops.quote_name(StringAnalysis._meta.db_table)} IN SHARE MODE"
+                )
+        # Deleting first also takes SQLite's write lock before the scan
+        StatsBucket.objects.using(using).all().delete()
+        counts = bucket_counts(StringAnalysis.objects.using(using))
+        buckets = StatsBucket.objects.using(using).bulk_create(
+            [
+                StatsBucket(dimension=dimension, bucket=bucket, slot=0, value=value)
+                for (dimension, bucket), value in counts.items() if value
+            ],
+            batch_size=UPSERT_BATCH_SIZE,
+        )
+    return len(buckets)
+
+
+def _bucket_totals_queryset(using=None):
+    return (
+        StatsBucket.objects.using(using)
+        .values_list('dimension', 'bucket')
+        .annotate(total=Sum('value'))
+        .order_by()
+    )
+
+
+def _column_totals_queryset(using=None):
+    return _bucket_totals_queryset(using).exclude(dimension=CHARACTER_DIMENSION)
+
+
+def _character_totals_queryset(using=None):
+    """
+    (character, total) of every character that occurs, most frequent first
+    """
+    return (
+        _bucket_totals_queryset(using)
+        .filter(dimension=CHARACTER_DIMENSION)
+        .values_list('bucket', 'total')
+        .filter(total__gt=0)
+        .order_by('-total', 'bucket')
+    )
+
+
+def _extreme_aggregates():
+    """
+    One aggregate per query, which the length and word_count indexes answer with a single seek
+    """
+    return [
+        (dimension, key, function(dimension))
+        for dimension in BINNED_DIMENSIONS for key, function in (('min', Min), ('max', Max))
+    ]
+
+
+def read_stats(using=None):
+    """
+    Aggregate statistics over every stored analysis, read from the rollup buckets, with the
+    STATS_MAX_CHARACTERS most frequent characters
+    """
+    characters = _character_totals_queryset(using)
+    analyses = StringAnalysis.objects.using(using)
+    return stats_response(
+        list(_column_totals_queryset(using)),
+        list(characters[:settings.STATS_MAX_CHARACTERS]),
+        characters.count(),
+        {
+            (dimension, key): analyses.aggregate(value=aggregate)['value']
+            for dimension, key, aggregate in _extreme_aggregates()
+        },
+    )
+
+
+async def aread_stats(using=None):
+    characters = _character_totals_queryset(using)
+    analyses = StringAnalysis.objects.using(using)
+    return stats_response(
+        [row async for row in _column_totals_queryset(using)],
+        [row async for row in characters[:settings.STATS_MAX_CHARACTERS]],
+        await characters.acount(),
+        {
+            (dimension, key): (await analyses.aaggregate(value=aggregate))['value']
+            for dimension, key, aggregate in _extreme_aggregates()
+        },
+    )
+
+
+def stats_response(rows, characters, distinct_characters, extremes):
+    """
+    Shape the /strings/stats body
+    rows: (dimension, bucket, total) of the column dimensions
+    characters: (character, total) of the most frequent characters, in order
+    extremes: {(dimension, 'min' or 'max'): value} of the binned dimensions
+    """
+    buckets = {dimension: {} for dimension in COLUMN_DIMENSIONS}
+    for dimension, bucket, total in rows:
+        if total and dimension in buckets:
+            buckets[dimension][bucket] = total
+
+    return {
+        "total_analyses": sum(buckets['is_palindrome'].values()),
+        "is_palindrome": {
+            "true": buckets['is_palindrome'].get('true', 0),
+            "false": buckets['is_palindrome'].get('false', 0),
+        },
+        **{
+            dimension: _distribution(buckets[dimension], extremes[dimension, 'min'], extremes[dimension, 'max'])
+            for dimension in BINNED_DIMENSIONS
+        },
+        "distinct_characters": distinct_characters,
+        "character_frequency": dict(characters),
+    }
+
+
+def _distribution(buckets, minimum, maximum):
+    """
+    min, max, mean and the power-of-two range histogram of an integer dimension
+    """
+    total = buckets.pop(SUM_BUCKET, 0)
+    histogram = sorted((int(bucket), count) for bucket, count in buckets.items())
+    count = sum(count for _, count in histogram)
+    return {
+        "min": minimum,
+        "max": maximum,
+        "mean": round(total / count, 2) if count else None,
+        "histogram": {bin_label(lower): count for lower, count in histogram},
+    }
+
+
+@receiver(analyses_created, sender=StringAnalysis)
+def stats_created(sender, analyses, using=None, **kwargs):
+    if analyses:
+        apply_deltas(bucket_deltas(analyses), using=using)
+
+
+@receiver(analyses_deleted, sender=StringAnalysis)
+def stats_deleted(sender, analyses, using=None, **kwargs):
+    if analyses:
+        apply_deltas(bucket_deltas(analyses, sign=-1), using=using)
@@ -1,3 +1,1014 @@
-from django.test import TestCase
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldError
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import path
+from rest_framework.renderers import JSONRenderer
+
+from . import async_views, similarity, stats
+from .analyzer import analyze_chunk, analyze_string, merge_chunk_analyses
+from .cache import get_result_cache
+from .counting import ANALYSES_COUNTER, COUNTER_SLOTS, total_analyses
+from .executors import ProcessPoolAnalysisExecutor
+from .fields import CharacterFrequency
+from .filters import contains_character_q
+from .models import OverflowCharacter, StringAnalysis, TableCounter, ValueTrigram
+from .natural_language_parser import NaturalLanguageQueryParser
+from .serializers import StringAnalysisSerializer, analysis_rows, render_analysis_row
+from .services import StringAnalysisService
+from .stats import read_stats
+from .throttling import get_throttle_store
+
+
+class APITestCase(TestCase):
+    """
+    Starts each test with empty rate limit buckets, as the test client always sends from one address
+    """
+
+    def setUp(self):
+        get_throttle_store.cache_clear()
+
+
+class AnalyzeStringTests(SimpleTestCase):
+    """
+    analyze_string against the per-property definitions it replaced
+    """
+    values = [
+        '', ' ', 'level', 'Level', 'A man, a plan, a canal: Panama', 'hello world',
+        'a_a', '_a_', 'a_b_a', '__', 'abc_cba',
+        'été', 'Été é', 'naïve', 'ab²ba', '٣a٣', 'x y', 'a b c',
+        'ΣΑΣ', 'σας', 'ΣΑς', 'ΌΣΟΣ ΣΟΣΌ', 'ßss', 'ẞß', 'SSß', 'İi', 'ǅǆ',
+        '😀a😀', 'tab\there\nnewline',
+    ]
+
+    @staticmethod
+    def reference(value):
+        cleaned = ''.join(char.lower() for char in value if char.isalnum())
+        frequency = {}
+        for char in value:
+            frequency[char] = frequency.get(char, 0) + 1
+        return {
+            'length': len(value),
+            'is_palindrome': cleaned == cleaned[::-1],
+            'word_count': len(value.split()),
+            'unique_char_count': len(set(value)),
+            'character_frequency': frequency,
+        }
+
+    def test_matches_per_property_definitions(self):
+        for value in self.values:
+            with self.subTest(value=value):
+                properties = analyze_string(value)
+                self.assertEqual({key: properties[key] for key in self.reference(value)}, self.reference(value))
+                self.assertEqual(properties['sha256_hash'], hashlib.sha256(value.encode('utf-8')).hexdigest())
+
+    def test_palindrome_rules(self):
+        # Underscores are not alphanumeric; letters and digits outside ASCII are
+        self.assertTrue(analyze_string('a_b_a')['is_palindrome'])
+        self.assertFalse(analyze_string('2a²')['is_palindrome'])
+        self.assertTrue(analyze_string('été')['is_palindrome'])
+        # Each character is lower-cased alone: no final sigma form, and lower() rather than casefold()
+        self.assertTrue(analyze_string('ΣΑΣ')['is_palindrome'])
+        self.assertFalse(analyze_string('ßss')['is_palindrome'])
+
+    def test_lone_surrogates_fail_like_the_strict_utf8_hash(self):
+        with self.assertRaises(UnicodeEncodeError):
+            analyze_string('\ud800')
+
+    def test_frequency_in_codepoint_order(self):
+        frequency = analyze_string('zebra ZEBRA 😀é a')['character_frequency']
+        self.assertEqual(list(frequency), sorted(frequency))
+        self.assertEqual(frequency['a'], 2)
+
+
+class ChunkedAnalysisTests(SimpleTestCase):
+    values = [
+        'hello world  foo bar',
+        '  leading and trailing  ',
+        'A man, a plan, a canal: Panama',
+        'Was it a car or a cat I saw?',
+        'ΣΊΣΥΦΟΣ σίσυφος',
+        'naïve café — déjà vu 😀 ok',
+        'ab\tcd\nef gh',
+        'x',
+    ]
+
+    def analyze_in_chunks(self, value, chunk_size):
+        chunks = [value[start:start + chunk_size] for start in range(0, len(value), chunk_size)]
+        return merge_chunk_analyses(
+            [analyze_chunk(chunk) for chunk in chunks], hashlib.sha256(value.encode('utf-8')).hexdigest()
+        )
+
+    def test_merge_matches_analyze_string(self):
+        for value in self.values:
+            for chunk_size in (1, 2, 3, 4, 7):
+                with self.subTest(value=value, chunk_size=chunk_size):
+                    self.assertEqual(self.analyze_in_chunks(value, chunk_size), analyze_string(value))
+
+    def test_words_and_palindromes_across_boundaries(self):
+        # 'hello' split as 'hel' + 'lo'; a boundary on whitespace splits no word
+        self.assertEqual(self.analyze_in_chunks('hello world', 3)['word_count'], 2)
+        self.assertEqual(self.analyze_in_chunks('ab cd', 2)['word_count'], 2)
+        self.assertTrue(self.analyze_in_chunks('Never odd or even', 4)['is_palindrome'])
+        self.assertFalse(self.analyze_in_chunks('Never odd or evens', 4)['is_palindrome'])
+
+    def test_process_pool(self):
+        executor = ProcessPoolAnalysisExecutor(max_workers=1, inline_threshold=8, chunk_size=3, batch_threshold=2)
+        self.addCleanup(lambda: executor._pool and executor._pool.shutdown())
+        self.assertEqual(executor.analyze('A man, a plan, a canal: Panama'), analyze_string('A man, a plan, a canal: Panama'))
+        values = ['level', 'hello world foo', 'naïve café', 'x' * 20]
+        self.assertEqual(executor.analyze_many(values), [analyze_string(value) for value in values])
+
+
+class ConcurrentCreateTests(TransactionTestCase):
+    """
+    Threads posting the same strings at once, each on its own database connection
+    """
+    threads = 16
+
+    def create_concurrently(self, values_per_thread, upsert=False):
+        """
+        Run create_string_analysis for each thread's values, starting all threads together
+        Returns: (status_code, analysis) pairs, for every thread and value
+        """
+        barrier = threading.Barrier(len(values_per_thread))
+
+        def create(values):
+            barrier.wait()
+            try:
+                results = []
+                for value in values:
+                    analysis, error, status_code = StringAnalysisService.create_string_analysis(
+                        value, upsert=upsert
+                    )
+                    self.assertIsNone(error if status_code != 409 else None, error)
+                    results.append((status_code, analysis))
+                return results
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(values_per_thread)) as pool:
+            return [result for results in pool.map(create, values_per_thread) for result in results]
+
+    def test_same_value_is_created_once(self):
+        results = self.create_concurrently([['racecar']] * self.threads)
+
+        statuses = Counter(status_code for status_code, _ in results)
+        self.assertEqual(statuses, {201: 1, 409: self.threads - 1})
+        self.assertEqual(StringAnalysis.objects.count(), 1)
+        self.assertEqual(total_analyses(), 1)
+        self.assertEqual(read_stats()['is_palindrome'], {'true': 1, 'false': 0})
+
+    def test_overlapping_values_are_each_created_once(self):
+        values = [f'value {number}' for number in range(20)]
+        values_per_thread = [random.sample(values, len(values)) for _ in range(self.threads)]
+        results = self.create_concurrently(values_per_thread)
+
+        created = Counter(analysis.value for status_code, analysis in results if status_code == 201)
+        self.assertEqual(created, Counter(values))
+        self.assertEqual(
+            Counter(status_code for status_code, _ in results),
+            {201: len(values), 409: len(values) * (self.threads - 1)},
+        )
+        self.assertEqual(StringAnalysis.objects.count(), len(values))
+        self.assertEqual(total_analyses(), len(values))
+        self.assertEqual(read_stats()['total_analyses'], len(values))
+
+    def test_upsert_returns_the_stored_analysis(self):
+        results = self.create_concurrently([['A man a plan']] * self.threads, upsert=True)
+
+        statuses = Counter(status_code for status_code, _ in results)
+        self.assertEqual(statuses, {201: 1, 200: self.threads - 1})
+        self.assertEqual({analysis.pk for _, analysis in results}, {StringAnalysis.objects.get().pk})
+
+
+class CreateEndpointTests(APITestCase):
+
+    def post(self, value, query=''):
+        return self.client.post(f'/strings{query}', {'value': value}, content_type='application/json', secure=True)
+
+    def test_duplicate_conflicts_unless_upsert(self):
+        created = self.post('level')
+        self.assertEqual(created.status_code, 201)
+
+        self.assertEqual(self.post('level').status_code, 409)
+
+        upserted = self.post('level', '?upsert=true')
+        self.assertEqual(upserted.status_code, 200)
+        self.assertEqual(upserted.json(), created.json())
+
+    def test_created_body_matches_a_stored_read(self):
+        created = self.post('zebra')
+        caches['default'].clear()
+        get_result_cache.cache_clear()
+        read = self.client.get('/strings/zebra', secure=True)
+        self.assertEqual(read.content, created.content)
+        self.assertEqual(list(created.json()['properties']['character_frequency_map']), ['a', 'b', 'e', 'r', 'z'])
+
+
+class BatchCreateEndpointTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        get_result_cache.cache_clear()
+
+    def batch(self, body):
+        return self.client.post('/strings/batch', body, content_type='application/json', secure=True)
+
+    def test_per_item_statuses_in_input_order(self):
+        StringAnalysisService.create_string_analysis('zebra')
+        response = self.batch({'values': ['level', 'level', 5, 'zebra', 'Level']})
+        self.assertEqual(response.status_code, 207)
+        body = response.json()
+        self.assertEqual([item['status'] for item in body['results']], [201, 409, 422, 409, 201])
+        self.assertEqual((body['created'], body['conflicts'], body['failed']), (2, 2, 1))
+        self.assertEqual(body['results'][2], {'status': 422, 'error': 'Value must be a string'})
+        self.assertEqual(StringAnalysis.objects.filter(value='level').count(), 1)
+
+    def test_created_items_match_a_stored_read(self):
+        response = self.batch({'values': ['zebra', 'apple']})
+        cached = {value: get_result_cache().get(StringAnalysis.objects.get(value=value).sha256_hash)
+                  for value in ('zebra', 'apple')}
+        caches['default'].clear()
+        get_result_cache.cache_clear()
+        for item, value in zip(response.json()['results'], ('zebra', 'apple')):
+            read = self.client.get(f'/strings/{value}', secure=True)
+            self.assertEqual(cached[value], read.content)
+            self.assertEqual(item['data'], read.json())
+
+    def test_invalid_batches(self):
+        self.assertEqual(self.batch({}).status_code, 400)
+        self.assertEqual(self.batch({'values': 'level'}).status_code, 422)
+        with override_settings(STRING_BATCH_MAX_SIZE=2):
+            self.assertEqual(self.batch({'values': ['a', 'b', 'c']}).status_code, 400)
+        self.assertFalse(StringAnalysis.objects.exists())
+
+
+class ShadowedValueTests(APITestCase):
+
+    def test_values_named_like_routes_are_reached_by_hash(self):
+        for value in ('stats', 'batch', 'lookup', 'filter-by-natural-language'):
+            created = self.client.post('/strings', {'value': value}, content_type='application/json', secure=True)
+            self.assertEqual(created.status_code, 201)
+            sha256_hash = created.json()['id']
+            self.assertEqual(self.client.get(f'/strings/{sha256_hash}?by=hash', secure=True).content, created.content)
+            found = self.client.post(
+                '/strings/lookup', {'identifiers': [value], 'by': 'value'}, content_type='application/json', secure=True
+            )
+            self.assertEqual(found.json()['results'], [created.json()])
+            self.assertEqual(self.client.delete(f'/strings/{sha256_hash}?by=hash', secure=True).status_code, 204)
+        self.assertIn('total_analyses', self.client.get('/strings/stats', secure=True).json())
+
+    def test_by_resolves_the_identifier_one_way_only(self):
+        level = StringAnalysisService.create_string_analysis('level')[0]
+        # A value spelled like another value's hash shadows it unless ?by=hash
+        shadow = StringAnalysisService.create_string_analysis(level.sha256_hash)[0]
+
+        def get(identifier, by=''):
+            response = self.client.get(f'/strings/{identifier}{by}', secure=True)
+            return response.json().get('id') if response.status_code == 200 else response.status_code
+
+        self.assertEqual(get(level.sha256_hash), shadow.sha256_hash)
+        self.assertEqual(get(level.sha256_hash, '?by=value'), shadow.sha256_hash)
+        self.assertEqual(get(level.sha256_hash.upper(), '?by=hash'), level.sha256_hash)
+        self.assertEqual(get(shadow.sha256_hash, '?by=value'), 404)
+        self.assertEqual(get('level', '?by=hash'), 404)
+        self.assertEqual(get('level', '?by=id'), 400)
+
+        delete = lambda identifier, by: self.client.delete(f'/strings/{identifier}{by}', secure=True).status_code
+        self.assertEqual(delete('level', '?by=id'), 400)
+        self.assertEqual(delete('level', '?by=hash'), 404)
+        self.assertEqual(delete(level.sha256_hash, '?by=hash'), 204)
+        self.assertEqual(get('level'), 404)
+        self.assertEqual(delete(level.sha256_hash, '?by=hash'), 404)
+        self.assertEqual(delete(level.sha256_hash, '?by=value'), 204)
+        self.assertFalse(StringAnalysis.objects.exists())
+
+    def test_lone_surrogates_match_nothing(self):
+        found = self.client.post(
+            '/strings/lookup', {'identifiers': ['\ud800', 'level'], 'by': 'value'},
+            content_type='application/json', secure=True
+        )
+        self.assertEqual(found.status_code, 200)
+        self.assertEqual(found.json()['results'], [None, None])
+
+
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        get_result_cache.cache_clear()
+
+    def get(self, path, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(path, headers=headers, secure=True)
+
+    def test_detail_revalidates_without_querying_when_cached(self):
+        analysis = StringAnalysisService.create_string_analysis('level')[0]
+        response = self.get('/strings/level')
+        self.assertEqual(response['ETag'], f'"{analysis.sha256_hash}"')
+        self.assertIn('max-age=', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            not_modified = self.get(f'/strings/{analysis.sha256_hash}?by=hash', response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get('/strings/level', response['ETag']).status_code, 304)
+        # A bare hash could also be a stored value, which takes priority: one index lookup rules it out
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(f'/strings/{analysis.sha256_hash}', response['ETag']).status_code, 304)
+
+        summary = self.get('/strings/level?view=summary', response['ETag'])
+        self.assertEqual(summary.status_code, 200)
+        self.assertEqual(self.get('/strings/level?view=summary', summary['ETag']).status_code, 304)
+
+    def test_detail_etag_follows_value_before_hash(self):
+        sha256_hash = hashlib.sha256(b'zzz').hexdigest()
+        StringAnalysisService.create_string_analyses(['zzz', sha256_hash])
+        zzz_etag = self.get('/strings/zzz')['ETag']
+        # The identifier names the stored value, so the cached 'zzz' must not validate it
+        response = self.get(f'/strings/{sha256_hash}', zzz_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['value'], sha256_hash)
+        self.assertEqual(self.get(f'/strings/{sha256_hash}', response['ETag']).status_code, 304)
+
+    def test_list_etag_changes_with_the_table(self):
+        StringAnalysisService.create_string_analysis('level')
+        etag = self.get('/strings')['ETag']
+        nl_etag = self.get('/strings/filter-by-natural-language?query=palindromes')['ETag']
+        self.assertEqual(self.get('/strings', etag).status_code, 304)
+        self.assertEqual(self.get('/strings/filter-by-natural-language?query=palindromes', nl_etag).status_code, 304)
+
+        # The cached table version is dropped once the writing transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            StringAnalysisService.create_string_analysis('noon')
+        self.assertEqual(self.get('/strings', etag).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            StringAnalysisService.delete_string_analysis('noon')
+        self.assertNotIn(self.get('/strings')['ETag'], (etag, nl_etag))
+
+    def test_invalid_parameters_are_rejected_before_revalidating(self):
+        StringAnalysisService.create_string_analysis('level')
+        etag = self.get('/strings')['ETag']
+        self.assertEqual(self.get('/strings?count_mode=exact', etag).status_code, 304)
+        for query in ['count_mode=bad', 'page_size=0', 'view=huge', 'contains_character=ab']:
+            with self.subTest(query=query):
+                self.assertEqual(self.get(f'/strings?{query}', etag).status_code, 400)
+                with override_settings(ROOT_URLCONF=AsyncURLConf):
+                    self.assertEqual(self.get(f'/strings?{query}', etag).status_code, 400)
+        nl_etag = self.get('/strings/filter-by-natural-language?query=palindromes')['ETag']
+        self.assertEqual(
+            self.get('/strings/filter-by-natural-language?query=palindromes&count_mode=bad', nl_etag).status_code, 400
+        )
+
+
+class ListingTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Some share a created_at, so pages also split on the id tiebreak
+        StringAnalysisService.create_string_analyses(['level', 'noon', 'apple', 'kayak', 'zebra', 'Racecar x'])
+
+    def get(self, path):
+        return self.client.get(path, secure=True)
+
+    def test_cursor_pages_cover_every_match_once(self):
+        expected = [
+            analysis.sha256_hash for analysis in StringAnalysis.objects.order_by('-created_at', '-id')
+        ]
+        seen, path = [], '/strings?page_size=4'
+        while path:
+            body = self.get(path).json()
+            self.assertLessEqual(len(body['data']), 4)
+            seen += [item['id'] for item in body['data']]
+            path = body['next']
+        self.assertEqual(seen, expected)
+
+        palindromes = self.get('/strings?is_palindrome=true&page_size=1').json()
+        self.assertIn('is_palindrome=true', palindromes['next'])
+        next_page = self.get(palindromes['next']).json()
+        self.assertTrue(next_page['data'][0]['properties']['is_palindrome'])
+        self.assertNotEqual(next_page['data'][0]['id'], palindromes['data'][0]['id'])
+
+    def test_invalid_cursor_and_page_size(self):
+        self.assertEqual(self.get('/strings?cursor=not-a-cursor').status_code, 400)
+        self.assertEqual(self.get('/strings?page_size=0').status_code, 400)
+
+    def test_stream_matches_the_paged_listing(self):
+        listed = self.get('/strings?is_palindrome=true&view=summary').json()['data']
+        response = self.get('/strings?is_palindrome=true&view=summary&stream=true')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line) for line in lines], listed)
+        self.assertEqual(len(lines), 3)
+
+
+class CountModeTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        StringAnalysisService.create_string_analyses(['level', 'noon', 'apple'])
+
+    def count(self, query=''):
+        body = self.client.get(f'/strings?page_size=1{query}', secure=True).json()
+        return body['count'], body['count_mode']
+
+    def test_unfiltered_count_reads_the_counter_slots(self):
+        self.assertEqual(self.count(), (3, 'counter'))
+        StringAnalysisService.create_string_analysis('kayak')
+        StringAnalysisService.delete_string_analysis('apple')
+        StringAnalysisService.delete_string_analysis('apple')  # already gone: counted once
+        self.assertEqual(self.count(), (3, 'counter'))
+        self.assertEqual(
+            sum(TableCounter.objects.filter(name=ANALYSES_COUNTER).values_list('value', flat=True)), 3
+        )
+        self.assertLessEqual(TableCounter.objects.filter(name=ANALYSES_COUNTER).count(), COUNTER_SLOTS)
+
+    def test_filtered_counts_are_cached_unless_exact(self):
+        self.assertEqual(self.count('&is_palindrome=true'), (2, 'exact'))
+        StringAnalysisService.create_string_analysis('kayak')
+        self.assertEqual(self.count('&is_palindrome=true'), (2, 'cached'))
+        self.assertEqual(self.count('&is_palindrome=true&count_mode=exact'), (3, 'exact'))
+        # No planner estimate on SQLite, so estimate falls back to the cached count
+        self.assertEqual(self.count('&is_palindrome=true&count_mode=estimate'), (2, 'cached'))
+        self.assertEqual(self.count('&count_mode=exact'), (4, 'exact'))
+
+    def test_invalid_count_mode(self):
+        response = self.client.get('/strings?count_mode=guess', secure=True)
+        self.assertEqual(response.status_code, 400)
+
+    def test_every_parameter_is_validated_before_streaming(self):
+        for query in [
+            'stream=true&count_mode=bad', 'stream=true&page_size=0', 'stream=true&cursor=bogus',
+            'stream=true&contains_character=ab', 'stream=true&min_length=long', 'stream=maybe',
+            'contains_character=ab',
+        ]:
+            with self.subTest(query=query):
+                response = self.client.get(f'/strings?{query}', secure=True)
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIsInstance(response, StreamingHttpResponse)
+
+
+class ResultCacheTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        get_result_cache.cache_clear()
+        self.analysis, _, _ = StringAnalysisService.create_string_analysis('level')
+
+    def get(self):
+        return self.client.get('/strings/level', secure=True)
+
+    def test_fill_hit_and_shared_hit(self):
+        filled = self.get()
+        self.assertEqual(get_result_cache().get(self.analysis.sha256_hash), filled.content)
+        self.assertEqual(get_result_cache().info()['misses'], 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().content, filled.content)
+
+        # A new process starts with an empty local tier and reads the shared one
+        get_result_cache.cache_clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().content, filled.content)
+        self.assertEqual(get_result_cache().info()['shared_hits'], 1)
+
+    def test_cached_hash_does_not_outrank_a_stored_value(self):
+        # 'zzz' and a string whose value is the hash of 'zzz': the identifier h means the value first
+        sha256_hash = hashlib.sha256(b'zzz').hexdigest()
+        StringAnalysisService.create_string_analyses(['zzz', sha256_hash])
+        self.client.get('/strings/zzz', secure=True)
+        self.assertEqual(self.client.get(f'/strings/{sha256_hash}', secure=True).json()['value'], sha256_hash)
+        self.assertEqual(self.client.get(f'/strings/{sha256_hash}?by=hash', secure=True).json()['value'], 'zzz')
+
+    async def test_cached_hash_does_not_outrank_a_stored_value_async(self):
+        sha256_hash = hashlib.sha256(b'zzz').hexdigest()
+        await sync_to_async(StringAnalysisService.create_string_analyses)(['zzz', sha256_hash])
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            await self.async_client.get('/strings/zzz', secure=True)
+            response = await self.async_client.get(f'/strings/{sha256_hash}', secure=True)
+        self.assertEqual(response.json()['value'], sha256_hash)
+
+    def test_delete_invalidates_both_tiers(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete('/strings/level', secure=True).status_code, 204)
+        self.assertIsNone(get_result_cache().get(self.analysis.sha256_hash))
+        self.assertIsNone(caches['default'].get(f'analysis-json:{self.analysis.sha256_hash}'))
+        self.assertEqual(self.get().status_code, 404)
+
+
+class AsyncURLConf:
+    """
+    urls.py as routed with ASYNC_VIEWS on, which it only reads at import
+    """
+    urlpatterns = [
+        path('strings', async_views.AsyncStringAnalysisListCreateView.as_view()),
+        path('strings/filter-by-natural-language', async_views.AsyncNaturalLanguageFilterView.as_view()),
+        path('strings/stats', async_views.AsyncStringAnalysisStatsView.as_view()),
+        path('strings/<str:string_value>', async_views.AsyncStringAnalysisRetrieveDeleteView.as_view()),
+        path('health', async_views.AsyncHealthCheckView.as_view()),
+    ]
+
+
+class AsyncViewTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        StringAnalysisService.create_string_analyses(['level', 'noon', 'apple', 'Racecar x'])
+
+    async def test_reads_match_the_sync_views(self):
+        paths = [
+            '/strings?page_size=2', '/strings?is_palindrome=true&view=summary&count_mode=exact',
+            '/strings?stream=true&count_mode=bad', '/strings?contains_character=ab',
+            '/strings/level', '/strings/level?view=summary', '/strings/missing',
+            '/strings/filter-by-natural-language?query=palindromic%20strings', '/strings/stats',
+        ]
+        for path in paths:
+            expected = await sync_to_async(self.client.get)(path, secure=True)
+            # So both count the same way rather than the second reading the first's cached count
+            await caches['default'].aclear()
+            with override_settings(ROOT_URLCONF=AsyncURLConf):
+                response = await self.async_client.get(path, secure=True)
+            self.assertEqual((response.status_code, response.content), (expected.status_code, expected.content), path)
+
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            response = await self.async_client.get('/strings?stream=true', secure=True)
+            lines = [line async for line in response.streaming_content]
+            self.assertEqual(len(b''.join(lines).splitlines()), 4)
+
+            etag = (await self.async_client.get('/strings/level', secure=True))['ETag']
+            revalidated = await self.async_client.get('/strings/level', secure=True, headers={'If-None-Match': etag})
+            self.assertEqual(revalidated.status_code, 304)
+
+            health = await self.async_client.get('/health', secure=True)
+            self.assertEqual(health.json()['total_analyses'], 4)
+
+    async def test_writes_run_the_sync_views(self):
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            created = await self.async_client.post(
+                '/strings', {'value': 'kayak'}, content_type='application/json', secure=True
+            )
+            self.assertEqual(created.status_code, 201)
+            self.assertEqual((await self.async_client.get('/strings/kayak', secure=True)).content, created.content)
+            deleted = await self.async_client.delete('/strings/kayak', secure=True)
+            self.assertEqual(deleted.status_code, 204)
+            self.assertEqual((await self.async_client.get('/strings/kayak', secure=True)).status_code, 404)
+
+
+class StatsTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        StringAnalysisService.create_string_analyses(['', 'a', 'ab', 'abc', 'level up now', 'x' * 1000])
+
+    def test_bounded_histograms(self):
+        body = self.client.get('/strings/stats', secure=True).json()
+        self.assertEqual(body['total_analyses'], 6)
+        self.assertEqual(body['length'], {
+            'min': 0, 'max': 1000, 'mean': 169.67,
+            'histogram': {'0': 1, '1': 1, '2-3': 2, '8-15': 1, '512-1023': 1},
+        })
+        self.assertEqual(body['word_count']['histogram'], {'0': 1, '1': 4, '2-3': 1})
+
+        StringAnalysisService.delete_string_analysis('x' * 1000)
+        self.assertEqual(read_stats()['length']['max'], 12)
+        self.assertEqual(read_stats()['length']['histogram'], {'0': 1, '1': 1, '2-3': 2, '8-15': 1})
+
+    def test_character_totals_are_capped(self):
+        with override_settings(STATS_MAX_CHARACTERS=2):
+            body = read_stats()
+        self.assertEqual(body['character_frequency'], {'x': 1000, 'a': 3})
+        self.assertEqual(body['distinct_characters'], 13)
+
+    def test_rebuild_matches_incremental_buckets(self):
+        StringAnalysisService.delete_string_analysis('ab')
+        incremental = read_stats()
+        stats.rebuild()
+        self.assertEqual(read_stats(), incremental)
+
+
+class NaturalLanguageParserTests(SimpleTestCase):
+    """
+    The planner's output for each query form, as the regex parser it replaced produced it
+    """
+    cases = [
+        ('All Palindromic strings', Q(is_palindrome=True), {'is_palindrome': True}),
+        ('strings that are not palindromes', Q(is_palindrome=False), {'is_palindrome': True}),
+        ('strings longer than 10 characters', Q(length__gt=10), {'min_length': 11}),
+        ('shorter than 5', Q(length__lt=5), {}),
+        ('at least 3 characters', Q(length__gte=3), {'min_length': 4}),
+        ('at most 7 characters', Q(length__lte=7), {}),
+        ('exactly 12 characters', Q(length=12), {}),
+        # Two numbers: no exact length, and the first one is taken as the word count
+        ('10 characters and 3 words', Q(word_count=10), {'word_count': 10}),
+        ('single word palindromes', Q(is_palindrome=True, word_count=1), {'is_palindrome': True, 'word_count': 1}),
+        ('multiple words', Q(word_count__gt=1), {'word_count': 1}),
+        ('empty string', Q(word_count=0), {'word_count': 0}),
+        ('three words', Q(word_count=3), {'word_count': 3}),
+        ('strings with 4 words', Q(word_count=4), {'word_count': 4}),
+        ('containing z', contains_character_q('z'), {'contains_character': 'z'}),
+        ('with "Q"', contains_character_q('q'), {'contains_character': 'q'}),
+        ('has x and containing y', contains_character_q('y'), {'contains_character': 'y'}),
+        # "containing the letter z" matches "containing t" first, as the old patterns did
+        ('containing the letter z', contains_character_q('t'), {'contains_character': 't'}),
+        ('the first vowel', contains_character_q('a'), {'contains_character': 'a'}),
+        ('vowel e strings', contains_character_q('e'), {'contains_character': 'e'}),
+        (
+            'palindromes longer than 2 containing a',
+            Q(is_palindrome=True) & Q(length__gt=2) & contains_character_q('a'),
+            {'is_palindrome': True, 'min_length': 3, 'contains_character': 'a'},
+        ),
+        ('hello there', Q(), {}),
+    ]
+
+    def test_query_forms(self):
+        for query, filters, parsed_filters in self.cases:
+            with self.subTest(query=query):
+                self.assertEqual(NaturalLanguageQueryParser.parse(query), (filters, parsed_filters))
+
+    def test_memoized_plans_are_not_shared(self):
+        NaturalLanguageQueryParser.parse('one word')[1]['word_count'] = 99
+        self.assertEqual(NaturalLanguageQueryParser.parse(' ONE WORD ')[1], {'word_count': 1})
+
+    def test_empty_query(self):
+        with self.assertRaisesMessage(ValueError, "Query cannot be empty"):
+            NaturalLanguageQueryParser.parse('   ')
+
+
+class NaturalLanguageEndpointTests(APITestCase):
+    path = '/strings/filter-by-natural-language'
+
+    def get(self, query):
+        return self.client.get(self.path, {'query': query}, secure=True)
+
+    def test_interpreted_query(self):
+        StringAnalysisService.create_string_analyses(['level', 'noon', 'hello world'])
+        body = self.get('single word palindromes').json()
+        self.assertEqual({item['value'] for item in body['data']}, {'level', 'noon'})
+        self.assertEqual(body['interpreted_query']['parsed_filters'], {'is_palindrome': True, 'word_count': 1})
+
+    def test_error_paths(self):
+        self.assertEqual(self.get('  ').status_code, 400)
+        with mock.patch.object(NaturalLanguageQueryParser, 'parse', side_effect=ValueError("no filters")):
+            unparseable = self.get('gibberish')
+        self.assertEqual(unparseable.status_code, 400)
+        self.assertEqual(unparseable.json()['error'], "Unable to parse natural language query")
+        with mock.patch.object(NaturalLanguageQueryParser, 'parse', side_effect=FieldError("length and length")):
+            conflicting = self.get('longer than 5 and shorter than 2')
+        self.assertEqual(conflicting.status_code, 422)
+        self.assertEqual(conflicting.json()['error'], "Query parsed but resulted in conflicting filters")
+
+
+class InstrumentationTests(APITestCase):
+
+    def get(self, path):
+        return self.client.get(path, secure=True)
+
+    @override_settings(INSTRUMENTATION_ENABLED=True)
+    def test_server_timing_and_metrics(self):
+        StringAnalysisService.create_string_analysis('level')
+        response = self.get('/strings/filter-by-natural-language?query=palindromes')
+        timing = response['Server-Timing']
+        for entry in ('db;dur=', 'desc="', 'parse;dur=', 'serialize;dur=', 'total;dur=', 'payload;desc='):
+            self.assertIn(entry, timing)
+
+        metrics = self.get('/metrics')
+        self.assertEqual(metrics.status_code, 200)
+        self.assertIn(
+            'analyzer_request_duration_seconds_bucket{view="natural-language-filter",method="GET",le="+Inf"}',
+            metrics.content.decode(),
+        )
+
+    def test_disabled_by_default(self):
+        self.assertNotIn('Server-Timing', self.get('/health'))
+        self.assertEqual(self.get('/metrics').status_code, 404)
+
+
+class CharacterFrequencyFieldTests(APITestCase):
+
+    def test_round_trip_and_lazy_decoding(self):
+        value = 'Ab\u2028 ba \U0001f600' + 'é' * 70000
+        StringAnalysisService.create_string_analysis(value)
+
+        analysis = StringAnalysis.objects.get()
+        frequency = analysis.character_frequency
+        self.assertIsInstance(frequency, CharacterFrequency)
+        self.assertEqual(len(frequency), 7)
+        self.assertIsNone(frequency._decoded)
+        self.assertEqual(frequency, Counter(value))
+        self.assertEqual(list(frequency), sorted(Counter(value)))
+
+        row = analysis_rows(StringAnalysis.objects.all()).get()
+        rendered = JSONRenderer().render(StringAnalysisSerializer(analysis).data)
+        self.assertEqual(render_analysis_row(row), rendered)
+
+
+class ContainsCharacterTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        StringAnalysisService.create_string_analyses(['Apple', 'banana', 'Éclair', 'café', '日本', 'ΣΟΣ', 'x_y'])
+
+    def matching(self, char):
+        response = self.client.get('/strings', {'contains_character': char, 'page_size': 100}, secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {item['value'] for item in response.json()['data']}
+
+    def test_alphabet_characters_ignore_case(self):
+        self.assertEqual(self.matching('A'), {'Apple', 'banana', 'Éclair', 'café'})
+        self.assertEqual(self.matching('p'), {'Apple'})
+        self.assertEqual(self.matching('_'), {'x_y'})
+        self.assertEqual(self.matching('z'), set())
+
+    def test_overflow_characters(self):
+        self.assertEqual(
+            set(OverflowCharacter.objects.filter(analysis__value='Éclair').values_list('character', flat=True)), {'é'}
+        )
+        self.assertEqual(self.matching('日'), {'日本'})
+        self.assertEqual(self.matching('σ'), {'ΣΟΣ'})
+        # Unicode case folding: the baseline's SQLite LIKE only folded ASCII, so 'é' missed 'É'
+        self.assertEqual(self.matching('é'), {'Éclair', 'café'})
+        self.assertEqual(self.matching('É'), {'Éclair', 'café'})
+
+        StringAnalysisService.delete_string_analysis('café')
+        self.assertEqual(self.matching('é'), {'Éclair'})
+        self.assertFalse(OverflowCharacter.objects.filter(analysis__value='café').exists())
+
+
+class SubstringSearchTests(APITestCase):
+    values = ['Hello World', 'yellow brick road', 'hello', 'Mellow yellow', 'a', 'ab']
+
+    def setUp(self):
+        super().setUp()
+        for value in self.values:
+            StringAnalysisService.create_string_analysis(value)
+
+    def search(self, query):
+        response = self.client.get(f'/strings?{query}', secure=True)
+        self.assertEqual(response.status_code, 200)
+        return {item['value'] for item in response.json()['data']}
+
+    def test_contains_and_starts_with_ignore_case(self):
+        self.assertEqual(self.search('contains=ELLO'), {'Hello World', 'hello', 'Mellow yellow', 'yellow brick road'})
+        self.assertEqual(self.search('contains=lo%20w'), {'Hello World'})
+        self.assertEqual(self.search('contains=ow%20y'), {'Mellow yellow'})
+        self.assertEqual(self.search('starts_with=hel'), {'Hello World', 'hello'})
+        self.assertEqual(self.search('starts_with=A'), {'a', 'ab'})
+        self.assertEqual(self.search('starts_with=ab'), {'ab'})
+        self.assertEqual(self.search('contains=b&starts_with=y'), {'yellow brick road'})
+        self.assertEqual(self.search('contains=xyz'), set())
+
+    def test_long_values_are_checked_directly(self):
+        value = 'needle ' + 'x' * 3000
+        StringAnalysisService.create_string_analysis(value)
+        self.assertEqual(ValueTrigram.objects.filter(analysis__value=value).count(), 1)
+        self.assertEqual(self.search('contains=needle'), {value})
+        self.assertEqual(self.search('starts_with=need'), {value})
+
+    def test_postings_are_deleted_with_the_analysis(self):
+        StringAnalysisService.delete_string_analysis('hello')
+        self.assertEqual(self.search('starts_with=hello'), {'Hello World'})
+        self.assertFalse(ValueTrigram.objects.filter(analysis__value='hello').exists())
+
+
+class SimilarStringsTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(SIMILARITY_INDEX_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        for value in ('aaab', 'aabb', 'abbb', 'xyz xyz', 'AAAB'):
+            StringAnalysisService.create_string_analysis(value)
+
+    def similar(self, value, query=''):
+        response = self.client.get(f'/strings/{value}/similar{query}', secure=True)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_neighbours_closest_first(self):
+        body = self.similar('aaab', '?k=3')
+        self.assertEqual(body['metric'], 'cosine')
+        self.assertEqual([item['value'] for item in body['data']], ['AAAB', 'aabb', 'abbb'])
+        self.assertEqual(body['data'][0]['distance'], 0)
+        self.assertIn('character_frequency_map', body['data'][0]['properties'])
+
+        l1 = self.similar('aaab', '?k=2&metric=l1&view=summary')['data']
+        self.assertEqual([item['distance'] for item in l1], [0, 0.5])
+        self.assertNotIn('value', l1[0])
+
+    def test_index_follows_creates_and_deletes(self):
+        self.similar('aaab')
+        with self.captureOnCommitCallbacks(execute=True):
+            StringAnalysisService.create_string_analysis('aaaab')
+        self.assertEqual(self.similar('aaab', '?k=2')['data'][1]['value'], 'aaaab')
+        with self.captureOnCommitCallbacks(execute=True):
+            StringAnalysisService.delete_string_analysis('AAAB')
+        self.assertEqual(
+            [item['value'] for item in self.similar('aaab', '?k=10')['data']], ['aaaab', 'aabb', 'abbb', 'xyz xyz']
+        )
+
+    def test_index_is_rebuilt_for_a_flushed_database(self):
+        self.similar('aaab')
+        call_command('flush', interactive=False, verbosity=0)
+        for value in ('aaaa', 'zzzz', 'aaaz', 'qqqq q'):
+            with self.captureOnCommitCallbacks(execute=True):
+                StringAnalysisService.create_string_analysis(value)
+        neighbours = self.similar('aaaa', '?k=3&metric=l1')['data']
+        self.assertEqual(neighbours[0]['value'], 'aaaz')
+        # Both 2.0 away under l1
+        self.assertEqual({item['value'] for item in neighbours[1:]}, {'zzzz', 'qqqq q'})
+
+    def test_failed_update_is_logged_and_rebuilt(self):
+        self.similar('aaab')
+        with mock.patch.object(similarity.SimilarityIndex, 'add', side_effect=OSError("read-only")):
+            with self.assertLogs('analyzer_api.similarity', 'ERROR'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    created = self.client.post(
+                        '/strings', {'value': 'aaaab'}, content_type='application/json', secure=True
+                    )
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(self.similar('aaab', '?k=2')['data'][1]['value'], 'aaaab')
+
+    def test_invalid_parameters(self):
+        for query in ('?k=0', '?k=ten', '?k=1000', '?metric=euclidean', '?view=compact'):
+            self.assertEqual(self.client.get(f'/strings/aaab/similar{query}', secure=True).status_code, 400)
+        self.assertEqual(self.client.get('/strings/missing/similar', secure=True).status_code, 404)
+
+
+class LookupEndpointTests(APITestCase):
+
+    def lookup(self, body, expected=200):
+        response = self.client.post('/strings/lookup', body, content_type='application/json', secure=True)
+        self.assertEqual(response.status_code, expected, response.content)
+        return response.json()
+
+    @override_settings(STRING_BATCH_QUERY_CHUNK_SIZE=2)
+    def test_results_in_request_order(self):
+        level = StringAnalysisService.create_string_analysis('level')[0]
+        StringAnalysisService.create_string_analysis('noon')
+        identifiers = ['noon', 'missing', level.sha256_hash.upper(), 'level', 'noon']
+
+        # Four distinct hashes, two to a query
+        with self.assertNumQueries(2):
+            body = self.lookup({'identifiers': identifiers})
+        self.assertEqual([item and item['value'] for item in body['results']], ['noon', None, 'level', 'level', 'noon'])
+        self.assertEqual(body['results'][3], StringAnalysisSerializer(StringAnalysis.objects.get(pk=level.pk)).data)
+        self.assertEqual((body['found'], body['missing']), (4, 1))
+
+        by_value = self.lookup({'identifiers': identifiers, 'by': 'value', 'exists_only': True})
+        self.assertEqual(by_value, {'exists': [True, False, False, True, True], 'found': 3, 'missing': 2})
+        summary = self.lookup({'identifiers': ['level'], 'view': 'summary'})['results'][0]
+        self.assertNotIn('value', summary)
+
+    def test_invalid_bodies(self):
+        self.lookup({}, 400)
+        self.lookup({'identifiers': 'level'}, 422)
+        self.lookup({'identifiers': ['level', 7]}, 422)
+        self.lookup({'identifiers': ['level'], 'by': 'id'}, 400)
+        self.lookup({'identifiers': ['level'], 'exists_only': 'yes'}, 400)
+        with override_settings(STRING_LOOKUP_MAX_SIZE=1):
+            self.lookup({'identifiers': ['level', 'noon']}, 400)
+
+
+class BulkDeleteTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        for value in ('level', 'noon', 'hello world', 'abc', 'racecar'):
+            StringAnalysisService.create_string_analysis(value)
+
+    @override_settings(BULK_DELETE_CHUNK_SIZE=1, BULK_DELETE_MAX_ROWS=2)
+    def test_deletes_in_resumable_chunks_keeping_derived_data(self):
+        first = self.client.delete('/strings?is_palindrome=true', secure=True).json()
+        self.assertEqual((first['deleted'], first['complete']), (2, False))
+        second = self.client.delete(f"/strings?is_palindrome=true&resume_after={first['resume_after']}", secure=True)
+        self.assertEqual(second.json()['deleted'], 1)
+        self.assertEqual(self.client.delete('/strings?is_palindrome=true', secure=True).json()['complete'], True)
+
+        self.assertEqual(set(StringAnalysis.objects.values_list('value', flat=True)), {'hello world', 'abc'})
+        self.assertEqual(total_analyses(), 2)
+        self.assertEqual(read_stats()['is_palindrome'], {'true': 0, 'false': 2})
+        self.assertFalse(ValueTrigram.objects.exclude(analysis__value__in=['hello world', 'abc']).exists())
+
+    def test_created_before_and_required_filters(self):
+        self.assertEqual(self.client.delete('/strings', secure=True).status_code, 400)
+        self.assertEqual(self.client.delete('/strings?view=summary', secure=True).status_code, 400)
+        self.assertEqual(self.client.delete('/strings?created_before=yesterday', secure=True).status_code, 400)
+
+        response = self.client.delete('/strings?created_before=2000-01-01T00:00:00Z', secure=True)
+        self.assertEqual(response.json()['deleted'], 0)
+        response = self.client.delete('/strings?created_before=2999-01-01T00:00:00Z&min_length=5', secure=True)
+        self.assertEqual(response.json()['deleted'], 3)
+        self.assertEqual(set(StringAnalysis.objects.values_list('value', flat=True)), {'noon', 'abc'})
+
+
+class ImportExportTests(APITestCase):
+    values = ['level', 'Hello World', 'naïve café', 'tab\tand "quotes"', 'line\nbreak', 'A man a plan']
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def command(self, *args):
+        call_command(*args, verbosity=0, stdout=io.StringIO(), stderr=io.StringIO())
+
+    def stored(self):
+        return {
+            analysis.value: StringAnalysisSerializer(analysis).data['properties']
+            for analysis in StringAnalysis.objects.all()
+        }
+
+    def test_ndjson_round_trip(self):
+        StringAnalysisService.create_string_analyses(self.values)
+        expected = self.stored()
+        path = os.path.join(self.directory, 'dump.ndjson.gz')
+        self.command('export_strings', path)
+        with gzip.open(path, 'rb') as dump:
+            self.assertEqual(len(dump.readlines()), len(self.values))
+
+        StringAnalysis.objects.all().delete()
+        self.command('import_strings', path, '--workers', '0', '--batch-size', '4')
+        self.assertEqual(self.stored(), expected)
+        self.assertEqual(total_analyses(), len(self.values))
+
+        # Strings already stored are skipped
+        self.command('import_strings', path, '--workers', '0')
+        self.assertEqual(StringAnalysis.objects.count(), len(self.values))
+
+    def test_plain_lines_and_csv(self):
+        path = os.path.join(self.directory, 'strings.txt')
+        with open(path, 'wb') as lines:
+            lines.write('level\r\n\nnaïve café\nlevel\n'.encode('utf-8') + b'\xff\n')
+        self.command('import_strings', path, '--workers', '0')
+        self.assertEqual(sorted(self.stored()), ['level', 'naïve café'])
+
+        path = os.path.join(self.directory, 'dump.csv')
+        self.command('export_strings', path)
+        with open(path, newline='', encoding='utf-8') as dump:
+            rows = list(csv.DictReader(dump))
+        self.assertEqual([row['value'] for row in rows], ['level', 'naïve café'])
+        self.assertEqual(json.loads(rows[1]['character_frequency_map']), self.stored()['naïve café']['character_frequency_map'])
+
+
+class ThrottleTests(APITestCase):
+    rates = {'anon': '3/min', 'user': None, 'anon_nl': '1/min'}
+
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': self.rates}
+        settings_override = override_settings(REST_FRAMEWORK=rest_framework)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def assert_limits(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/health', secure=True).status_code, 200)
+        throttled = self.client.get('/strings/stats', secure=True)
+        self.assertEqual(throttled.status_code, 429)
+        self.assertTrue(0 < int(throttled['Retry-After']) <= 60)
+
+        nl = '/strings/filter-by-natural-language?query=palindromes'
+        self.assertEqual(self.client.get(nl, secure=True).status_code, 200)
+        self.assertEqual(self.client.get(nl, secure=True).status_code, 429)
+        self.assertEqual(self.client.get(nl, secure=True, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_local_token_buckets(self):
+        self.assert_limits()
+
+    @override_settings(THROTTLE_CACHE_ALIAS='default')
+    def test_shared_sliding_windows(self):
+        self.assert_limits()
+        # Clients over the limit are rejected from process memory, without reading the counters
+        caches['default'].clear()
+        nl = '/strings/filter-by-natural-language?query=palindromes'
+        self.assertEqual(self.client.get(nl, secure=True).status_code, 429)
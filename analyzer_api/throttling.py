@@ -0,0 +1,208 @@
+"""
+Rate limits with a constant cost per request, in place of DRF's AnonRateThrottle and UserRateThrottle
+
+DRF's throttles keep every client's request timestamps in a list in the cache, reading and
+rewriting the whole list on each request. Here each client has a token bucket in process
+memory, so a check is a dictionary lookup under a lock. Set THROTTLE_CACHE_ALIAS to enforce
+the limits across processes instead: each client then has sliding-window counters in that
+cache, read with one get_many and bumped with one incr, and clients over their limit are
+rejected from process memory until they may retry.
+
+Rates are DEFAULT_THROTTLE_RATES['anon'] and ['user'] as before; a view can name an endpoint
+group per HTTP method in throttle_groups, and a '<anon|user>_<group>' rate, when set, then
+applies to those requests with buckets of their own.
+"""
+from collections import OrderedDict
+from functools import lru_cache
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import throttling
+from rest_framework.settings import api_settings
+
+
+class LocalBuckets:
+    """
+    Token buckets in this process's memory, keyed by client and limit. At most max_keys are
+    kept, dropping the least recently used; a dropped bucket comes back full, as it would
+    have been after the client's idle time.
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, period, now):
+        """
+        Take a token from key's bucket, which holds capacity tokens and refills them over period seconds
+        Returns: 0 if the request is allowed, else the seconds until it would be
+        """
+        refill = capacity / period
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / refill
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class LocalBlocklist:
+    """
+    Keys rejected until a given time, at most max_keys, least recently blocked dropped first
+    """
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._until = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remaining(self, key, now):
+        """Seconds until key is unblocked, 0 if it is not blocked"""
+        until = self._until.get(key)
+        if until is None:
+            return 0.0
+        if until > now:
+            return until - now
+        with self._lock:
+            self._until.pop(key, None)
+        return 0.0
+
+    def block(self, key, until):
+        with self._lock:
+            self._until[key] = until
+            self._until.move_to_end(key)
+            if len(self._until) > self.max_keys:
+                self._until.popitem(last=False)
+
+
+class SharedWindows:
+    """
+    Sliding-window counters in a cache every process uses. A client's rate is estimated as its
+    count in the current fixed window plus the previous window's count, weighted by the share of
+    that window still inside the sliding one. Rejections are remembered in this process until the
+    client may retry, so repeated requests over the limit never reach the cache.
+    """
+
+    def __init__(self, alias, max_keys):
+        self.alias = alias
+        self._blocked = LocalBlocklist(max_keys)
+
+    def take(self, key, capacity, period, now):
+        """
+        Count a request against key's limit of capacity per period seconds
+        Returns: 0 if the request is allowed, else the seconds until it would be
+        """
+        wait = self._blocked.remaining(key, now)
+        if wait:
+            return wait
+
+        cache = caches[self.alias]
+        window, offset = divmod(now, period)
+        current, previous = f'{key}:{int(window)}', f'{key}:{int(window) - 1}'
+        counts = cache.get_many([current, previous])
+        current_count, previous_count = counts.get(current, 0), counts.get(previous, 0)
+        overlap = 1 - offset / period
+        if previous_count * overlap + current_count + 1 > capacity:
+            wait = period - offset
+            if previous_count and current_count + 1 <= capacity:
+                # Enough of the previous window slides out before the current one ends
+                wait = min(wait, period * (overlap - (capacity - 1 - current_count) / previous_count))
+            self._blocked.block(key, now + wait)
+            return wait
+
+        # Counters outlive their window by one period, while they weigh on the next
+        if not cache.add(current, 1, timeout=2 * period):
+            try:
+                cache.incr(current)
+            except ValueError:  # expired between add and incr
+                cache.add(current, 1, timeout=2 * period)
+        return 0.0
+
+
+@lru_cache(maxsize=None)
+def get_throttle_store():
+    """
+    This process's throttle state, per settings.THROTTLE_CACHE_ALIAS
+    """
+    if settings.THROTTLE_CACHE_ALIAS:
+        return SharedWindows(settings.THROTTLE_CACHE_ALIAS, settings.THROTTLE_LOCAL_MAX_KEYS)
+    return LocalBuckets(settings.THROTTLE_LOCAL_MAX_KEYS)
+
+
+@receiver(setting_changed)
+def reset_throttle_store(setting, **kwargs):
+    if setting in ('THROTTLE_CACHE_ALIAS', 'THROTTLE_LOCAL_MAX_KEYS', 'REST_FRAMEWORK'):
+        get_throttle_store.cache_clear()
+
+
+def endpoint_group(request, view):
+    """
+    The throttle group a view assigns to the request's method, or None
+    """
+    return getattr(view, 'throttle_groups', {}).get(request.method)
+
+
+class ConstantCostRateThrottle:
+    """
+    allow_request and wait for SimpleRateThrottle subclasses, backed by get_throttle_store();
+    subclasses define client_ident
+    """
+    wait_seconds = None
+
+    def __init__(self):
+        # The rate depends on the view, so it is looked up per request rather than here
+        pass
+
+    def allow_request(self, request, view):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        scope = self.scope
+        group = endpoint_group(request, view)
+        if group and rates.get(f'{scope}_{group}'):
+            scope = f'{scope}_{group}'
+        rate = rates.get(scope)
+        if rate is None:
+            return True
+
+        ident = self.client_ident(request)
+        if ident is None:
+            return True
+        capacity, period = self.parse_rate(rate)
+        key = self.cache_format % {'scope': scope, 'ident': ident}
+        self.wait_seconds = get_throttle_store().take(key, capacity, period, self.timer())
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AnonRateThrottle(ConstantCostRateThrottle, throttling.AnonRateThrottle):
+    """
+    Limits anonymous clients by IP address, at THROTTLE_RATES['anon'] or ['anon_<group>']
+    """
+
+    def client_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class UserRateThrottle(ConstantCostRateThrottle, throttling.UserRateThrottle):
+    """
+    Limits authenticated users by id and anonymous clients by IP address, at
+    THROTTLE_RATES['user'] or ['user_<group>']
+    """
+
+    def client_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return self.get_ident(request)
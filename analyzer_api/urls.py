@@ -1,14 +1,36 @@
+from django.conf import settings
 from django.urls import path
+from .instrumentation import metrics_view
 from .views import (
     StringAnalysisListCreateView, 
+    StringAnalysisBatchCreateView,
+    StringAnalysisLookupView,
     NaturalLanguageFilterView,
+    StringAnalysisStatsView,
     HealthCheckView,
-    StringAnalysisRetrieveDeleteView
+    StringAnalysisRetrieveDeleteView,
+    SimilarStringsView
 )
 
+if settings.ASYNC_VIEWS:
+    from .async_views import (
+        AsyncStringAnalysisListCreateView as StringAnalysisListCreateView,
+        AsyncNaturalLanguageFilterView as NaturalLanguageFilterView,
+        AsyncStringAnalysisStatsView as StringAnalysisStatsView,
+        AsyncHealthCheckView as HealthCheckView,
+        AsyncStringAnalysisRetrieveDeleteView as StringAnalysisRetrieveDeleteView
+    )
+
+# The fixed strings/... routes come before strings/<str:string_value>, so stored strings named
+# batch, lookup, filter-by-natural-language or stats are reached by hash: strings/<sha256>?by=hash
 urlpatterns = [
     path('strings', StringAnalysisListCreateView.as_view(), name='string-list-create'),  
+    path('strings/batch', StringAnalysisBatchCreateView.as_view(), name='string-batch-create'),
+    path('strings/lookup', StringAnalysisLookupView.as_view(), name='string-lookup'),
     path('strings/filter-by-natural-language', NaturalLanguageFilterView.as_view(), name='natural-language-filter'),
+    path('strings/stats', StringAnalysisStatsView.as_view(), name='string-stats'),
+    path('strings/<str:string_value>/similar', SimilarStringsView.as_view(), name='string-similar'),
     path('strings/<str:string_value>', StringAnalysisRetrieveDeleteView.as_view(), name='string-retrieve-delete'),
     path('health', HealthCheckView.as_view(), name='health-check'),
-]
\ No newline at end of file
+    path('metrics', metrics_view, name='metrics'),
+]
@@ -2,27 +2,72 @@ from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
 
+from .cache import get_result_cache
+from .counting import COUNT_MODES, count_analyses, table_version, total_analyses
 from .models import StringAnalysis
-from .serializers import StringAnalysisSerializer
+from .serializers import (
+    ANALYSIS_VIEWS, StringAnalysisSerializer, analysis_rows, render_analysis,
+    render_analysis_list, render_analysis_rows, render_batch, render_lookup, render_similar
+)
 from .filters import StringAnalysisFilter
 from .services import StringAnalysisService
+from .stats import read_stats
+
+
+def analysis_etag(sha256_hash, view='full'):
+    """
+    Strong ETag of a detail response, whose body is fixed by sha256_hash and the view
+    """
+    return f'"{sha256_hash}"' if view == 'full' else f'"{sha256_hash}-{view}"'
+
+
+def version_etag(version):
+    """
+    Weak ETag of a list or natural language response, valid until the table version changes
+    """
+    return f'W/"v{version}"'
+
+
+def with_validators(response, etag, **cache_control):
+    response['ETag'] = etag
+    patch_cache_control(response, **cache_control)
+    return response
+
+
+def not_modified_response(request, etag, **cache_control):
+    """
+    304 Not Modified if the request's If-None-Match matches etag, else None
+    """
+    if get_conditional_response(request, etag=etag) is None:
+        return None
+    return with_validators(HttpResponseNotModified(), etag, **cache_control)
 
 
 class StringAnalysisListCreateView(generics.ListCreateAPIView):
     serializer_class = StringAnalysisSerializer
+    throttle_groups = {'GET': 'read', 'POST': 'create', 'DELETE': 'delete'}
     filter_backends = [DjangoFilterBackend]
     filterset_class = StringAnalysisFilter
     
+    filter_params = [
+        'is_palindrome', 'min_length', 'max_length', 'word_count', 'contains_character', 'contains', 'starts_with',
+    ]
+    listing_params = ['cursor', 'page_size', 'stream', 'count_mode', 'view']
+    
     def get_queryset(self):
-        return StringAnalysis.objects.all().order_by('-created_at')
+        view = self.request.GET.get('view', 'full')
+        return StringAnalysis.objects.for_view(view).order_by('-created_at', '-id')
     
     def validate_query_parameters(self, request):
         """
         Validate that only allowed query parameters are present
         """
-        valid_params = ['is_palindrome', 'min_length', 'max_length', 'word_count', 'contains_character']
+        valid_params = self.filter_params + self.listing_params
         provided_params = list(request.GET.keys())
         invalid_params = [param for param in provided_params if param not in valid_params]
         
@@ -33,19 +78,58 @@ class StringAnalysisListCreateView(generics.ListCreateAPIView):
             )
     
     def list(self, request, *args, **kwargs):
+        listing, error_response = self.get_listing(request)
+        if error_response:
+            return error_response
+        
+        etag = version_etag(table_version())
+        not_modified = not_modified_response(request, etag, no_cache=True)
+        if not_modified:
+            return not_modified
+        
+        if listing['stream']:
+            return with_validators(self.stream(listing['queryset'], listing['view']), etag, no_cache=True)
+        
+        page = self.paginate_queryset(analysis_rows(listing['queryset'], listing['view']))
+        count, count_source = count_analyses(listing['queryset'], listing['filters_applied'], listing['count_mode'])
+        
+        return with_validators(self.page_response(listing, page, count, count_source), etag, no_cache=True)
+    
+    def get_listing(self, request):
+        """
+        Validate every query parameter and build the filtered queryset, without querying it
+        Runs before the conditional and stream checks, so no invalid request gets a 304 or a stream
+        Returns: (listing, error_response)
+        """
         try:
             self.validate_query_parameters(request)
         except ValidationError as e:
-            return Response({
-                "error": "Invalid query parameter values or types",
-                "message": str(e)
-            }, status=status.HTTP_400_BAD_REQUEST)
+            return None, self.invalid_parameters_response(str(e))
         
-        queryset = self.filter_queryset(self.get_queryset())
-        filters_applied = {}
-        valid_params = ['is_palindrome', 'min_length', 'max_length', 'word_count', 'contains_character']
+        view = request.GET.get('view', 'full')
+        if view not in ANALYSIS_VIEWS:
+            return None, self.invalid_parameters_response(
+                f"view must be one of: {', '.join(ANALYSIS_VIEWS)}"
+            )
         
-        for param in valid_params:
+        count_mode = request.GET.get('count_mode')
+        if count_mode is not None and count_mode not in COUNT_MODES:
+            return None, self.invalid_parameters_response(
+                f"count_mode must be one of: {', '.join(COUNT_MODES)}"
+            )
+        
+        stream = request.GET.get('stream', 'false').lower()
+        if stream not in ('true', 'false'):
+            return None, self.invalid_parameters_response("stream must be true or false")
+        
+        try:
+            self.paginator.validate_query_params(request)
+            queryset = self.filter_queryset(self.get_queryset())
+        except ValueError as e:
+            return None, self.invalid_parameters_response(str(e))
+        
+        filters_applied = {}
+        for param in self.filter_params:
             value = request.GET.get(param)
             if value is not None:
                 if param == 'is_palindrome' and value.lower() in ['true', 'false']:
@@ -53,11 +137,73 @@ class StringAnalysisListCreateView(generics.ListCreateAPIView):
                 else:
                     filters_applied[param] = value
         
-        serializer = self.get_serializer(queryset, many=True)
+        return {
+            'queryset': queryset,
+            'view': view,
+            'filters_applied': filters_applied,
+            'count_mode': count_mode,
+            'stream': stream == 'true'
+        }, None
+    
+    def invalid_parameters_response(self, message):
         return Response({
-            "data": serializer.data,
-            "count": queryset.count(),
-            "filters_applied": filters_applied
+            "error": "Invalid query parameter values or types",
+            "message": message
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    def page_response(self, listing, page, count, count_source):
+        body = render_analysis_list(
+            page,
+            listing['view'],
+            count=count,
+            count_mode=count_source,
+            filters_applied=listing['filters_applied'],
+            next=self.paginator.get_next_link()
+        )
+        return HttpResponse(body, content_type='application/json')
+    
+    def stream(self, queryset, view='full'):
+        """
+        Stream every matching analysis as newline-delimited JSON in constant memory
+        """
+        rows = analysis_rows(queryset, view).iterator(chunk_size=settings.STREAM_CHUNK_SIZE)
+        lines = (body + b'\n' for body in render_analysis_rows(rows, view))
+        return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+    
+    def delete(self, request, *args, **kwargs):
+        """
+        DELETE /strings?<filters> - Delete every analysis matching the list filters and/or
+        created_before, BULK_DELETE_CHUNK_SIZE rows per transaction and at most
+        BULK_DELETE_MAX_ROWS per request; repeat with the returned resume_after until complete
+        """
+        delete_params = self.filter_params + ['created_before']
+        invalid_params = [param for param in request.GET if param not in delete_params + ['resume_after']]
+        if invalid_params:
+            return self.invalid_parameters_response(
+                f"Invalid query parameter(s): {', '.join(invalid_params)}. "
+                f"Allowed parameters are: {', '.join(delete_params + ['resume_after'])}"
+            )
+        try:
+            resume_after = int(request.GET.get('resume_after', 0))
+        except ValueError:
+            return self.invalid_parameters_response("resume_after must be an integer")
+        
+        queryset, error, status_code = StringAnalysisService.get_deletable_analyses(request.GET)
+        if error:
+            return Response(error, status=status_code)
+        
+        deleted, complete = 0, True
+        for rows, resume_after in queryset.delete_in_chunks(settings.BULK_DELETE_CHUNK_SIZE, resume_after):
+            deleted += rows
+            if deleted >= settings.BULK_DELETE_MAX_ROWS:
+                complete = rows < settings.BULK_DELETE_CHUNK_SIZE
+                break
+        
+        return Response({
+            "deleted": deleted,
+            "complete": complete,
+            "resume_after": None if complete else resume_after,
+            "filters_applied": {param: request.GET[param] for param in delete_params if param in request.GET},
         })
     
     def create(self, request, *args, **kwargs):
@@ -74,32 +220,115 @@ class StringAnalysisListCreateView(generics.ListCreateAPIView):
             )
         
         value = request.data.get('value')
-        analysis, error, status_code = StringAnalysisService.create_string_analysis(value)
+        analysis, error, status_code = StringAnalysisService.create_string_analysis(
+            value, upsert=request.GET.get('upsert', '').lower() == 'true'
+        )
         
         if error:
             return Response(error, status=status_code)
         
-        serializer = self.get_serializer(analysis)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        body = render_analysis(analysis)
+        get_result_cache().set(analysis.sha256_hash, body)
+        return HttpResponse(body, status=status_code, content_type='application/json')
+
+
+class StringAnalysisBatchCreateView(APIView):
+    """
+    POST /strings/batch - Analyze many strings in one request
+    """
+    throttle_groups = {'POST': 'create'}
+    
+    def post(self, request, format=None):
+        results, error, status_code = StringAnalysisService.create_string_analyses(
+            request.data.get('values') if isinstance(request.data, dict) else None
+        )
+        
+        if error:
+            return Response(error, status=status_code)
+        
+        cache = get_result_cache()
+        items = []
+        for item_status, outcome in results:
+            if item_status == status.HTTP_201_CREATED:
+                body = render_analysis(outcome)
+                cache.set(outcome.sha256_hash, body)
+                items.append((item_status, body))
+            else:
+                items.append((item_status, outcome))
+        
+        return HttpResponse(render_batch(items), status=status.HTTP_207_MULTI_STATUS, content_type='application/json')
+
+
+class StringAnalysisLookupView(APIView):
+    """
+    POST /strings/lookup - Resolve many values and/or hashes at once
+    Send {"identifiers": [...]}, optionally with "by" and "view" as the detail endpoint takes
+    them and "exists_only": true for booleans instead of analyses; answers come in input order
+    """
+    throttle_groups = {'POST': 'read'}
+    
+    def post(self, request, format=None):
+        data = request.data if isinstance(request.data, dict) else {}
+        exists_only = data.get('exists_only', False)
+        if not isinstance(exists_only, bool):
+            return Response({"error": "exists_only must be a boolean"}, status=status.HTTP_400_BAD_REQUEST)
+        view = data.get('view', 'full')
+        
+        results, error, status_code = StringAnalysisService.lookup_string_analyses(
+            data.get('identifiers'), data.get('by'), view, exists_only
+        )
+        
+        if error:
+            return Response(error, status=status_code)
+        
+        return HttpResponse(render_lookup(results, view, exists_only), content_type='application/json')
 
 
 class StringAnalysisRetrieveDeleteView(APIView):
     """
     GET /strings/{string_value} - Get specific string analysis
     DELETE /strings/{string_value} - Delete specific string analysis
+    Both accept ?by=hash or ?by=value to resolve the identifier one way only
+    GET also accepts ?view=summary for the slim shape, and answers If-None-Match
+    with 304 after at most a sha256_hash index lookup
     """
+    throttle_groups = {'GET': 'read', 'DELETE': 'delete'}
     
     def get(self, request, string_value, format=None):
-        analysis, error, status_code = StringAnalysisService.get_string_analysis(string_value)
+        by, view = request.GET.get('by'), request.GET.get('view', 'full')
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            sha256_hash, error, status_code = StringAnalysisService.resolve_string_analysis_hash(
+                string_value, by, view
+            )
+            if error:
+                return Response(error, status=status_code)
+            not_modified = not_modified_response(request, analysis_etag(sha256_hash, view), **self.cache_control())
+            if not_modified:
+                return not_modified
+        
+        result, error, status_code = StringAnalysisService.get_string_analysis_json(string_value, by, view)
         
         if error:
             return Response(error, status=status_code)
         
-        serializer = StringAnalysisSerializer(analysis)
-        return Response(serializer.data)
+        return self.analysis_response(result, view)
+    
+    def analysis_response(self, result, view):
+        sha256_hash, body = result
+        return with_validators(
+            HttpResponse(body, content_type='application/json'),
+            analysis_etag(sha256_hash, view),
+            **self.cache_control()
+        )
+    
+    def cache_control(self):
+        # Analyses never change once stored
+        return {'public': True, 'max_age': settings.DETAIL_MAX_AGE}
     
     def delete(self, request, string_value, format=None):
-        success, error, status_code = StringAnalysisService.delete_string_analysis(string_value)
+        success, error, status_code = StringAnalysisService.delete_string_analysis(
+            string_value, request.GET.get('by')
+        )
         
         if error:
             return Response(error, status=status_code)
@@ -107,31 +336,125 @@ class StringAnalysisRetrieveDeleteView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class SimilarStringsView(APIView):
+    """
+    GET /strings/{string_value}/similar - The stored strings with the closest character
+    frequency profiles, closest first
+    Accepts ?k= (default 10), ?metric=cosine|l1, ?by= and ?view= as the detail endpoint does
+    """
+    throttle_groups = {'GET': 'read'}
+    
+    def get(self, request, string_value, format=None):
+        try:
+            k = int(request.GET.get('k', 10))
+        except ValueError:
+            return Response({"error": "k must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        metric, view = request.GET.get('metric', 'cosine'), request.GET.get('view', 'full')
+        
+        # Neighbours change with any create or delete, like list results
+        etag = version_etag(table_version())
+        not_modified = not_modified_response(request, etag, no_cache=True)
+        if not_modified:
+            return not_modified
+        
+        result, error, status_code = StringAnalysisService.get_similar_analyses(
+            string_value, k, metric, request.GET.get('by'), view
+        )
+        
+        if error:
+            return Response(error, status=status_code)
+        
+        sha256_hash, neighbours = result
+        body = render_similar(sha256_hash, metric, neighbours, view)
+        return with_validators(HttpResponse(body, content_type='application/json'), etag, no_cache=True)
+
+
 class NaturalLanguageFilterView(APIView):
     """
     GET /strings/filter-by-natural-language - Filter using natural language
     """
+    throttle_groups = {'GET': 'nl'}
     
     def get(self, request, format=None):
+        search, error_response = self.get_search(request)
+        if error_response:
+            return error_response
+        
+        etag = version_etag(table_version())
+        not_modified = not_modified_response(request, etag, no_cache=True)
+        if not_modified:
+            return not_modified
+        
+        count, count_source = count_analyses(
+            search['queryset'], {"query": search['query'].lower()}, search['count_mode']
+        )
+        response = self.results_response(
+            search, analysis_rows(search['queryset'], search['view']), count, count_source
+        )
+        return with_validators(response, etag, no_cache=True)
+    
+    def get_search(self, request):
+        """
+        Validate the parameters and build the queryset for the query, without querying it
+        Returns: (search, error_response)
+        """
         query = request.GET.get('query', '').strip()
         
         if not query:
-            return Response(
+            return None, Response(
                 {"error": "Query parameter is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        queryset, interpreted_query, error, status_code = StringAnalysisService.get_natural_language_results(query)
+        count_mode = request.GET.get('count_mode')
+        if count_mode is not None and count_mode not in COUNT_MODES:
+            return None, Response(
+                {"error": f"count_mode must be one of: {', '.join(COUNT_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        view = request.GET.get('view', 'full')
+        if view not in ANALYSIS_VIEWS:
+            return None, Response(
+                {"error": f"view must be one of: {', '.join(ANALYSIS_VIEWS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset, interpreted_query, error, status_code = StringAnalysisService.get_natural_language_results(
+            query, view
+        )
         
         if error:
-            return Response(error, status=status_code)
+            return None, Response(error, status=status_code)
         
-        serializer = StringAnalysisSerializer(queryset, many=True)
-        return Response({
-            "data": serializer.data,
-            "count": queryset.count(),
-            "interpreted_query": interpreted_query
-        })
+        return {
+            'query': query,
+            'queryset': queryset,
+            'interpreted_query': interpreted_query,
+            'count_mode': count_mode,
+            'view': view
+        }, None
+    
+    def results_response(self, search, rows, count, count_source):
+        body = render_analysis_list(
+            rows,
+            search['view'],
+            count=count,
+            count_mode=count_source,
+            interpreted_query=search['interpreted_query']
+        )
+        return HttpResponse(body, content_type='application/json')
+
+
+class StringAnalysisStatsView(APIView):
+    """
+    GET /strings/stats - Aggregate statistics over every stored string, read from
+    the rollup buckets kept up to date on create and delete
+    """
+    throttle_groups = {'GET': 'read'}
+    
+    def get(self, request, format=None):
+        return Response(read_stats())
 
 
 class HealthCheckView(APIView):
@@ -140,9 +463,13 @@ class HealthCheckView(APIView):
     """
     
     def get(self, request, format=None):
+        return self.health_response(total_analyses())
+    
+    def health_response(self, total):
         return Response({
             "status": "healthy",
-            "total_analyses": StringAnalysis.objects.count(),
+            "total_analyses": total,
+            "result_cache": get_result_cache().info(),
             "service": "String Analyzer API",
             "version": "1.0.0"
-        })
\ No newline at end of file
+        })
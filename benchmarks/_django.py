@@ -0,0 +1,67 @@
+"""
+Shared setup for the benchmarks that need Django and a seeded database
+"""
+import os
+import random
+import string
+
+WORDS = [
+    ''.join(random.Random(seed).choices(string.ascii_lowercase, k=1 + seed % 9))
+    for seed in range(2000)
+]
+
+
+def setup(database):
+    """
+    Point the project at a throwaway database, configure Django and migrate it
+    database: a SQLite file path, or a database URL such as postgres://localhost/bench
+    """
+    os.environ['DATABASE_URL'] = database if '://' in database else f'sqlite:///{database}'
+    os.environ.setdefault('SECRET_KEY', 'benchmarks')
+    os.environ.setdefault('SECURE_SSL_REDIRECT', 'False')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'string_analyzer.settings')
+
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command('migrate', verbosity=0)
+
+
+def make_value(rng, max_words=12):
+    """
+    A random phrase; roughly one in fifty is a palindrome
+    """
+    words = rng.choices(WORDS, k=rng.randint(1, max_words))
+    value = ' '.join(words)
+    if rng.random() < 0.02:
+        value = value + value[::-1]
+    return value
+
+
+def seed(rows, batch_size=5000, seed=0, value_factory=make_value):
+    """
+    Fill the StringAnalysis table up to `rows` rows of generated values
+    """
+    from analyzer_api.models import StringAnalysis
+
+    existing = StringAnalysis.objects.count()
+    rng = random.Random(seed + existing)
+    seen = set()
+    while existing < rows:
+        batch = []
+        for _ in range(min(batch_size, rows - existing)):
+            value = value_factory(rng)
+            while value in seen:
+                value = value + ' ' + rng.choice(WORDS)
+            seen.add(value)
+            batch.append(StringAnalysis(value=value).analyze())
+        stored = set(
+            StringAnalysis.objects.filter(
+                sha256_hash__in=[analysis.sha256_hash for analysis in batch]
+            ).values_list('sha256_hash', flat=True)
+        )
+        batch = [analysis for analysis in batch if analysis.sha256_hash not in stored]
+        StringAnalysis.objects.bulk_insert(batch)
+        existing += len(batch)
+    return existing
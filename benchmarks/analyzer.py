@@ -0,0 +1,60 @@
+"""
+Benchmark the single-pass string analyzer against the original per-property methods
+
+Usage: python -m benchmarks.analyzer [--sizes 100 10000 1000000] [--repeat 5]
+"""
+import argparse
+import hashlib
+import random
+import string
+import timeit
+
+from analyzer_api.analyzer import analyze_string
+
+
+def legacy_analyze(value):
+    """The per-property implementation StringAnalysis.save used before analyze_string"""
+    cleaned = ''.join(char.lower() for char in value if char.isalnum())
+    freq = {}
+    for char in value:
+        freq[char] = freq.get(char, 0) + 1
+    return {
+        'length': len(value),
+        'is_palindrome': cleaned == cleaned[::-1],
+        'word_count': len(value.split()),
+        'unique_char_count': len(set(value)),
+        'character_frequency': freq,
+        'sha256_hash': hashlib.sha256(value.encode('utf-8')).hexdigest(),
+    }
+
+
+CORPORA = {
+    'ascii': string.ascii_letters + string.digits + ' .,!?',
+    'unicode': string.ascii_letters + ' éüßçñøΣσλжщ漢字かな😀',
+}
+
+
+def make_value(alphabet, size, seed=0):
+    rng = random.Random(seed)
+    return ''.join(rng.choices(alphabet, k=size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'corpus':<8} {'size':>10} {'legacy':>12} {'single-pass':>12} {'speedup':>8}")
+    for corpus, alphabet in CORPORA.items():
+        for size in args.sizes:
+            value = make_value(alphabet, size)
+            assert analyze_string(value) == legacy_analyze(value)
+            number = max(1, 200_000 // size)
+            legacy = min(timeit.repeat(lambda: legacy_analyze(value), number=number, repeat=args.repeat)) / number
+            fused = min(timeit.repeat(lambda: analyze_string(value), number=number, repeat=args.repeat)) / number
+            print(f"{corpus:<8} {size:>10} {legacy * 1e3:>10.3f}ms {fused * 1e3:>10.3f}ms {legacy / fused:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
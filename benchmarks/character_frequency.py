@@ -0,0 +1,102 @@
+"""
+Benchmark the packed character_frequency encoding against the JSON column it replaced: size, writes and reads
+
+The dataset mixes the generated phrases the other benchmarks seed with --unicode-share longer
+strings over a mixed-script alphabet. Reads are timed as the list renderer does them: stored
+bytes or text to the character_frequency_map JSON.
+
+Usage: python -m benchmarks.character_frequency [--rows 50000] [--unicode-share 0.2] [--repeat 5]
+"""
+import argparse
+from collections import Counter
+import json
+import os
+import random
+import statistics
+import time
+
+from . import _django
+from .analyzer import CORPORA
+
+
+def legacy_stored(frequency):
+    """The text JSONField stored, via json.dumps with the default separators"""
+    return json.dumps(frequency)
+
+
+def legacy_render(text):
+    """serializers._stored_json, which rendered the stored JSON before the packed encoding"""
+    from analyzer_api.serializers import _dumps
+
+    if text.isascii() and '\\u' not in text:
+        return text.replace(', "', ',"').replace('": ', '":').encode('ascii')
+    return _dumps(json.loads(text))
+
+
+def make_dataset(rows, unicode_share, seed=0):
+    rng = random.Random(seed)
+    values = []
+    for _ in range(rows):
+        if rng.random() < unicode_share:
+            values.append(''.join(rng.choices(CORPORA['unicode'], k=rng.randint(100, 5000))))
+        else:
+            values.append(_django.make_value(rng))
+    return [dict(Counter(value)) for value in values]
+
+
+def time_call(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--unicode-share', type=float, default=0.2)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SECRET_KEY', 'benchmarks')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'string_analyzer.settings')
+    import django
+    django.setup()
+    from analyzer_api.fields import CharacterFrequency, encode_frequency
+    from analyzer_api.serializers import frequency_json
+
+    frequencies = make_dataset(args.rows, args.unicode_share)
+    stored_json = [legacy_stored(frequency) for frequency in frequencies]
+    packed = [encode_frequency(frequency) for frequency in frequencies]
+    for frequency, text, data in zip(frequencies, stored_json, packed):
+        assert json.loads(legacy_render(text)) == json.loads(frequency_json(CharacterFrequency(data)))
+
+    json_bytes = sum(len(text.encode('utf-8')) for text in stored_json)
+    packed_bytes = sum(map(len, packed))
+    print(f"rows {args.rows:,}, {args.unicode_share:.0%} long mixed-script strings")
+    print(f"{'stored size':<28} json {json_bytes / args.rows:>9.1f}B/row  packed {packed_bytes / args.rows:>9.1f}B/row"
+          f"  {json_bytes / packed_bytes:>5.1f}x smaller")
+
+    timings = {
+        'write (encode)': (
+            time_call(lambda: [legacy_stored(frequency) for frequency in frequencies], args.repeat),
+            time_call(lambda: [encode_frequency(frequency) for frequency in frequencies], args.repeat),
+        ),
+        'read (render map JSON)': (
+            time_call(lambda: [legacy_render(text) for text in stored_json], args.repeat),
+            time_call(lambda: [frequency_json(CharacterFrequency(data)) for data in packed], args.repeat),
+        ),
+        'read (decode to dict)': (
+            time_call(lambda: [json.loads(text) for text in stored_json], args.repeat),
+            time_call(lambda: [CharacterFrequency(data).decoded() for data in packed], args.repeat),
+        ),
+    }
+    for label, (legacy, current) in timings.items():
+        print(f"{label:<28} json {legacy / args.rows * 1e6:>8.2f}us/row  packed {current / args.rows * 1e6:>8.2f}us/row"
+              f"  {legacy / current:>5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark StringAnalysisFilter queries on a seeded table with and without the filter indexes
+
+Usage: python -m benchmarks.filter_queries [--rows 1000000] [--database /tmp/bench.sqlite3]
+"""
+import argparse
+import statistics
+import time
+
+from . import _django
+
+FILTER_SETS = [
+    {},
+    {'is_palindrome': 'true'},
+    {'is_palindrome': 'true', 'min_length': '40'},
+    {'is_palindrome': 'false', 'max_length': '10'},
+    {'min_length': '60', 'max_length': '70'},
+    {'word_count': '3'},
+    {'word_count': '3', 'min_length': '20'},
+    {'contains_character': 'q'},
+    {'contains_character': 'q', 'is_palindrome': 'true'},
+    {'contains': 'abc'},
+    {'contains': 'ab'},
+    {'starts_with': 'qu'},
+]
+
+
+def time_query(queryset, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset[:100])
+        queryset.count()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def run(label, repeat):
+    from analyzer_api.filters import StringAnalysisFilter
+    from analyzer_api.models import StringAnalysis
+
+    print(f"\n== {label}")
+    for filters in FILTER_SETS:
+        queryset = StringAnalysisFilter(
+            filters, queryset=StringAnalysis.objects.order_by('-created_at')
+        ).qs
+        latency = time_query(queryset, repeat)
+        print(f"{str(filters):<55} {latency * 1e3:>9.2f}ms")
+        for line in queryset[:100].explain().splitlines():
+            print(f"    {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--database', default='/tmp/string_analyzer_bench.sqlite3')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    _django.setup(args.database)
+    from django.db import connection
+    from analyzer_api.models import StringAnalysis
+
+    print(f"seeded rows: {_django.seed(args.rows)}")
+
+    indexes = StringAnalysis._meta.indexes
+    with connection.schema_editor() as editor:
+        for index in indexes:
+            editor.remove_index(StringAnalysis, index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    try:
+        run('without filter indexes', args.repeat)
+    finally:
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.add_index(StringAnalysis, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    run('with filter indexes', args.repeat)
+
+
+if __name__ == '__main__':
+    main()
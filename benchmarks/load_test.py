@@ -0,0 +1,224 @@
+"""
+Load test the read endpoints over HTTP, comparing the async views under ASGI with the WSGI path
+
+Each server is started as a subprocess against the same seeded database and driven by
+--concurrency keep-alive connections for --duration seconds. The servers must be installed
+(pip install uvicorn gunicorn, or daphne); the client shares the machine, so leave it a core.
+
+Usage: python -m benchmarks.load_test [--servers uvicorn,gunicorn] [--concurrency 64] [--duration 10]
+       [--endpoint all|detail|list|nl|health] [--database /tmp/bench.sqlite3 | postgres://localhost/bench]
+"""
+import argparse
+import asyncio
+import collections
+import importlib.util
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import quote
+
+from . import _django
+
+HOST = '127.0.0.1'
+
+# name: (module that must be installed, command, serve GET with the async views)
+SERVERS = {
+    'uvicorn': ('uvicorn', [
+        '-m', 'uvicorn', 'string_analyzer.asgi:application', '--host', HOST, '--port', '{port}',
+        '--workers', '{workers}', '--no-access-log', '--log-level', 'warning',
+    ], True),
+    'uvicorn-sync': ('uvicorn', [
+        '-m', 'uvicorn', 'string_analyzer.asgi:application', '--host', HOST, '--port', '{port}',
+        '--workers', '{workers}', '--no-access-log', '--log-level', 'warning',
+    ], False),
+    'daphne': ('daphne', [
+        '-m', 'daphne', '-b', HOST, '-p', '{port}', 'string_analyzer.asgi:application',
+    ], True),
+    'gunicorn': ('gunicorn', [
+        '-m', 'gunicorn', 'string_analyzer.wsgi:application', '--bind', f'{HOST}:{{port}}',
+        '--workers', '{workers}', '--threads', '{threads}', '--log-level', 'warning',
+    ], False),
+}
+
+# Selective queries: the endpoint is unpaginated
+NL_QUERIES = [
+    'all single word palindromic strings',
+    'palindromic strings longer than 40 characters',
+    'palindromic strings containing the letter z',
+]
+
+
+def request_paths(endpoint, sample_hashes):
+    """
+    The request mix: mostly detail lookups, as in production traffic
+    """
+    paths = {
+        'detail': [f'/strings/{sha256_hash}' for sha256_hash in sample_hashes] * 6,
+        'list': ['/strings?page_size=20', '/strings?is_palindrome=true&page_size=20'],
+        'nl': [f'/strings/filter-by-natural-language?query={quote(query)}&view=summary' for query in NL_QUERIES],
+        'health': ['/health'],
+    }
+    if endpoint != 'all':
+        return paths[endpoint]
+    return (
+        paths['detail']
+        + paths['list'] * (len(sample_hashes) // 2)
+        + paths['nl'] * (len(sample_hashes) // 4)
+        + paths['health'] * (len(sample_hashes) // 4)
+    )
+
+
+async def read_response(reader):
+    """
+    Read one HTTP/1.1 response
+    Returns: (status, keep_alive)
+    """
+    status_line = await reader.readuntil(b'\r\n')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readuntil(b'\r\n')
+        if line == b'\r\n':
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    return status, headers.get('connection') != 'close'
+
+
+async def client(port, paths, deadline, latencies, statuses, rng):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection(HOST, port)
+        path = rng.choice(paths)
+        started = time.perf_counter()
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {HOST}:{port}\r\n\r\n'.encode('ascii'))
+        try:
+            status, keep_alive = await read_response(reader)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            status, keep_alive = 'connection error', False
+        latencies.append(time.perf_counter() - started)
+        statuses[status] += 1
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, paths, concurrency, duration):
+    latencies = []
+    statuses = collections.Counter()
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(port, paths, deadline, latencies, statuses, random.Random(seed))
+        for seed in range(concurrency)
+    ))
+    return time.perf_counter() - started, latencies, statuses
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        try:
+            with socket.create_connection((HOST, port), timeout=1) as sock:
+                sock.sendall(f'GET /health HTTP/1.1\r\nHost: {HOST}\r\nConnection: close\r\n\r\n'.encode('ascii'))
+                if sock.recv(12).endswith(b'200'):
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+def run_server(name, args, paths):
+    module, command, async_views = SERVERS[name]
+    if importlib.util.find_spec(module) is None:
+        print(f"{name:<13} skipped: pip install {module}")
+        return
+
+    port = free_port()
+    command = [sys.executable] + [
+        part.format(port=port, workers=args.workers, threads=args.threads) for part in command
+    ]
+    env = {
+        **os.environ,
+        'ASYNC_VIEWS': str(async_views),
+        'ALLOWED_HOSTS': HOST,
+        # The default throttle rates would reject the run within seconds; both apply to anonymous clients
+        'THROTTLE_ANON_RATE': '1000000/s',
+        'THROTTLE_USER_RATE': '1000000/s',
+    }
+    process = subprocess.Popen(command, env=env)
+    try:
+        wait_until_ready(port, process)
+        asyncio.run(drive(port, paths, args.concurrency, min(args.duration, 2)))  # warm up
+        elapsed, latencies, statuses = asyncio.run(drive(port, paths, args.concurrency, args.duration))
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0
+    print(
+        f"{name:<13} {len(latencies) / elapsed:>9,.0f} req/s  "
+        f"p50 {statistics.median(latencies) * 1e3:>7.2f}ms  p99 {p99 * 1e3:>7.2f}ms  "
+        f"statuses {dict(statuses)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--servers', default='uvicorn,gunicorn',
+                        help=f"comma separated, from: {', '.join(SERVERS)}")
+    parser.add_argument('--endpoint', default='all', choices=['all', 'detail', 'list', 'nl', 'health'])
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--database', default='/tmp/string_analyzer_bench.sqlite3')
+    args = parser.parse_args()
+
+    servers = args.servers.split(',')
+    unknown = [name for name in servers if name not in SERVERS]
+    if unknown:
+        parser.error(f"unknown server(s): {', '.join(unknown)}")
+
+    _django.setup(args.database)
+    from analyzer_api.models import StringAnalysis
+
+    print(f"seeded rows: {_django.seed(args.rows)}")
+    sample_hashes = list(
+        StringAnalysis.objects.order_by('?').values_list('sha256_hash', flat=True)[:200]
+    )
+    paths = request_paths(args.endpoint, sample_hashes)
+
+    for name in servers:
+        run_server(name, args, paths)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark natural language query parsing throughput, with and without the plan cache
+
+Usage: python -m benchmarks.nl_parser [--iterations 200000]
+"""
+import argparse
+import os
+import random
+import time
+
+QUERIES = [
+    'all single word palindromic strings',
+    'strings longer than 10 characters',
+    'palindromic strings that contain the first vowel',
+    'strings containing the letter z',
+    'show me strings with 3 words',
+    'non palindrome strings shorter than 20 characters',
+    'multiple words with the letter e',
+    'strings of exactly 5 characters',
+    'at least 50 characters that reads the same',
+    'two words palindrome',
+    'empty string',
+    'strings over 100 characters containing q',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=200_000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('SECRET_KEY', 'benchmarks')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'string_analyzer.settings')
+    import django
+    django.setup()
+    from analyzer_api.natural_language_parser import NaturalLanguageQueryParser
+
+    rng = random.Random(0)
+    # Real traffic repeats dashboard queries with varying case and padding
+    corpus = [
+        rng.choice([str.lower, str.upper, str.title])(rng.choice(QUERIES)) + ' ' * rng.randint(0, 2)
+        for _ in range(args.iterations)
+    ]
+
+    plan = NaturalLanguageQueryParser._plan
+    for label, cached in (('uncached', False), ('cached', True)):
+        plan.cache_clear()
+        started = time.perf_counter()
+        for query in corpus:
+            if not cached:
+                plan.cache_clear()
+            NaturalLanguageQueryParser.parse(query)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<9} {args.iterations / elapsed:>12,.0f} queries/s  {elapsed / args.iterations * 1e6:>7.2f}us/query")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark rendering list pages through StringAnalysisSerializer against the fast row renderer
+
+Usage: python -m benchmarks.rendering [--rows 20000] [--page-size 500] [--database /tmp/bench.sqlite3]
+"""
+import argparse
+import statistics
+import time
+
+from . import _django
+
+
+def time_call(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--database', default='/tmp/string_analyzer_bench.sqlite3')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    _django.setup(args.database)
+    from rest_framework.renderers import JSONRenderer
+    from analyzer_api import serializers
+    from analyzer_api.models import StringAnalysis
+
+    print(f"seeded rows: {_django.seed(args.rows)}")
+    queryset = StringAnalysis.objects.order_by('-created_at', '-id')[:args.page_size]
+
+    def serializer_render(rows):
+        data = serializers.StringAnalysisSerializer(rows, many=True).data
+        return JSONRenderer().render({'data': data})
+
+    paths = [
+        ('serializer', lambda: list(queryset.all()), serializer_render),
+        (
+            'fast (orjson)' if serializers.orjson is not None else 'fast (json)',
+            lambda: list(serializers.analysis_rows(queryset)),
+            serializers.render_analysis_list,
+        ),
+    ]
+    results = {}
+    for label, fetch, render in paths:
+        rows = fetch()
+        render_latency, results[label] = time_call(lambda: render(rows), args.repeat)
+        total_latency, _ = time_call(lambda: render(fetch()), args.repeat)
+        print(f"{label:<14} render {render_latency * 1e3:>7.2f}ms "
+              f"({render_latency / args.page_size * 1e6:.2f}us/row)  "
+              f"query+render {total_latency * 1e3:>7.2f}ms per {args.page_size}-row page")
+
+    bodies = set(results.values())
+    print("identical output" if len(bodies) == 1 else "OUTPUT DIFFERS")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+"""
+Run the benchmark suite over the whole API and write the results to JSON, optionally comparing them with a baseline
+
+Three layers, each selectable with --layers:
+  analyzer   analyze_string on corpora of each --sizes and Unicode mix
+  queries    StringAnalysisFilter and natural language queries on tables of each --rows
+  endpoints  every route in analyzer_api/urls.py through Django's test client, on tables of each --rows
+
+Tables are seeded deterministically and grown in place from the smallest size, so the database must
+start with no more rows than that. Every result is a median latency in seconds; --compare flags those
+more than --threshold slower than the baseline and exits with status 1.
+
+Usage: python -m benchmarks.suite [--layers analyzer,queries,endpoints] [--rows 10000 100000 1000000]
+       [--output results.json] [--compare baseline.json [--threshold 0.1]] [--input results.json]
+       [--database /tmp/bench.sqlite3 | postgres://localhost/bench]
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from urllib.parse import quote, urlencode
+
+from . import _django
+from .analyzer import make_value
+from .filter_queries import FILTER_SETS
+from .nl_parser import QUERIES as NL_QUERIES
+
+LAYERS = ('analyzer', 'queries', 'endpoints')
+
+UNICODE_MIXES = {
+    'ascii': 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 .,!?',
+    'latin': 'abcdefghijklmnopqrstuvwxyz éèêëàâäîïôöùûüçñøåßÆŒ',
+    'mixed': 'abcdefghijklmnopqrstuvwxyz éüßçñøΣσλжщ漢字かな😀',
+    'astral': '漢字仮名交じり文かなカナ한국어😀😂🎉🚀𝔘𝔫𝔦𝔠𝔬𝔡𝔢 ',
+}
+
+
+def median_time(function, repeat, number=1):
+    """
+    Median seconds per call of function over repeat rounds of number calls, after one warm-up call
+    """
+    function()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / number)
+    return statistics.median(timings)
+
+
+def report(results, key, seconds, **extra):
+    results[key] = {'seconds': seconds, **extra}
+    details = ''.join(f"  {name} {value:,}" for name, value in extra.items())
+    print(f"{key:<72} {seconds * 1e3:>10.3f}ms{details}")
+
+
+def bench_analyzer(results, sizes, repeat):
+    from analyzer_api.analyzer import analyze_string
+
+    for mix, alphabet in UNICODE_MIXES.items():
+        for size in sizes:
+            value = make_value(alphabet, size)
+            seconds = median_time(lambda: analyze_string(value), repeat, number=max(1, 100_000 // size))
+            report(results, f'analyzer/{mix}/{size}', seconds, chars_per_second=round(size / seconds))
+
+
+def bench_queries(results, rows, repeat):
+    from analyzer_api.services import StringAnalysisService
+
+    def fetch(queryset):
+        list(queryset[:100])
+        queryset.count()
+
+    for filters in FILTER_SETS:
+        queryset, error, _ = StringAnalysisService.get_filtered_analyses(filters)
+        if error:
+            raise RuntimeError(f"filters {filters} rejected: {error}")
+        label = urlencode(filters) or 'unfiltered'
+        report(results, f'filter/{rows}/{label}', median_time(lambda: fetch(queryset), repeat))
+
+    for query in NL_QUERIES:
+        def run():
+            queryset, _, error, _ = StringAnalysisService.get_natural_language_results(query)
+            if error:
+                raise RuntimeError(f"query {query!r} rejected: {error}")
+            fetch(queryset)
+        report(results, f'nl/{rows}/{query}', median_time(run, repeat))
+
+
+class EndpointRunner:
+    """
+    Issues requests through the test client and checks each status, so a benchmark never
+    silently measures error responses
+    """
+
+    def __init__(self, rows, requests):
+        from django.test import Client, override_settings
+        from analyzer_api.models import StringAnalysis
+
+        self.rows = rows
+        self.requests = requests
+        self.client = Client()
+        # A client of its own, so the middleware is only loaded where /metrics needs it
+        with override_settings(INSTRUMENTATION_ENABLED=True):
+            self.instrumented_client = Client()
+            self.instrumented_client.get('/metrics')
+        self.sample = list(
+            StringAnalysis.objects.order_by('sha256_hash').values_list('value', 'sha256_hash')[:200]
+        )
+        self.fresh = (f'suite {rows} {number}' for number in range(sys.maxsize))
+        self.paths = set()
+
+    def call(self, method, path, expected, client=None, **kwargs):
+        response = getattr(client or self.client, method)(path, **kwargs)
+        if response.status_code != expected:
+            raise RuntimeError(f"{method.upper()} {path} returned {response.status_code}, expected {expected}")
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.paths.add(path.split('?')[0])
+        return response
+
+    def measure(self, results, name, request):
+        """
+        Time self.requests calls of request(number); report the median latency and the throughput
+        """
+        request(0)
+        timings = []
+        for number in range(self.requests):
+            started = time.perf_counter()
+            request(number)
+            timings.append(time.perf_counter() - started)
+        report(
+            results, f'endpoint/{self.rows}/{name}', statistics.median(timings),
+            requests_per_second=round(len(timings) / sum(timings)),
+        )
+
+    def run(self, results):
+        from django.conf import settings
+        from django.test import override_settings
+        from analyzer_api.models import StringAnalysis
+
+        sample = self.sample
+        call = self.call
+        nl_query = quote('palindromic strings longer than 40 characters')
+
+        def get(path, expected=200, **kwargs):
+            return lambda number: call('get', path, expected, **kwargs)
+
+        self.measure(results, 'health', get('/health'))
+        with override_settings(INSTRUMENTATION_ENABLED=True):
+            self.measure(results, 'metrics', get('/metrics', client=self.instrumented_client))
+        self.measure(results, 'list', get('/strings?page_size=20'))
+        self.measure(results, 'list-filtered', get('/strings?is_palindrome=true&min_length=20&page_size=20'))
+        self.measure(results, 'list-summary', get('/strings?view=summary&page_size=100'))
+        self.measure(results, 'list-stream', get('/strings?stream=true&is_palindrome=true&min_length=60'))
+        self.measure(results, 'nl', get(f'/strings/filter-by-natural-language?query={nl_query}'))
+        self.measure(results, 'stats', get('/strings/stats'))
+        self.measure(results, 'detail-by-value', lambda number: call(
+            'get', f'/strings/{quote(sample[number % len(sample)][0])}', 200
+        ))
+        self.measure(results, 'detail-by-hash', lambda number: call(
+            'get', f'/strings/{sample[number % len(sample)][1]}', 200
+        ))
+        self.measure(results, 'similar', lambda number: call(
+            'get', f'/strings/{sample[number % len(sample)][1]}/similar?k=10', 200
+        ))
+        lookup = {'identifiers': [value for value, _ in sample] + [f'missing {number}' for number in range(100)]}
+        self.measure(results, f"lookup-{len(lookup['identifiers'])}", lambda number: call(
+            'post', '/strings/lookup', 200, data=lookup, content_type='application/json'
+        ))
+        etags = {
+            sha256_hash: self.call('get', f'/strings/{sha256_hash}', 200)['ETag'] for _, sha256_hash in sample
+        }
+        self.measure(results, 'detail-not-modified', lambda number: call(
+            'get', f'/strings/{sample[number % len(sample)][1]}', 304,
+            headers={'If-None-Match': etags[sample[number % len(sample)][1]]},
+        ))
+
+        created = []
+
+        def create(number):
+            created.append(next(self.fresh))
+            call('post', '/strings', 201, data={'value': created[-1]}, content_type='application/json')
+
+        def delete(number):
+            call('delete', f'/strings/{quote(created.pop())}', 204)
+
+        self.measure(results, 'create', create)
+        self.measure(results, 'delete', delete)
+        StringAnalysis.objects.filter(value__in=created).delete()
+
+        batch_size = min(100, settings.STRING_BATCH_MAX_SIZE)
+        batched = []
+
+        def create_batch(number):
+            values = [next(self.fresh) for _ in range(batch_size)]
+            batched.extend(values)
+            call('post', '/strings/batch', 207, data={'values': values}, content_type='application/json')
+
+        self.measure(results, f'batch-create-{batch_size}', create_batch)
+        StringAnalysis.objects.filter(value__in=batched).delete()
+
+
+def bench_endpoints(results, rows, requests):
+    from django.urls import resolve
+    from analyzer_api.urls import urlpatterns
+
+    runner = EndpointRunner(rows, requests)
+    runner.run(results)
+    covered = {resolve(path).url_name for path in runner.paths}
+    missing = {pattern.name for pattern in urlpatterns} - covered
+    if missing:
+        print(f"routes not benchmarked: {', '.join(sorted(missing))}")
+
+
+def environment(args):
+    import django
+    from django.db import connection
+
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'layers': args.layers,
+        'sizes': args.sizes,
+        'rows': args.rows,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Print every result that changed by more than threshold against the baseline
+    Returns: the keys that got slower
+    """
+    regressions = []
+    common = [key for key in results if key in baseline]
+    for key in common:
+        change = results[key]['seconds'] / baseline[key]['seconds'] - 1
+        if abs(change) > threshold:
+            label = 'REGRESSION' if change > 0 else 'improvement'
+            print(f"{label:<12} {key:<72} {baseline[key]['seconds'] * 1e3:>10.3f}ms -> "
+                  f"{results[key]['seconds'] * 1e3:>10.3f}ms  {change:+.1%}")
+            if change > 0:
+                regressions.append(key)
+    unmatched = len(results) - len(common)
+    print(f"\n{len(common)} results compared, {len(regressions)} regressions over {threshold:.0%}"
+          + (f", {unmatched} not in the baseline" if unmatched else ''))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--layers', default=','.join(LAYERS), help=f"comma separated, from: {', '.join(LAYERS)}")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 1_000_000],
+                        help='analyzer value lengths')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='table sizes for the queries and endpoints layers')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per endpoint')
+    parser.add_argument('--database', default='/tmp/string_analyzer_suite.sqlite3')
+    parser.add_argument('--output', default=os.path.join(tempfile.gettempdir(), 'string_analyzer_suite_results.json'))
+    parser.add_argument('--compare', metavar='BASELINE', help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='slowdown that counts as a regression')
+    parser.add_argument('--input', help='compare this results file instead of running the suite')
+    args = parser.parse_args()
+
+    args.layers = args.layers.split(',')
+    unknown = [layer for layer in args.layers if layer not in LAYERS]
+    if unknown:
+        parser.error(f"unknown layer(s): {', '.join(unknown)}")
+    if args.input and not args.compare:
+        parser.error("--input needs --compare")
+
+    if args.input:
+        with open(args.input) as file:
+            results = json.load(file)['results']
+    else:
+        results = run(args, parser)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+def run(args, parser):
+    # The test client's host, and throttle rates the run cannot exhaust
+    os.environ['ALLOWED_HOSTS'] = 'testserver'
+    os.environ['THROTTLE_ANON_RATE'] = '1000000/s'
+    os.environ['THROTTLE_USER_RATE'] = '1000000/s'
+    # A similarity index of the run's own, rather than one a previous run left for this database path
+    os.environ['SIMILARITY_INDEX_DIR'] = tempfile.mkdtemp(prefix='suite-similarity-')
+    atexit.register(shutil.rmtree, os.environ['SIMILARITY_INDEX_DIR'], ignore_errors=True)
+    _django.setup(args.database)
+    from analyzer_api.models import StringAnalysis
+
+    random.seed(0)
+    results = {}
+    if 'analyzer' in args.layers:
+        bench_analyzer(results, args.sizes, args.repeat)
+
+    if 'queries' in args.layers or 'endpoints' in args.layers:
+        rows = sorted(args.rows)
+        existing = StringAnalysis.objects.count()
+        if existing > rows[0]:
+            parser.error(f"{args.database} already holds {existing:,} rows; use a fresh --database")
+        for table_rows in rows:
+            print(f"seeded rows: {_django.seed(table_rows)}")
+            if 'queries' in args.layers:
+                bench_queries(results, table_rows, args.repeat)
+            if 'endpoints' in args.layers:
+                bench_endpoints(results, table_rows, args.requests)
+
+    with open(args.output, 'w') as file:
+        json.dump({'environment': environment(args), 'results': results}, file, indent=2, ensure_ascii=False)
+    print(f"wrote {len(results)} results to {args.output}")
+    return results
+
+
+if __name__ == '__main__':
+    main()
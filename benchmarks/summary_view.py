@@ -0,0 +1,67 @@
+"""
+Benchmark latency and peak memory of full vs view=summary list pages on a table of large strings
+
+Usage: python -m benchmarks.summary_view [--rows 2000] [--value-size 20000] [--database /tmp/bench.sqlite3]
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from . import _django
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    tracemalloc.start()
+    body = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--value-size', type=int, default=20_000, help='approximate longest value length')
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--database', default='/tmp/string_analyzer_large_bench.sqlite3')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    _django.setup(args.database)
+    from rest_framework.renderers import JSONRenderer
+    from analyzer_api import serializers
+    from analyzer_api.models import StringAnalysis
+
+    words_per_value = args.value_size // 6
+    print(f"seeded rows: {_django.seed(args.rows, batch_size=100, value_factory=lambda rng: _django.make_value(rng, words_per_value))}")
+
+    def queryset(view):
+        return StringAnalysis.objects.for_view(view).order_by('-created_at', '-id')[:args.page_size]
+
+    paths = [
+        ('serializer full', lambda: JSONRenderer().render(
+            serializers.StringAnalysisSerializer(queryset('full'), many=True).data
+        )),
+        ('serializer summary', lambda: JSONRenderer().render(
+            serializers.StringAnalysisSummarySerializer(queryset('summary'), many=True).data
+        )),
+        ('rows full', lambda: serializers.render_analysis_list(
+            serializers.analysis_rows(queryset('full'))
+        )),
+        ('rows summary', lambda: serializers.render_analysis_list(
+            serializers.analysis_rows(queryset('summary'), 'summary'), 'summary'
+        )),
+    ]
+    for label, function in paths:
+        latency, peak, size = measure(function, args.repeat)
+        print(f"{label:<20} {latency * 1e3:>9.2f}ms  peak {peak / 2 ** 20:>8.2f}MiB  body {size / 2 ** 20:>8.2f}MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark the per-request cost of the throttles against DRF's stock AnonRateThrottle
+
+Each round of --requests checks starts from one client that already made --history requests
+in the current window, so DRF's timestamp list holds that many entries (plus those the round
+adds); the local token buckets and the shared sliding-window counters cost the same at any
+history. The shared counters and DRF's lists live in the cache CACHE_URL configures
+(in-process locmem unless set, e.g. redis://...).
+
+Usage: python -m benchmarks.throttling [--history 10 1000 10000] [--requests 1000]
+"""
+import argparse
+import os
+import statistics
+import time
+
+
+def time_checks(throttle_class, request, view, requests, reset, repeat=5):
+    """
+    Median seconds per allow_request, for a new throttle instance per request as DRF makes them
+    reset: called before each round to restore the client's history
+    """
+    timings = []
+    for _ in range(repeat):
+        reset()
+        started = time.perf_counter()
+        for _ in range(requests):
+            if not throttle_class().allow_request(request, view):
+                raise RuntimeError(f"{throttle_class.__module__}.{throttle_class.__name__} throttled the run")
+        timings.append((time.perf_counter() - started) / requests)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--history', type=int, nargs='+', default=[10, 1000, 10_000],
+                        help="requests the client already made in the window")
+    parser.add_argument('--requests', type=int, default=1000, help="timed checks per round")
+    args = parser.parse_args()
+
+    os.environ.setdefault('SECRET_KEY', 'benchmarks')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'string_analyzer.settings')
+    # High enough that no check is rejected, and a window long enough to hold the history
+    os.environ['THROTTLE_ANON_RATE'] = '1000000000/day'
+    import django
+    django.setup()
+    from django.core.cache import cache
+    from django.test import override_settings
+    from rest_framework import throttling as drf_throttling
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from analyzer_api import throttling
+    from analyzer_api.views import StringAnalysisRetrieveDeleteView
+
+    request = Request(APIRequestFactory().get('/strings/level'))
+    view = StringAnalysisRetrieveDeleteView()
+    throttles = {
+        'drf AnonRateThrottle': (drf_throttling.AnonRateThrottle, ''),
+        'local token bucket': (throttling.AnonRateThrottle, ''),
+        'shared sliding window': (throttling.AnonRateThrottle, 'default'),
+    }
+
+    print(f"{'history':>8}  " + ''.join(f"{name:>24}" for name in throttles))
+    for history in args.history:
+        row = []
+        for name, (throttle_class, alias) in throttles.items():
+            with override_settings(THROTTLE_CACHE_ALIAS=alias):
+                def reset():
+                    cache.clear()
+                    throttling.get_throttle_store.cache_clear()
+                    if throttle_class is drf_throttling.AnonRateThrottle:
+                        throttle = throttle_class()
+                        now = time.time()
+                        cache.set(
+                            throttle.get_cache_key(request, view),
+                            [now - position * 1e-3 for position in range(history)], throttle.duration,
+                        )
+                    else:
+                        for _ in range(history):
+                            throttle_class().allow_request(request, view)
+                row.append(time_checks(throttle_class, request, view, args.requests, reset))
+        print(f"{history:>8,}  " + ''.join(f"{seconds * 1e6:>22.2f}us" for seconds in row))
+
+
+if __name__ == '__main__':
+    main()
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "string_analyzer.settings")
+# Read endpoints are served by the async views when running under ASGI
+os.environ.setdefault("ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 import os
 from pathlib import Path
+import tempfile
 import environ
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Removes itself unless INSTRUMENTATION_ENABLED
+    "analyzer_api.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -90,9 +93,27 @@ DATABASES = {
     )
 }
 
+# Tests run threads against the database; SQLite's default in-memory test database
+# fails concurrent writers with "table is locked" instead of waiting, so use a file,
+# in the system temp dir rather than the source tree
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('TEST', {}).setdefault(
+        'NAME', env(
+            'TEST_DATABASE_NAME', default=os.path.join(tempfile.gettempdir(), 'string_analyzer_test_db.sqlite3')
+        )
+    )
+
 # Disable automatic trailing slash redirects
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://')
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -146,18 +167,115 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
     'EXCEPTION_HANDLER': 'analyzer_api.exceptions.custom_exception_handler',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'analyzer_api.pagination.KeysetPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'analyzer_api.throttling.AnonRateThrottle',
+        'analyzer_api.throttling.UserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/hour',
-        'user': '1000/hour'
+        'anon': env('THROTTLE_ANON_RATE', default='100/hour'),
+        'user': env('THROTTLE_USER_RATE', default='1000/hour'),
+        # Per endpoint group, in place of the rates above where set: create (POST /strings
+        # and /strings/batch), read (detail, list, lookup, similar and stats), nl (natural
+        # language queries) and delete; for example THROTTLE_ANON_NL_RATE=10/min
+        **{
+            f'{kind}_{group}': env(f'THROTTLE_{kind.upper()}_{group.upper()}_RATE', default=None)
+            for kind in ('anon', 'user') for group in ('create', 'read', 'nl', 'delete')
+        },
     }
 }
 
+# Throttle state: token buckets in each process's memory (at most THROTTLE_LOCAL_MAX_KEYS
+# clients), or, when THROTTLE_CACHE_ALIAS names a cache, sliding-window counters shared
+# through it so the rates hold across processes
+THROTTLE_CACHE_ALIAS = env('THROTTLE_CACHE_ALIAS', default='')
+THROTTLE_LOCAL_MAX_KEYS = env.int('THROTTLE_LOCAL_MAX_KEYS', default=100000)
+
+# String analysis executor: values shorter than INLINE_THRESHOLD characters are analyzed
+# in the request thread; longer values and batches of at least BATCH_THRESHOLD values
+# go to a process pool of MAX_WORKERS processes (defaults to the CPU count)
+ANALYSIS_EXECUTOR = {
+    'BACKEND': env(
+        'ANALYSIS_EXECUTOR_BACKEND',
+        default='analyzer_api.executors.ProcessPoolAnalysisExecutor'
+    ),
+    'OPTIONS': {
+        'max_workers': env.int('ANALYSIS_MAX_WORKERS', default=None),
+        'inline_threshold': env.int('ANALYSIS_INLINE_THRESHOLD', default=1_000_000),
+        'chunk_size': env.int('ANALYSIS_CHUNK_SIZE', default=1_000_000),
+        'batch_threshold': env.int('ANALYSIS_BATCH_THRESHOLD', default=256),
+    },
+}
+
+# Listing (GET /strings): largest page_size a client may request, and rows fetched
+# per database round trip when streaming NDJSON with ?stream=true
+MAX_PAGE_SIZE = env.int('MAX_PAGE_SIZE', default=1000)
+STREAM_CHUNK_SIZE = env.int('STREAM_CHUNK_SIZE', default=500)
+
+# Counts reported by list and natural language responses: filtered counts are cached
+# for COUNT_CACHE_TTL seconds; with count_mode=estimate, planner estimates (PostgreSQL
+# only) of at least COUNT_ESTIMATE_MIN_ROWS rows are returned instead of COUNT(*)
+COUNT_CACHE_ALIAS = env('COUNT_CACHE_ALIAS', default='default')
+COUNT_CACHE_TTL = env.int('COUNT_CACHE_TTL', default=30)
+COUNT_ESTIMATE_MIN_ROWS = env.int('COUNT_ESTIMATE_MIN_ROWS', default=10000)
+
+# Conditional GET: detail responses carry a strong ETag derived from sha256_hash and
+# may be cached for DETAIL_MAX_AGE seconds (so a deleted string can be served that long);
+# list and natural language responses carry an ETag of the table version counter, which
+# is kept in COUNT_CACHE_ALIAS for up to TABLE_VERSION_CACHE_TTL seconds
+DETAIL_MAX_AGE = env.int('DETAIL_MAX_AGE', default=86400)
+TABLE_VERSION_CACHE_TTL = env.int('TABLE_VERSION_CACHE_TTL', default=5)
+
+# Rendered GET /strings/{string_value} responses: an in-process LRU of up to
+# LOCAL_MAX_BYTES, whose entries live LOCAL_TIMEOUT seconds, in front of the shared
+# cache ALIAS (set ANALYSIS_CACHE_ALIAS to an empty string to disable that tier)
+ANALYSIS_RESULT_CACHE = {
+    'ALIAS': env('ANALYSIS_CACHE_ALIAS', default='default'),
+    'TIMEOUT': env.int('ANALYSIS_CACHE_TIMEOUT', default=3600),
+    'LOCAL_MAX_BYTES': env.int('ANALYSIS_CACHE_LOCAL_MAX_BYTES', default=64 * 1024 * 1024),
+    'LOCAL_TIMEOUT': env.int('ANALYSIS_CACHE_LOCAL_TIMEOUT', default=60),
+}
+
+# Request instrumentation: query counts and time, time per stage and response sizes,
+# sent as a Server-Timing header (unless INSTRUMENTATION_SERVER_TIMING is off) and
+# aggregated per view at GET /metrics for Prometheus, per process
+INSTRUMENTATION_ENABLED = env.bool('INSTRUMENTATION_ENABLED', default=False)
+INSTRUMENTATION_SERVER_TIMING = env.bool('INSTRUMENTATION_SERVER_TIMING', default=True)
+
+# Natural language queries whose parsed filters are memoized per process
+NL_QUERY_CACHE_SIZE = env.int('NL_QUERY_CACHE_SIZE', default=4096)
+
+# Serve GET on the list, detail, natural language and health endpoints with async views
+# over the async ORM; asgi.py turns this on unless ASYNC_VIEWS is set explicitly
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
+# Similarity search (GET /strings/{string_value}/similar, needs numpy): the memory-mapped
+# vector index every worker shares lives in a subdirectory of SIMILARITY_INDEX_DIR per
+# database, outside the source tree by default (it is rebuilt from the database when
+# missing); k is capped at SIMILARITY_MAX_K
+SIMILARITY_INDEX_DIR = env(
+    'SIMILARITY_INDEX_DIR', default=os.path.join(tempfile.gettempdir(), 'string_analyzer_similarity_index')
+)
+SIMILARITY_MAX_K = env.int('SIMILARITY_MAX_K', default=100)
+
+# GET /strings/stats lists the STATS_MAX_CHARACTERS most frequent characters, with the
+# number of distinct characters, rather than every character ever stored
+STATS_MAX_CHARACTERS = env.int('STATS_MAX_CHARACTERS', default=100)
+
+# Batch analysis (POST /strings/batch)
+STRING_BATCH_MAX_SIZE = env.int('STRING_BATCH_MAX_SIZE', default=10000)
+STRING_BATCH_QUERY_CHUNK_SIZE = env.int('STRING_BATCH_QUERY_CHUNK_SIZE', default=500)
+
+# Bulk deletes (DELETE /strings and manage.py delete_strings): rows deleted per
+# transaction, and at most BULK_DELETE_MAX_ROWS per request before it returns a resume point
+BULK_DELETE_CHUNK_SIZE = env.int('BULK_DELETE_CHUNK_SIZE', default=1000)
+BULK_DELETE_MAX_ROWS = env.int('BULK_DELETE_MAX_ROWS', default=20000)
+
+# Batch lookup (POST /strings/lookup): identifiers per request; their hashes are
+# resolved STRING_BATCH_QUERY_CHUNK_SIZE to a query
+STRING_LOOKUP_MAX_SIZE = env.int('STRING_LOOKUP_MAX_SIZE', default=10000)
+
 CORS_ALLOWED_ORIGINS = env('CORS_ALLOWED_ORIGINS')
 CORS_ALLOW_ALL_ORIGINS = env.bool('CORS_ALLOW_ALL_ORIGINS', default=False)
 CSRF_TRUSTED_ORIGINS = env('CSRF_TRUSTED_ORIGINS')